@@ -0,0 +1,105 @@
+"""
+Compares the memory held by discord.py's caches under each cache profile on a synthetic guild set.
+
+Every profile gets the same guilds, shaped like the GUILD_CREATE payloads Discord sends for the
+intents of the profile, followed by the same stream of messages. The memory allocated by the
+client state is measured with tracemalloc.
+
+Run from the repository root: python -m benchmarks.cache_profiles [--guilds 1000]
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+
+import discord
+
+from helpers import cache_profile
+
+CHANNELS = 40  # Per guild
+ROLES = 25
+EMOJIS = 50
+VOICE_MEMBERS = 15  # Members sitting in voice channels of each guild
+SCHEDULED_EVENTS = 5
+MESSAGES = 5_000  # Received across every guild, more than the largest message cache
+
+
+def user(user_id: int) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def member(user_id: int) -> dict:
+    return {"user": user(user_id), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+
+def guild_payload(guild_id: int, intents: discord.Intents) -> dict:
+    # Discord leaves out of GUILD_CREATE what the disabled intents would have sent
+    base = guild_id * 10_000
+    voice_channel = str(base + CHANNELS)
+    payload = {
+        "id": str(guild_id), "name": f"guild{guild_id}", "owner_id": "1", "member_count": 5_000, "large": True,
+        "features": [], "icon": None, "splash": None, "discovery_splash": None, "banner": None, "description": None,
+        "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0, "mfa_level": 0,
+        "nsfw_level": 0, "premium_tier": 0, "preferred_locale": "en-US", "system_channel_flags": 0,
+        "roles": [{"id": str(base + i if i else guild_id), "name": f"role{i}", "permissions": "0", "position": i, "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0} for i in range(ROLES)],
+        "emojis": [{"id": str(base + 1000 + i), "name": f"emoji{i}", "roles": [], "require_colons": True, "managed": False, "animated": False, "available": True} for i in range(EMOJIS)],
+        "stickers": [],
+        "channels": [{"id": str(base + i), "type": 0, "name": f"channel{i}", "position": i, "permission_overwrites": [], "nsfw": False, "parent_id": None} for i in range(CHANNELS)]
+        + [{"id": voice_channel, "type": 2, "name": "voice", "position": CHANNELS, "permission_overwrites": [], "bitrate": 64000, "user_limit": 0, "parent_id": None}],
+        "threads": [], "stage_instances": [], "soundboard_sounds": [], "guild_scheduled_events": [], "members": [], "voice_states": [], "presences": []
+    }
+    if intents.voice_states:
+        voice_members = [base + 5000 + i for i in range(VOICE_MEMBERS)]
+        payload["members"] = [member(user_id) for user_id in voice_members]
+        payload["voice_states"] = [{"user_id": str(user_id), "channel_id": voice_channel, "session_id": "x", "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "self_video": False, "suppress": False, "request_to_speak_timestamp": None} for user_id in voice_members]
+    if intents.guild_scheduled_events:
+        payload["guild_scheduled_events"] = [{"id": str(base + 2000 + i), "guild_id": str(guild_id), "channel_id": voice_channel, "creator_id": "1", "name": f"event{i}", "description": "", "scheduled_start_time": "2030-01-01T00:00:00+00:00", "scheduled_end_time": None, "privacy_level": 2, "status": 1, "entity_type": 2, "entity_id": None, "entity_metadata": None, "user_count": 0} for i in range(SCHEDULED_EVENTS)]
+    return payload
+
+
+def message_payload(index: int, guilds: int) -> dict:
+    guild_id = index % guilds + 1
+    author_id = guild_id * 10_000 + 9000 + index % 500
+    return {
+        "id": str(10 ** 15 + index), "channel_id": str(guild_id * 10_000 + index % CHANNELS), "guild_id": str(guild_id),
+        "author": user(author_id), "member": {k: v for k, v in member(author_id).items() if k != "user"},
+        "content": "some message that nobody will ever snipe " * 2, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0
+    }
+
+
+async def measure(name: str, guilds: int) -> None:
+    options = cache_profile.client_options(cache_profile.PROFILES[name])
+    gc.collect()
+    tracemalloc.start()
+    client = discord.Client(**options)
+    async with client:  # Sets up the event loop of the client, without logging in
+        state = client._connection
+        for guild_id in range(1, guilds + 1):
+            state._add_guild_from_data(guild_payload(guild_id, options["intents"]))
+        if options["intents"].guild_messages:
+            for index in range(MESSAGES):
+                state.parse_message_create(message_payload(index, guilds))
+        await asyncio.sleep(0)
+        gc.collect()
+        allocated, _ = tracemalloc.get_traced_memory()
+        members = sum(len(guild._members) for guild in client.guilds)
+        messages = len(client.cached_messages)
+        print(f"{name:8s}: {allocated / 2 ** 20:8.1f} MiB, {len(client.guilds)} guilds, {members} cached members, {messages} cached messages")
+    tracemalloc.stop()
+    del client, state
+    gc.collect()
+
+
+async def main(guilds: int) -> None:
+    print(f"{guilds} guilds with {CHANNELS} channels, {ROLES} roles, {EMOJIS} emojis and {VOICE_MEMBERS} members in voice each, then {MESSAGES} messages")
+    for name in cache_profile.PROFILES:
+        await measure(name, guilds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory report of the cache profiles on a synthetic guild set.")
+    parser.add_argument("--guilds", type=int, default=1000)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.guilds))
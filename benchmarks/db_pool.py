@@ -0,0 +1,50 @@
+"""
+Compares opening a new SQLite connection per query against the shared connection pool.
+
+Run from the repository root: python -m benchmarks.db_pool
+"""
+
+import asyncio
+import tempfile
+import time
+
+import aiosqlite
+
+from helpers import db_manager, migrations
+
+ITERATIONS = 2000
+
+
+async def per_call_connect(path: str) -> None:
+    async with aiosqlite.connect(path) as db:
+        async with db.execute("SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE user_id=? AND server_id=?", (1, 1)) as cursor:
+            await cursor.fetchall()
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/bench.db"
+        async with aiosqlite.connect(path) as db:
+            await migrations.migrate(db)
+
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            await per_call_connect(path)
+        connect_elapsed = time.perf_counter() - start
+
+        await db_manager.connect(path)
+        try:
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                await db_manager.get_warnings(1, 1)
+            pool_elapsed = time.perf_counter() - start
+        finally:
+            await db_manager.close()
+
+    print(f"per-call connect: {connect_elapsed / ITERATIONS * 1e6:8.1f} us/query")
+    print(f"pooled          : {pool_elapsed / ITERATIONS * 1e6:8.1f} us/query")
+    print(f"speedup         : {connect_elapsed / pool_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
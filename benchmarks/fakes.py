@@ -0,0 +1,216 @@
+"""
+Offline stand-ins for the discord.py objects used by the cogs and the checks.
+
+They implement only what the code under benchmark touches, every REST call completing after an
+optional fake latency, and count the calls they receive.
+"""
+
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+
+import discord
+
+from helpers.guild_settings import GuildSettingsCache
+from helpers.outbound import OutboundScheduler
+
+
+class FakeUser:
+    # Hashable, so usable as a permission overwrite target
+    def __init__(self, user_id: int, bot: bool = False, permissions: discord.Permissions = None):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.bot = bot
+        self.guild_permissions = permissions or discord.Permissions.none()
+
+
+class FakeRole:
+    def __init__(self, role_id: int, permissions: discord.Permissions):
+        self.id = role_id
+        self.permissions = permissions
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, author: FakeUser, channel: "FakeChannel", content: str = ""):
+        self.id = message_id
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.created_at = datetime.now(timezone.utc)
+        self.edited_at = None
+        self.reactions = []
+        self.attachments = []
+        self.embeds = []
+
+    async def edit(self, **kwargs) -> None:
+        await self.guild.request("edit_message")
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, guild: "FakeGuild", name: str = "channel"):
+        self.id = channel_id
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{channel_id}>"
+        self.messages: Dict[int, FakeMessage] = {}
+
+    async def send(self, content: str = None, **kwargs) -> FakeMessage:
+        await self.guild.request("send")
+        message = FakeMessage(self.guild.next_id(), self.guild.me, self, content or "")
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.guild.request("fetch_message")
+        try:
+            return self.messages[message_id]
+        except KeyError:
+            raise discord.NotFound(FakeHTTPResponse(404), "Unknown Message") from None
+
+    async def history(self, limit: Optional[int] = 100, after: discord.abc.Snowflake = None, oldest_first: bool = True) -> AsyncIterator[FakeMessage]:
+        await self.guild.request("history")
+        after_id = after.id if after is not None else 0
+        for message in itertools.islice((message for message in self.messages.values() if message.id > after_id), limit):
+            yield message
+
+    async def delete(self) -> None:
+        await self.guild.request("delete_channel")
+        self.guild.channels.pop(self.id, None)
+
+
+class FakeHTTPResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Not Found"
+        self.headers = {}
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 1, members: int = 0, admin_roles: int = 1, latency: float = 0.0):
+        """
+        :param guild_id: The ID of the guild.
+        :param members: The number of regular members, with IDs from 1 to members.
+        :param admin_roles: The number of roles with the administrator permission.
+        :param latency: The seconds taken by each fake REST call.
+        """
+        self.id = guild_id
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._ids = 10 ** 12
+        self.me = FakeUser(0, bot=True)
+        self.default_role = FakeRole(guild_id, discord.Permissions.none())
+        administrator = discord.Permissions(administrator=True)
+        self.roles = [self.default_role] + [FakeRole(guild_id + i, administrator) for i in range(1, admin_roles + 1)]
+        self.members: Dict[int, FakeUser] = {i: FakeUser(i) for i in range(1, members + 1)}
+        self.channels: Dict[int, FakeChannel] = {}
+        self.categories = []
+        self.owner_id = 1
+
+    @property
+    def owner(self) -> Optional[FakeUser]:
+        return self.members.get(self.owner_id)
+
+    def next_id(self) -> int:
+        self._ids += 1
+        return self._ids
+
+    async def request(self, route: str) -> None:
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return self.members.get(user_id)
+
+    async def fetch_member(self, user_id: int) -> FakeUser:
+        await self.request("fetch_member")
+        raise discord.NotFound(FakeHTTPResponse(404), "Unknown Member")
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        await self.request("fetch_channel")
+        if channel_id in self.channels:
+            return self.channels[channel_id]
+        raise discord.NotFound(FakeHTTPResponse(404), "Unknown Channel")
+
+    def add_channel(self, name: str = "channel") -> FakeChannel:
+        channel = FakeChannel(self.next_id(), self, name)
+        self.channels[channel.id] = channel
+        return channel
+
+    async def create_text_channel(self, name: str, **kwargs) -> FakeChannel:
+        await self.request("create_text_channel")
+        return self.add_channel(name)
+
+
+class FakeConfig(dict):
+    def __init__(self, owners=(), **values):
+        super().__init__(values)
+        self.owners = frozenset(owners)
+
+
+class FakeBot:
+    def __init__(self, guild: FakeGuild, owners=()):
+        self.config = FakeConfig(owners)
+        self.outbound = OutboundScheduler()  # Not started, so requests are sent right away
+        self.guild = guild
+        self.guild_settings = GuildSettingsCache()
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.guild.get_channel(channel_id)
+
+    def owns_guild(self, guild_id: int) -> bool:
+        return True
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot, author: FakeUser, channel: FakeChannel):
+        self.bot = bot
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.message = FakeMessage(channel.guild.next_id(), author, channel)
+        self.interaction = None
+
+    async def send(self, content: str = None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.sent = []
+
+    async def send_message(self, content: str = None, **kwargs) -> None:
+        await self.interaction.guild.request("interaction_response")
+        self.sent.append(content)
+
+    async def defer(self, **kwargs) -> None:
+        await self.interaction.guild.request("interaction_defer")
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.sent = []
+
+    async def send(self, content: str = None, **kwargs) -> None:
+        await self.interaction.guild.request("interaction_followup")
+        self.sent.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, bot: FakeBot, user: FakeUser, channel: FakeChannel):
+        self.client = bot
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
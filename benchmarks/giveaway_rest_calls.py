@@ -0,0 +1,100 @@
+"""
+Counts the REST calls issued to provision winner channels in a 50k-member guild stand-in.
+
+Run from the repository root: python -m benchmarks.giveaway_rest_calls
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+
+from cogs.giveaway import Giveaway
+from helpers.outbound import OutboundScheduler
+
+MEMBERS = 50_000
+ADMINS = 25
+ADMIN_ROLES = 3
+WINNERS = 10
+LATENCY = 0.01  # Seconds taken by each fake REST call
+
+
+class FakeObject:
+    # Hashable stand-in for roles and members, usable as a permission overwrite target
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class FakeChannel:
+    def __init__(self, guild: "FakeGuild"):
+        self.id = id(self)
+        self.guild = guild
+
+    async def send(self, content: str) -> None:
+        await self.guild.request("send")
+
+    async def set_permissions(self, target, **permissions) -> None:
+        await self.guild.request("set_permissions")
+
+
+class FakeGuild:
+    def __init__(self):
+        self.id = 1
+        self.calls = {}
+        administrator = discord.Permissions(administrator=True)
+        self.default_role = FakeObject(id=0, permissions=discord.Permissions.none())
+        self.roles = [self.default_role] + [FakeObject(id=i, permissions=administrator) for i in range(1, ADMIN_ROLES + 1)]
+        self.members = [
+            FakeObject(
+                id=i,
+                display_name=f"member{i}",
+                mention=f"<@{i}>",
+                guild_permissions=administrator if i < ADMINS else discord.Permissions.none()
+            )
+            for i in range(MEMBERS)
+        ]
+        self.owner_id = 0
+        self.owner = self.members[0]
+
+    async def request(self, route: str) -> None:
+        self.calls[route] = self.calls.get(route, 0) + 1
+        await asyncio.sleep(LATENCY)
+
+    async def create_text_channel(self, name: str, overwrites: dict) -> FakeChannel:
+        await self.request("create_text_channel")
+        return FakeChannel(self)
+
+
+async def per_member_provisioning(guild: FakeGuild, winners_list: list, prize: str) -> None:
+    # The provisioning loop end_giveaway used before, kept here for comparison
+    for winner in winners_list:
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(read_messages=False),
+            winner: discord.PermissionOverwrite(read_messages=True)
+        }
+        new_channel = await guild.create_text_channel(name=f"{prize}-{winner.display_name}", overwrites=overwrites)
+        await new_channel.send(f"{winner.mention} you have won the giveaway for {prize}!")
+        for member in guild.members:
+            if member.guild_permissions.administrator:
+                await new_channel.set_permissions(member, read_messages=True)
+
+
+async def measure(name: str, provision) -> None:
+    guild = FakeGuild()
+    winners_list = guild.members[-WINNERS:]
+    start = time.perf_counter()
+    await provision(guild, winners_list, "prize")
+    elapsed = time.perf_counter() - start
+    print(f"{name:22s}: {sum(guild.calls.values()):5d} REST calls {guild.calls}, {elapsed:6.2f} s")
+
+
+async def main() -> None:
+    print(f"{MEMBERS} members, {ADMINS} administrators, {WINNERS} winners, {LATENCY * 1000:.0f} ms per call")
+    await measure("per-member overwrites", per_member_provisioning)
+    # The outbound scheduler is not started, so requests are sent directly like before
+    await measure("role overwrites", Giveaway(bot=SimpleNamespace(outbound=OutboundScheduler())).create_winner_channels)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Measures sustained warn writes per second with and without the group commit write queue.
+
+Run from the repository root: python -m benchmarks.group_commit
+"""
+
+import asyncio
+import tempfile
+import time
+
+import aiosqlite
+
+from helpers import db_manager, migrations
+
+WRITERS = 100
+WRITES_PER_WRITER = 50
+
+
+async def writer(user_id: int) -> None:
+    for _ in range(WRITES_PER_WRITER):
+        await db_manager.add_warn(user_id, 1, 1, "benchmark")
+
+
+async def measure(group_commit: bool) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/bench.db"
+        async with aiosqlite.connect(path) as db:
+            await migrations.migrate(db)
+        await db_manager.connect(path, group_commit=group_commit)
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(writer(user_id) for user_id in range(WRITERS)))
+            elapsed = time.perf_counter() - start
+        finally:
+            await db_manager.close()
+    return WRITERS * WRITES_PER_WRITER / elapsed
+
+
+async def main() -> None:
+    without = await measure(group_commit=False)
+    with_group_commit = await measure(group_commit=True)
+    print(f"concurrent writers : {WRITERS}")
+    print(f"without group commit: {without:10.0f} writes/s")
+    print(f"with group commit   : {with_group_commit:10.0f} writes/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
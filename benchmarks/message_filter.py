@@ -0,0 +1,86 @@
+"""
+Replays 1M synthetic messages through on_message's dispatch, with and without the message filter.
+
+The messages are real discord.Message objects built from gateway payloads, 1% of them being
+commands or mentions of the bot, and go through process_commands like in bot.py.
+
+Run from the repository root: python -m benchmarks.message_filter
+"""
+
+import asyncio
+import random
+import time
+
+import discord
+from discord.ext import commands
+
+from helpers.message_filter import MessageFilter
+
+MESSAGES = 1_000_000
+DISTINCT_MESSAGES = 10_000  # Replayed in a loop, so that building them is not measured
+COMMAND_RATIO = 0.01
+BOT_ID = 42
+PREFIX = "!"
+WORDS = ["hello", "gg", "anyone", "playing", "tonight", "lol", "what", "is", "the", "best", "build", "for", "this", "?"]
+
+
+def build_bot() -> commands.Bot:
+    bot = commands.Bot(command_prefix=commands.when_mentioned_or(PREFIX), intents=discord.Intents.default(), help_command=None)
+    bot._connection.user = discord.ClientUser(state=bot._connection, data={"id": str(BOT_ID), "username": "bot", "discriminator": "0", "avatar": None})
+
+    @bot.command()
+    async def ping(context: commands.Context) -> None:
+        pass
+
+    @bot.event
+    async def on_command_error(context: commands.Context, error: Exception) -> None:
+        pass  # Unknown commands would otherwise print a traceback
+
+    return bot
+
+
+def build_messages(bot: commands.Bot) -> list:
+    rng = random.Random(0)
+    channel = bot.get_partial_messageable(10, guild_id=1)
+    messages = []
+    for index in range(DISTINCT_MESSAGES):
+        if rng.random() < COMMAND_RATIO:
+            content = rng.choice([f"{PREFIX}ping", f"<@{BOT_ID}> ping", f"{PREFIX}unknown"])
+        else:
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        messages.append(discord.Message(state=bot._connection, channel=channel, data={
+            "id": str(index), "channel_id": "10", "content": content, "type": 0,
+            "author": {"id": str(1000 + index % 500), "username": "user", "discriminator": "0", "avatar": None},
+            "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False, "pinned": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": []
+        }))
+    return messages
+
+
+async def replay(bot: commands.Bot, messages: list, message_filter: MessageFilter = None) -> float:
+    start = time.perf_counter()
+    for index in range(MESSAGES):
+        message = messages[index % DISTINCT_MESSAGES]
+        if message.author.bot:
+            continue
+        if message_filter is not None and not message_filter.should_process(message):
+            continue
+        await bot.process_commands(message)
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    bot = build_bot()
+    messages = build_messages(bot)
+    message_filter = MessageFilter([PREFIX])
+    message_filter.set_user(BOT_ID)
+    print(f"{MESSAGES} messages, {COMMAND_RATIO:.0%} commands or mentions")
+    async with bot:  # Sets up the event loop of the bot, without logging in
+        for name, current_filter in (("without filter", None), ("with filter", message_filter)):
+            elapsed = await replay(bot, messages, current_filter)
+            print(f"{name:15s}: {elapsed:6.2f} s, {MESSAGES / elapsed:10.0f} messages/s")
+    print(f"passed {message_filter.passed}, rejected {message_filter.rejected}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Replays a burst of requests against a local fake Discord endpoint that enforces rate limits, sent
+through discord.py's own HTTP client as in production.
+
+Each channel has a route limit announced in Discord's rate limit headers, which neither the bot
+nor the scheduler is told about beforehand: discord.py has to learn it from the responses. The
+endpoint also enforces a shared limit across the channels that no header announces, so some
+requests are answered with 429s and have to be retried. The burst is sent once directly and once
+through the outbound scheduler.
+
+Run from the repository root: python -m benchmarks.outbound_scheduler
+"""
+
+import asyncio
+import json
+import math
+import time
+
+import discord
+from aiohttp import web
+from discord.http import HTTPClient, Route
+
+from helpers.outbound import OutboundScheduler, Priority
+
+LIMIT = 5  # Requests per channel and period, announced in the headers
+PERIOD = 1.0
+SHARED_LIMIT = 12  # Requests per period across the channels, never announced
+CHANNELS = 4
+BULK_REQUESTS = 40
+URGENT_REQUESTS = 4
+
+
+def seconds(delay: float) -> float:
+    # Rounded up like Discord does, so that a client waiting this long is never early
+    return math.ceil(delay * 1000) / 1000
+
+
+def respond(body: dict, status: int = 200, headers: dict = None) -> web.Response:
+    # Without a charset, which discord.py would take for a non-JSON answer
+    return web.Response(body=json.dumps(body).encode(), status=status, headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+class FakeDiscord:
+    def __init__(self):
+        self.buckets = {}
+        self.shared = (0.0, SHARED_LIMIT)
+        self.requests = 0
+        self.rejected = 0
+
+    def rate_limited(self, reset: float, now: float, headers: dict) -> web.Response:
+        self.rejected += 1
+        headers["Via"] = "1.1 google"  # discord.py only retries the 429s coming from Discord itself
+        body = {"message": "You are being rate limited.", "retry_after": seconds(reset - now), "global": False}
+        return respond(body, 429, headers)
+
+    async def login(self, request: web.Request) -> web.Response:
+        return respond({"id": "1", "username": "bot", "discriminator": "0", "avatar": None})
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        route = request.match_info["channel_id"]
+        now = time.monotonic()
+        reset, remaining = self.buckets.get(route, (now + PERIOD, LIMIT))
+        if now >= reset:
+            reset, remaining = now + PERIOD, LIMIT
+        headers = {
+            "X-RateLimit-Bucket": "messages",
+            "X-RateLimit-Limit": str(LIMIT),
+            "X-RateLimit-Reset": f"{time.time() + reset - now:.3f}",
+            "X-RateLimit-Reset-After": str(seconds(reset - now))
+        }
+        if remaining == 0:
+            headers["X-RateLimit-Remaining"] = "0"
+            return self.rate_limited(reset, now, headers)
+        shared_reset, shared_remaining = self.shared
+        if now >= shared_reset:
+            shared_reset, shared_remaining = now + PERIOD, SHARED_LIMIT
+        if shared_remaining == 0:
+            headers["X-RateLimit-Remaining"] = str(remaining)
+            return self.rate_limited(shared_reset, now, headers)
+        self.shared = (shared_reset, shared_remaining - 1)
+        self.buckets[route] = (reset, remaining - 1)
+        headers["X-RateLimit-Remaining"] = str(remaining - 1)
+        return respond({"id": str(self.requests)}, headers=headers)
+
+
+async def run(http: HTTPClient, fake: FakeDiscord, scheduler: OutboundScheduler) -> None:
+    latencies = {Priority.BULK: [], Priority.NORMAL: []}
+    failures = 0
+
+    async def post(channel_id: int, priority: Priority) -> None:
+        nonlocal failures
+        start = time.monotonic()
+        try:
+            await scheduler.submit(f"channel:{channel_id}:messages", lambda: http.request(Route("POST", "/channels/{channel_id}/messages", channel_id=channel_id)), priority)
+        except discord.HTTPException:
+            failures += 1
+        latencies[priority].append(time.monotonic() - start)
+
+    start = time.monotonic()
+    bulk = [asyncio.create_task(post(i % CHANNELS, Priority.BULK)) for i in range(BULK_REQUESTS)]
+    await asyncio.sleep(0.05)
+    urgent = [asyncio.create_task(post(0, Priority.NORMAL)) for _ in range(URGENT_REQUESTS)]
+    await asyncio.gather(*bulk, *urgent)
+    elapsed = time.monotonic() - start
+
+    def average(values):
+        return sum(values) / len(values) * 1000
+
+    print(f"  {fake.requests:3d} requests, {fake.rejected:3d} answered with 429 and retried, {failures} failed, {elapsed:5.2f} s, "
+          f"bulk {average(latencies[Priority.BULK]):7.1f} ms, urgent {average(latencies[Priority.NORMAL]):7.1f} ms average")
+
+
+async def main() -> None:
+    for name, started in (("direct", False), ("outbound scheduler", True)):
+        fake = FakeDiscord()
+        app = web.Application()
+        app.router.add_get("/users/@me", fake.login)
+        app.router.add_post("/channels/{channel_id}/messages", fake.create_message)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        Route.BASE = f"http://127.0.0.1:{port}"
+
+        http = HTTPClient(asyncio.get_running_loop())
+        await http.static_login("token")
+        scheduler = OutboundScheduler()
+        if started:
+            scheduler.start()
+        print(f"{name}:")
+        await run(http, fake, scheduler)
+        if started:
+            print(f"  {scheduler.metrics()}")
+        await scheduler.stop()
+        await http.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Floods the bot-wide rate limiter with commands from 1M distinct users, mixed with a few spammers,
+and reports the memory held by its state as the flood goes on, the refusals and the notices sent.
+
+The flood runs on a simulated clock, so it covers minutes of traffic in a few seconds. The
+throughput of the not_rate_limited check is then measured on the real clock.
+
+Run from the repository root: python -m benchmarks.rate_limiter [--users 1000000]
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.fakes import FakeBot, FakeContext, FakeGuild, FakeUser
+from exceptions import UserRateLimited
+from helpers import checks
+from helpers.rate_limit import RateLimiter
+
+RATE = 5  # Commands per PERIOD, as in config.json
+PERIOD = 10.0
+COMMANDS_PER_SECOND = 10_000  # Of the simulated flood
+SPAMMERS = 100
+SPAM_RATIO = 0.1  # Share of the flood sent by the spammers
+REPORTS = 10
+
+
+def flood(users: int) -> None:
+    limiter = RateLimiter(RATE, PERIOD)
+    notices = Counter()
+    allowed_spam = 0
+    spam_every = round(1 / SPAM_RATIO)
+    total = int(users / (1 - SPAM_RATIO))
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    print(f"{total} commands from {users} users and {SPAMMERS} spammers, {COMMANDS_PER_SECOND} per second")
+    user_id = SPAMMERS
+    most_states = 0
+    for index in range(total):
+        now = index / COMMANDS_PER_SECOND
+        if index % spam_every == 0:
+            spammer = index // spam_every % SPAMMERS
+            if limiter.hit(spammer, now):
+                notices[spammer] += limiter.notify(spammer)
+            else:
+                allowed_spam += 1
+        else:
+            user_id += 1
+            limiter.hit(user_id, now)
+        most_states = max(most_states, len(limiter))
+        if (index + 1) % (total // REPORTS) == 0:
+            memory = tracemalloc.get_traced_memory()[0] - baseline
+            print(f"{index + 1:9d} commands, {user_id - SPAMMERS:8d} users: {len(limiter):7d} states, {memory / 2 ** 20:6.1f} MiB")
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    print(f"peak: {most_states} states, {peak / 2 ** 20:.1f} MiB, bounded by two generations of {limiter.max_users} states")
+    duration = total / COMMANDS_PER_SECOND
+    print(f"{limiter.limited} commands refused, spammers allowed {allowed_spam / SPAMMERS / duration * PERIOD:.1f} commands per {PERIOD:.0f} s")
+    print(f"notices per spammer: at most {max(notices.values())} over {duration:.0f} s, windows of {limiter.window:.0f} s")
+
+
+async def check_throughput(count: int = 1_000_000) -> None:
+    guild = FakeGuild()
+    bot = FakeBot(guild)
+    channel = guild.add_channel()
+    contexts = [FakeContext(bot, FakeUser(user_id), channel) for user_id in range(10_000)]
+    predicate = checks.not_rate_limited(RateLimiter(RATE, PERIOD)).predicate
+    refused = 0
+    started = time.perf_counter()
+    for index in range(count):
+        try:
+            await predicate(contexts[index % len(contexts)])
+        except UserRateLimited:
+            refused += 1
+    elapsed = time.perf_counter() - started
+    print(f"check.not_rate_limited: {count / elapsed:.0f} checks/s, {elapsed / count * 1e6:.2f} us per check, {refused} refused")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory of the rate limiter under a flood of distinct users.")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    arguments = parser.parse_args()
+    flood(arguments.users)
+    asyncio.run(check_throughput())
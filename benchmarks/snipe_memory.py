@@ -0,0 +1,35 @@
+"""
+Measures the memory held by the snipe store after deletions in 100k channels.
+
+Run from the repository root: python -m benchmarks.snipe_memory
+"""
+
+import tracemalloc
+
+from cogs.snipe import DeletedMessage, SnipeStore
+
+CHANNELS = 100_000
+DELETIONS_PER_CHANNEL = 3
+CONTENT = "deleted message content " * 20
+
+
+def fill(store: SnipeStore) -> int:
+    tracemalloc.start()
+    for round_ in range(DELETIONS_PER_CHANNEL):
+        for channel_id in range(CHANNELS):
+            store.add(channel_id, DeletedMessage(channel_id, f"user{channel_id}", f"{CONTENT}{channel_id}", 1_700_000_000.0 + round_))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def main() -> None:
+    for budget in (8 * 1024 * 1024, 32 * 1024 * 1024, 1024 * 1024 * 1024):
+        store = SnipeStore(memory_budget=budget)
+        traced = fill(store)
+        print(f"budget {budget / 2**20:7.0f} MiB: {len(store):6d} channels kept, "
+              f"accounted {store.size / 2**20:7.1f} MiB, traced {traced / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
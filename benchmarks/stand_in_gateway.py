@@ -0,0 +1,95 @@
+"""
+Local stand-in for Discord's API and gateway, to try the cluster launcher without a real bot.
+
+It recommends a number of shards, accepts any token, answers the few REST calls made at startup
+and completes the gateway handshake of every shard, then prints which shards have identified.
+
+Run from the repository root: python -m benchmarks.stand_in_gateway --shards 8
+Then, in another terminal: python launcher.py --api-base http://127.0.0.1:8765/api/v10
+"""
+
+import argparse
+import json
+
+from aiohttp import WSMsgType, web
+
+APPLICATION_ID = "100000000000000000"
+USER = {"id": APPLICATION_ID, "username": "Stand-in", "discriminator": "0000", "avatar": None, "bot": True}
+
+
+def json_response(data) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly "application/json", without charset
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+
+class StandInGateway:
+    def __init__(self, host: str, port: int, shards: int):
+        self.host = host
+        self.port = port
+        self.shards = shards
+        self.identified = set()
+
+    async def gateway_bot(self, request: web.Request) -> web.Response:
+        return json_response({
+            "url": f"ws://{self.host}:{self.port}/gateway",
+            "shards": self.shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}
+        })
+
+    async def current_user(self, request: web.Request) -> web.Response:
+        return json_response(USER)
+
+    async def application(self, request: web.Request) -> web.Response:
+        return json_response({
+            "id": APPLICATION_ID, "name": "Stand-in", "description": "", "icon": None, "bot_public": True,
+            "bot_require_code_grant": False, "owner": USER, "verify_key": "", "flags": 0
+        })
+
+    async def other(self, request: web.Request) -> web.Response:
+        # Command syncs and the like, which expect a list
+        return json_response([])
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": 41250}, "s": None, "t": None}))
+        shard = None
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            if payload["op"] == 1:  # Heartbeat
+                await ws.send_str(json.dumps({"op": 11, "d": None, "s": None, "t": None}))
+            elif payload["op"] == 2:  # Identify
+                shard = tuple(payload["d"].get("shard", (0, 1)))
+                self.identified.add(shard[0])
+                print(f"Shard {shard[0]}/{shard[1]} identified, {len(self.identified)}/{self.shards} shards connected")
+                await ws.send_str(json.dumps({"op": 0, "s": 1, "t": "READY", "d": {
+                    "v": 10, "user": USER, "guilds": [], "session_id": f"stand-in-{shard[0]}",
+                    "resume_gateway_url": f"ws://{self.host}:{self.port}/gateway", "shard": list(shard),
+                    "application": {"id": APPLICATION_ID, "flags": 0}
+                }}))
+            elif payload["op"] == 6:  # Resume, always refused so that the shard identifies again
+                await ws.send_str(json.dumps({"op": 9, "d": False, "s": None, "t": None}))
+        if shard is not None:
+            self.identified.discard(shard[0])
+            print(f"Shard {shard[0]}/{shard[1]} disconnected")
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/v10/gateway/bot", self.gateway_bot)
+        app.router.add_get("/api/v10/users/@me", self.current_user)
+        app.router.add_get("/api/v10/oauth2/applications/@me", self.application)
+        app.router.add_get("/gateway", self.gateway)
+        app.router.add_route("*", "/api/v10/{path:.*}", self.other)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for Discord's API and gateway.")
+    parser.add_argument("--shards", type=int, default=8, help="number of shards to recommend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    arguments = parser.parse_args()
+    web.run_app(StandInGateway(arguments.host, arguments.port, arguments.shards).app(), host=arguments.host, port=arguments.port)
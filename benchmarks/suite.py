@@ -0,0 +1,267 @@
+"""
+Offline benchmark suite of db_manager, the checks and the cogs, writing its results as JSON.
+
+Every benchmark runs against a temporary database and the fake discord.py objects of
+benchmarks.fakes, so no token nor network is needed. The database benchmarks are repeated for
+several table sizes. Pass the results of a previous run with --compare to spot regressions.
+
+Run from the repository root: python -m benchmarks.suite [--sizes 1000 100000] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import aiosqlite
+
+from benchmarks.fakes import FakeBot, FakeContext, FakeGuild, FakeInteraction, FakeMessage, FakeUser
+from cogs.giveaway import Giveaway
+from cogs.snipe import DeletedMessage, SnipeStore
+from cogs.ticket import CloseClaimView, TicketRegistry, TicketView
+from helpers import checks, db_manager, migrations
+from helpers.rate_limit import RateLimiter
+from helpers.transcripts import TranscriptArchiver
+
+SIZES = (1_000, 10_000, 100_000)  # Rows of each table in the database benchmarks
+OPERATIONS = 500  # Timed calls per benchmark
+SERVERS = 10
+USERS = 1_000
+ENDED_GIVEAWAYS_ENTRANTS = 1_000  # Entrants of each giveaway ended by the giveaway benchmark
+WINNERS = 10
+TICKET_MESSAGES = 50  # Messages of each ticket closed by the ticket benchmark
+OWNER_ID = 1
+REGRESSION_THRESHOLD = 0.9  # Throughput ratio below which a benchmark is reported as a regression
+
+
+async def measure(results: List[Dict[str, Any]], name: str, operation: Callable[[int], Any], size: Optional[int] = None, count: int = OPERATIONS, concurrency: int = 1) -> None:
+    """
+    Times each call of an operation and appends the throughput and latency percentiles to the results.
+
+    :param name: The name of the benchmark.
+    :param operation: A function called with the index of the call, which may return an awaitable.
+    :param size: The size of the tables the benchmark ran against, if relevant.
+    :param count: The number of timed calls.
+    :param concurrency: The number of calls running at the same time, like concurrent commands would.
+    """
+    timings = []
+
+    async def call(index: int) -> None:
+        call_started = time.perf_counter()
+        result = operation(index)
+        if inspect.isawaitable(result):
+            await result
+        timings.append(time.perf_counter() - call_started)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        for index in range(count):
+            await call(index)
+    else:
+        name = f"{name} x{concurrency}"
+        for first in range(0, count, concurrency):
+            await asyncio.gather(*(call(index) for index in range(first, min(count, first + concurrency))))
+    total = time.perf_counter() - started
+    timings.sort()
+    result = {
+        "name": name,
+        "size": size,
+        "operations": count,
+        "ops_per_second": count / total,
+        "mean_us": total / count * 1e6,
+        "p50_us": timings[count // 2] * 1e6,
+        "p95_us": timings[min(count - 1, int(count * 0.95))] * 1e6,
+        "max_us": timings[-1] * 1e6
+    }
+    results.append(result)
+    label = f"{name} [{size}]" if size is not None else name
+    print(f"{label:40s} {result['ops_per_second']:10.0f} ops/s   p50 {result['p50_us']:9.1f} us   p95 {result['p95_us']:9.1f} us")
+
+
+def populate(path: str, size: int) -> None:
+    # Fills the tables directly, much faster than going through db_manager
+    rng = random.Random(size)
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) VALUES (?, ?, ?, ?, ?)",
+        ((i, rng.randrange(USERS), rng.randrange(SERVERS), OWNER_ID, "reason") for i in range(size))
+    )
+    db.executemany("INSERT INTO blacklist(user_id) VALUES (?)", ((10 ** 9 + i,) for i in range(size)))
+    db.execute("INSERT INTO giveaways(message_id, server_id, channel_id, host_id, prize, winners, ends_at, entrant_count) VALUES (1, 1, 1, 1, 'prize', ?, 0, ?)", (WINNERS, size))
+    db.executemany("INSERT INTO giveaway_entrants(giveaway_id, user_id, slot) VALUES (1, ?, ?)", ((i + 1, i) for i in range(size)))
+    db.commit()
+    db.close()
+
+
+async def open_database(directory: str, name: str, size: int = 0) -> None:
+    path = os.path.join(directory, f"{name}.db")
+    async with aiosqlite.connect(path) as db:
+        await migrations.migrate(db)
+    populate(path, size)
+    await db_manager.connect(path)
+
+
+async def database_benchmarks(results: List[Dict[str, Any]], directory: str, size: int) -> None:
+    await open_database(directory, f"database-{size}", size)
+    rng = random.Random(0)
+    try:
+        await measure(results, "db.is_blacklisted", lambda i: db_manager.is_blacklisted(rng.choice((i, 10 ** 9 + i))), size)
+        await measure(results, "db.add_user_to_blacklist", lambda i: db_manager.add_user_to_blacklist(2 * 10 ** 9 + i), size)
+        await measure(results, "db.add_users_to_blacklist", lambda i: db_manager.add_users_to_blacklist(list(range(3 * 10 ** 9 + i * 1_000, 3 * 10 ** 9 + (i + 1) * 1_000))), size, count=OPERATIONS // 10)
+        await measure(results, "db.get_warnings", lambda i: db_manager.get_warnings(rng.randrange(USERS), rng.randrange(SERVERS)), size)
+        await measure(results, "db.get_warnings_page", lambda i: db_manager.get_warnings_page(rng.randrange(USERS), rng.randrange(SERVERS), 0, 10), size)
+        await measure(results, "db.get_top_warned_users", lambda i: db_manager.get_top_warned_users(rng.randrange(SERVERS)), size, count=OPERATIONS // 10)
+        await measure(results, "db.add_warn", lambda i: db_manager.add_warn(rng.randrange(USERS), rng.randrange(SERVERS), OWNER_ID, "reason"), size)
+        # Sequential writes each get their own commit, concurrent ones share the commits
+        await measure(results, "db.add_warn", lambda i: db_manager.add_warn(rng.randrange(USERS), rng.randrange(SERVERS), OWNER_ID, "reason"), size, concurrency=50)
+        await measure(results, "db.add_giveaway_entrant", lambda i: db_manager.add_giveaway_entrant(1, 10 ** 9 + i), size)
+        await measure(results, "db.draw_giveaway_entrants", lambda i: db_manager.draw_giveaway_entrants(1, WINNERS), size)
+        await measure(results, "db.get_state", lambda i: db_manager.get_state("command_tree"), size)
+    finally:
+        await db_manager.close()
+
+
+async def check_benchmarks(results: List[Dict[str, Any]], directory: str) -> None:
+    await open_database(directory, "checks")
+    guild = FakeGuild()
+    bot = FakeBot(guild, owners=[OWNER_ID])
+    channel = guild.add_channel()
+    contexts = [FakeContext(bot, FakeUser(user_id), channel) for user_id in range(OPERATIONS)]
+    not_blacklisted = checks.not_blacklisted().predicate
+    is_owner = checks.is_owner().predicate
+    not_rate_limited = checks.not_rate_limited(RateLimiter(5, 10.0)).predicate
+
+    async def check_owner(context: FakeContext) -> None:
+        try:
+            await is_owner(context)
+        except checks.UserNotOwner:
+            pass
+
+    try:
+        await measure(results, "check.not_blacklisted", lambda i: not_blacklisted(contexts[i]))
+        await measure(results, "check.is_owner", lambda i: check_owner(contexts[i]))
+        await measure(results, "check.not_rate_limited", lambda i: not_rate_limited(contexts[i]))
+        # Settings of 100 guilds, the first lookup of each one reading the database
+        await measure(results, "guild_settings.get", lambda i: bot.guild_settings.get(i % 100))
+    finally:
+        await db_manager.close()
+
+
+async def snipe_benchmarks(results: List[Dict[str, Any]]) -> None:
+    guild = FakeGuild()
+    channels = [guild.add_channel() for _ in range(100)]
+    author = FakeUser(1)
+    messages = [FakeMessage(i, author, channels[i % len(channels)], "deleted message " * 8) for i in range(OPERATIONS)]
+    store = SnipeStore()
+    await measure(results, "snipe.store", lambda i: store.add(messages[i].channel.id, DeletedMessage.from_message(messages[i])))
+    await measure(results, "snipe.retrieve", lambda i: store.get(channels[i % len(channels)].id, i % 3))
+
+
+async def ticket_benchmarks(results: List[Dict[str, Any]], directory: str) -> None:
+    await open_database(directory, "tickets")
+    guild = FakeGuild()
+    bot = FakeBot(guild)
+    channel = guild.add_channel()
+    registry = TicketRegistry()
+    archiver = TranscriptArchiver(os.path.join(directory, "transcripts"))
+    view = TicketView(registry, archiver)
+    close_view = CloseClaimView(registry, archiver)
+    try:
+        await measure(results, "ticket.create", lambda i: view.create_ticket(FakeInteraction(bot, FakeUser(i + 1), channel), "support"))
+        await measure(results, "ticket.create_duplicate", lambda i: view.create_ticket(FakeInteraction(bot, FakeUser(i + 1), channel), "support"))
+        tickets = []
+        for channel_id, (_, user_id, _) in list(registry._keys.items())[:OPERATIONS // 10]:
+            ticket = guild.get_channel(channel_id)
+            for index in range(TICKET_MESSAGES):
+                await ticket.send(f"message {index} of the ticket")
+            tickets.append(FakeInteraction(bot, FakeUser(user_id), ticket))
+        await measure(results, "ticket.close", lambda i: close_view.close_button.callback(tickets[i]), TICKET_MESSAGES, len(tickets))
+    finally:
+        await db_manager.close()
+
+
+async def giveaway_benchmarks(results: List[Dict[str, Any]], directory: str) -> None:
+    count = OPERATIONS // 10  # Each one creates a channel per winner
+    path = os.path.join(directory, "giveaways.db")
+    async with aiosqlite.connect(path) as db:
+        await migrations.migrate(db)
+    guild = FakeGuild(members=ENDED_GIVEAWAYS_ENTRANTS)
+    channel = guild.add_channel()
+    message_ids = []
+    for _ in range(count):
+        message = await channel.send("giveaway")
+        message_ids.append(message.id)
+    db = sqlite3.connect(path)
+    for message_id in message_ids:
+        db.execute("INSERT INTO giveaways(message_id, server_id, channel_id, host_id, prize, winners, ends_at, entrant_count) VALUES (?, ?, ?, 1, 'prize', ?, 0, ?)", (message_id, guild.id, channel.id, WINNERS, ENDED_GIVEAWAYS_ENTRANTS))
+        db.executemany("INSERT INTO giveaway_entrants(giveaway_id, user_id, slot) VALUES (?, ?, ?)", ((message_id, i + 1, i) for i in range(ENDED_GIVEAWAYS_ENTRANTS)))
+    db.commit()
+    db.close()
+    await db_manager.connect(path)
+    cog = Giveaway(FakeBot(guild))
+    try:
+        await measure(results, "giveaway.end", lambda i: cog.end_giveaway(message_ids[i]), ENDED_GIVEAWAYS_ENTRANTS, count)
+    finally:
+        await db_manager.close()
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], path: str) -> None:
+    with open(path) as file:
+        previous = {(result["name"], result["size"]): result for result in json.load(file)["results"]}
+    print(f"\nCompared with {path}:")
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        if old is None:
+            continue
+        ratio = result["ops_per_second"] / old["ops_per_second"]
+        flag = "  <-- regression" if ratio < REGRESSION_THRESHOLD else ""
+        label = f"{result['name']} [{result['size']}]" if result["size"] is not None else result["name"]
+        print(f"{label:40s} x{ratio:5.2f}{flag}")
+
+
+async def main(sizes: List[int], output: str, previous: Optional[str]) -> None:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            await database_benchmarks(results, directory, size)
+        await check_benchmarks(results, directory)
+        await snipe_benchmarks(results)
+        await ticket_benchmarks(results, directory)
+        await giveaway_benchmarks(results, directory)
+    report = {
+        "commit": current_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results
+    }
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+    if previous:
+        compare(results, previous)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite of db_manager, the checks and the cogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="table sizes of the database benchmarks")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run to compare with")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.sizes, arguments.output, arguments.compare))
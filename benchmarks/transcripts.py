@@ -0,0 +1,107 @@
+"""
+Archives synthetic ticket channels of growing sizes and reports the time, the peak memory and
+the size of their transcripts, then closes several tickets at once to show the concurrency limit.
+
+The messages of the channels are generated page by page when their history is fetched, so the
+peak memory traced by tracemalloc is only the one of the archiver. Each history request goes
+through a started outbound scheduler, as in the bot, and takes a fake round trip to Discord. Since
+the pages of a channel are fetched one after another, the time of an archive is mostly its number
+of pages times the round trip, on top of which Discord's rate limit of the route may add waits.
+
+Run from the repository root: python -m benchmarks.transcripts [--sizes 50 10000 200000] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import gzip
+import tempfile
+import time
+import tracemalloc
+from typing import AsyncIterator, Optional
+
+import discord
+
+from benchmarks.fakes import FakeChannel, FakeGuild, FakeMessage, FakeUser
+from helpers.outbound import OutboundScheduler
+from helpers.transcripts import TranscriptArchiver
+
+SIZES = (50, 10_000, 200_000)
+CONCURRENT_CLOSES = 6
+CONCURRENT_SIZE = 5_000  # Messages of each ticket closed at the same time
+FIRST_MESSAGE_ID = 10 ** 15
+AUTHORS = [FakeUser(user_id) for user_id in range(1, 4)]  # The owner of the ticket and two moderators
+
+
+class SyntheticChannel(FakeChannel):
+    def __init__(self, guild: FakeGuild, size: int):
+        super().__init__(guild.next_id(), guild, "support-user1")
+        self.size = size
+
+    async def history(self, limit: Optional[int] = 100, after: discord.abc.Snowflake = None, oldest_first: bool = True) -> AsyncIterator[FakeMessage]:
+        await self.guild.request("history")
+        start = max(after.id + 1 - FIRST_MESSAGE_ID, 0) if after is not None else 0
+        for index in range(start, min(self.size, start + limit)):
+            yield FakeMessage(FIRST_MESSAGE_ID + index, AUTHORS[index % len(AUTHORS)], self, f"message {index} of the ticket, asking about the order " * 2)
+
+
+class TrackingArchiver(TranscriptArchiver):
+    # Counts the archives holding the semaphore at the same time
+    running = 0
+    most_running = 0
+
+    async def _fetch_page(self, channel, after):
+        TrackingArchiver.running += after == 0
+        TrackingArchiver.most_running = max(TrackingArchiver.most_running, TrackingArchiver.running)
+        page = await super()._fetch_page(channel, after)
+        TrackingArchiver.running -= len(page) < self.page_size
+        return page
+
+
+async def archive(directory: str, size: int, latency: float) -> None:
+    guild = FakeGuild(latency=latency)
+    channel = SyntheticChannel(guild, size)
+    archiver = TranscriptArchiver(directory)
+    outbound = OutboundScheduler()
+    outbound.start()
+    tracemalloc.start()
+    started = time.perf_counter()
+    transcript = await archiver.archive(channel, outbound)
+    elapsed = time.perf_counter() - started
+    await outbound.stop()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with gzip.open(archiver.resolve(transcript.path), "rt", encoding="utf-8") as file:
+        lines = sum(1 for _ in file)
+    assert lines == transcript.message_count == size
+    print(
+        f"{size:8d} messages: {elapsed:7.2f} s, {size / elapsed:8.0f} messages/s, peak {peak / 2 ** 10:8.1f} KiB, "
+        f"{transcript.size / 2 ** 10:8.1f} KiB compressed, {guild.calls['history']} history requests of {latency * 1e3:.0f} ms"
+    )
+
+
+async def concurrent_closes(directory: str, latency: float) -> None:
+    guild = FakeGuild(latency=latency)
+    archiver = TrackingArchiver(directory)
+    channels = [SyntheticChannel(guild, CONCURRENT_SIZE) for _ in range(CONCURRENT_CLOSES)]
+    outbound = OutboundScheduler()
+    outbound.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(archiver.archive(channel, outbound) for channel in channels))
+    elapsed = time.perf_counter() - started
+    await outbound.stop()
+    print(f"{CONCURRENT_CLOSES} tickets of {CONCURRENT_SIZE} messages closed at once: {elapsed:.2f} s, at most {TrackingArchiver.most_running} archived at the same time")
+
+
+async def main(sizes, latency: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            await archive(directory, size, latency)
+        await concurrent_closes(directory, latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory of the ticket transcripts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="messages of the archived channels")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds of each history request")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.sizes, arguments.latency))
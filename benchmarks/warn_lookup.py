@@ -0,0 +1,79 @@
+"""
+Measures warn lookups on a 1M row warns table before and after the integer keys migration.
+
+Run from the repository root: python -m benchmarks.warn_lookup
+"""
+
+import asyncio
+import random
+import sqlite3
+import tempfile
+import time
+
+import aiosqlite
+
+from helpers import migrations
+
+ROWS = 1_000_000
+SERVERS = 100
+USERS = 5_000
+LOOKUPS = 200
+
+
+def populate(path: str) -> None:
+    db = sqlite3.connect(path)
+    rng = random.Random(0)
+    rows = (
+        (i, str(rng.randrange(USERS)), str(rng.randrange(SERVERS)), "1", "reason")
+        for i in range(ROWS)
+    )
+    db.executemany("INSERT INTO warns(id, user_id, server_id, moderator_id, reason) VALUES (?, ?, ?, ?, ?)", rows)
+    db.commit()
+    db.close()
+
+
+def measure(path: str) -> float:
+    db = sqlite3.connect(path)
+    rng = random.Random(1)
+    keys = [(rng.randrange(USERS), rng.randrange(SERVERS)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for user_id, server_id in keys:
+        db.execute("SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE user_id=? AND server_id=?", (user_id, server_id)).fetchall()
+        db.execute("SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?", (user_id, server_id)).fetchone()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed / LOOKUPS
+
+
+async def upgrade(path: str, version: int = None) -> None:
+    async with aiosqlite.connect(path) as db:
+        if version is None:
+            await migrations.migrate(db)
+            return
+        for number, script in migrations.list_migrations():
+            if number <= version:
+                with open(script) as file:
+                    await db.executescript(file.read())
+        await db.execute(f"PRAGMA user_version = {version}")
+        await db.commit()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/bench.db"
+        asyncio.run(upgrade(path, version=1))
+        populate(path)
+        before = measure(path)
+        start = time.perf_counter()
+        asyncio.run(upgrade(path))
+        migration = time.perf_counter() - start
+        after = measure(path)
+
+    print(f"rows            : {ROWS}")
+    print(f"before (v1)     : {before * 1e3:8.3f} ms/lookup")
+    print(f"after (latest)  : {after * 1e3:8.3f} ms/lookup")
+    print(f"migration time  : {migration:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
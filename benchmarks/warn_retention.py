@@ -0,0 +1,93 @@
+"""
+Runs the warn retention job on a synthetic database while warns keep being added, as commands
+would, and reports how long the additions waited, the lag of the event loop and the size of the
+database file before and after.
+
+Half of the warns are older than the retention, spread over 20 servers and inserted oldest first.
+
+Run from the repository root: python -m benchmarks.warn_retention [--warns 200000] [--pause 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import aiosqlite
+
+from benchmarks.fakes import FakeBot, FakeGuild
+from cogs import warnings
+from helpers import db_manager, migrations
+
+SERVERS = 20
+USERS = 5_000
+RETENTION_DAYS = 365
+PROBE_INTERVAL = 0.01  # Seconds between two warns added during the job
+
+
+def populate(path: str, count: int) -> None:
+    rng = random.Random(0)
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO warns(id, user_id, server_id, moderator_id, reason, created_at) VALUES (?, ?, ?, 1, ?, datetime('now', ?))",
+        # Oldest first, like the warns given over the last two years
+        ((i, rng.randrange(USERS), rng.randrange(SERVERS), "spamming the general channel again", f"-{(count - i) * 2 * RETENTION_DAYS * 86400 // count} seconds") for i in range(count))
+    )
+    db.commit()
+    db.close()
+
+
+def percentile(values: list, ratio: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def main(count: int, pause: float) -> None:
+    warnings.SLICE_PAUSE = pause
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "retention.db")
+        async with aiosqlite.connect(path) as db:
+            await migrations.migrate(db)
+            await migrations.enable_incremental_vacuum(db)
+        populate(path, count)
+        size_before = os.path.getsize(path)
+        await db_manager.connect(path)
+        bot = FakeBot(FakeGuild())
+        bot.config["warn_retention_days"] = RETENTION_DAYS
+        cog = warnings.Warnings(bot)
+        latencies, lags = [], []
+        done = asyncio.Event()
+
+        async def add_warns() -> None:
+            rng = random.Random(1)
+            while not done.is_set():
+                started = time.perf_counter()
+                await db_manager.add_warn(rng.randrange(USERS), rng.randrange(SERVERS), 1, "reason")
+                latencies.append(time.perf_counter() - started)
+                expected = time.perf_counter() + PROBE_INTERVAL
+                await asyncio.sleep(PROBE_INTERVAL)
+                lags.append(max(0.0, time.perf_counter() - expected))
+
+        probe = asyncio.create_task(add_warns())
+        started = time.perf_counter()
+        archived = await cog.expire_warns()
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+        archive_rows = sum(1 for _ in [row async for row in db_manager.iter_archived_warns(0)])
+        await db_manager.close()
+        size_after = os.path.getsize(path)
+    print(f"{count} warns, {archived} archived in {elapsed:.1f} s ({archived / elapsed:.0f} warns/s), {archive_rows} of them from server 0 read back")
+    print(f"warns added meanwhile: {len(latencies)}, p50 {percentile(latencies, 0.5) * 1e3:.1f} ms, p99 {percentile(latencies, 0.99) * 1e3:.1f} ms, max {max(latencies) * 1e3:.1f} ms")
+    print(f"event loop lag: p99 {percentile(lags, 0.99) * 1e3:.1f} ms, max {max(lags) * 1e3:.1f} ms")
+    print(f"database file: {size_before / 2 ** 20:.1f} MiB before, {size_after / 2 ** 20:.1f} MiB after")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of the warn retention job for concurrent commands.")
+    parser.add_argument("--warns", type=int, default=200_000)
+    parser.add_argument("--pause", type=float, default=0.02, help="seconds between two writes of the job")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.warns, arguments.pause))
@@ -0,0 +1,75 @@
+"""
+Imports and exports the blacklist of the bot from the command line, e.g. to load a shared ban list.
+
+Both directions are streamed in chunks, so memory stays flat whatever the size of the file. The
+running clusters of the bot only see an import once an owner runs /blacklist reload.
+
+Usage: python blacklist_tool.py [--database PATH] import FILE [--chunk-size N]
+       python blacklist_tool.py [--database PATH] export FILE [--format csv|jsonl]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import AsyncIterator
+
+import aiosqlite
+
+from helpers import blacklist_io, db_manager, migrations
+
+
+async def read_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            yield line
+
+
+async def open_database(path: str) -> None:
+    async with aiosqlite.connect(path) as db:
+        await migrations.migrate(db)
+    await db_manager.connect(path)
+
+
+async def run_import(path: str, database: str, chunk_size: int) -> None:
+    started = time.perf_counter()
+
+    async def progress(result: blacklist_io.ImportResult) -> None:
+        print(f"\r{result}", end="", file=sys.stderr, flush=True)
+
+    await open_database(database)
+    try:
+        result = await blacklist_io.import_blacklist(read_lines(path), chunk_size, progress)
+    finally:
+        await db_manager.close()
+    print(f"\nImported {path} in {time.perf_counter() - started:.1f} s: {result}", file=sys.stderr)
+
+
+async def run_export(path: str, database: str, format_: str) -> None:
+    count = 0
+    await open_database(database)
+    try:
+        with open(path, "w", encoding="utf-8") as file:
+            async for line in blacklist_io.export_blacklist(format_):
+                file.write(line)
+                count += 1
+    finally:
+        await db_manager.close()
+    print(f"Exported {count - (format_ == 'csv')} blacklisted users to {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import and export of the blacklist.")
+    parser.add_argument("--database", default=db_manager.DATABASE_PATH, help="the database of the bot by default")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="blacklist every user ID of a CSV or JSONL file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--chunk-size", type=int, default=blacklist_io.CHUNK_SIZE, help="IDs inserted per transaction")
+    export_parser = commands.add_parser("export", help="write the blacklist to a CSV or JSONL file")
+    export_parser.add_argument("file")
+    export_parser.add_argument("--format", choices=blacklist_io.FORMATS, default=None, help="guessed from the file extension by default")
+    arguments = parser.parse_args()
+    if arguments.command == "import":
+        asyncio.run(run_import(arguments.file, arguments.database, arguments.chunk_size))
+    else:
+        asyncio.run(run_export(arguments.file, arguments.database, arguments.format or ("jsonl" if arguments.file.endswith(".jsonl") else "csv")))
@@ -1,4 +1,10 @@
+import time
+
+# Taken before the other imports so that the startup breakdown includes them
+startup_started = time.perf_counter()
+
 import asyncio
+import hashlib
 import json
 import os
 import platform
@@ -8,41 +14,206 @@ import io
 
 import aiosqlite
 import discord
+import yarl
 from discord.ext import commands, tasks
-from discord.ext.commands import Bot, Context
+from discord.ext.commands import AutoShardedBot, Context
 
 import exceptions
+from helpers import cache_profile, checks, db_manager, migrations
+from helpers.config import Config
+from helpers.guild_settings import GuildSettingsCache
+from helpers.ipc import IPCClient
+from helpers.message_filter import MessageFilter
+from helpers.metrics import MetricsExporter, metrics
+from helpers.outbound import OutboundScheduler
+from helpers.rate_limit import RateLimiter
+
+startup_timings = {"imports": time.perf_counter() - startup_started}
 
 # Ensure the configuration file exists
 config_path = f"{os.path.realpath(os.path.dirname(__file__))}/config.json"
 if not os.path.isfile(config_path):
     sys.exit("'config.json' not found! Please add it and try again.")
 else:
-    with open(config_path) as file:
-        config = json.load(file)
+    config = Config(config_path)
+
+# Set up the Discord intents and the caches from the "cache_profile" of the configuration
+cache_settings = cache_profile.resolve(config)
+
+# Set by launcher.py when the bot runs as one cluster of a sharded deployment, otherwise a single
+# process runs every shard recommended by Discord
+cluster_id = int(os.environ.get("BOT_CLUSTER_ID", 0))
+shard_ids = [int(shard_id) for shard_id in os.environ["BOT_SHARD_IDS"].split(",")] if os.environ.get("BOT_SHARD_IDS") else None
+shard_count = int(os.environ["BOT_SHARD_COUNT"]) if os.environ.get("BOT_SHARD_COUNT") else None
+ipc_port = int(os.environ["BOT_IPC_PORT"]) if os.environ.get("BOT_IPC_PORT") else None
+# Lets the launcher point the clusters to a stand-in gateway for local testing
+if os.environ.get("BOT_API_BASE"):
+    discord.http.Route.BASE = os.environ["BOT_API_BASE"]
+if os.environ.get("BOT_GATEWAY_URL"):
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(os.environ["BOT_GATEWAY_URL"])
+
+class DiscordBot(AutoShardedBot):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.outbound = OutboundScheduler()  # Priority queue shared by the cogs for their requests
+        self.ipc = IPCClient(cluster_id, ipc_port) if ipc_port is not None else None  # Link to the other clusters
+        self.metrics_exporter = MetricsExporter()
+        self.message_filter = MessageFilter([config["prefix"]])  # Cogs handling other message commands register triggers on it
+        self.guild_settings = GuildSettingsCache()  # Prefix, ticket category and giveaway defaults of each guild
+        self.message_filter.add_trigger(self.has_guild_prefix)
+        rate_limit = config.get("rate_limit")
+        self.rate_limiter = RateLimiter(rate_limit["commands"], rate_limit["seconds"]) if rate_limit else None  # Commands per user, bot-wide
+
+    def has_guild_prefix(self, message: discord.Message) -> bool:
+        """
+        Trigger of the message filter letting through the messages starting with the custom prefix of their guild.
+        :param message: The received message.
+        """
+        if message.guild is None:
+            return False
+        settings = self.guild_settings.peek(message.guild.id)
+        if settings is None:
+            return True  # Not loaded yet, resolving the prefix of this message loads them
+        return settings.prefix is not None and message.content.startswith(settings.prefix)
+
+    def owns_guild(self, guild_id: int) -> bool:
+        """
+        Whether the guild belongs to one of the shards of this cluster, i.e. whether this cluster receives its events.
+        :param guild_id: The ID of the guild.
+        """
+        if self.shard_ids is None or self.shard_count is None:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    async def broadcast(self, op: str, data=None) -> None:
+        """
+        Sends an operation to the other clusters, does nothing when the bot runs alone.
+        :param op: The name of the operation.
+        :param data: The JSON serializable data of the operation.
+        """
+        if self.ipc is not None:
+            await self.ipc.broadcast(op, data)
+
+    async def connect_ipc(self) -> None:
+        """
+        Connects to the launcher and applies the cluster-wide changes made by the other clusters.
+        """
+        async def on_blacklist(data) -> None:
+            if data["action"] == "add":
+                db_manager.blacklist.add(data["user_id"])
+            elif data["action"] == "remove":
+                db_manager.blacklist.discard(data["user_id"])
+            else:  # A bulk change, the clusters share the database
+                await db_manager.load_blacklist()
+
+        async def on_reload(extension) -> None:
+            await self.reload_extension(f"cogs.{extension}")
+            print(f"Reloaded extension '{extension}' on request of another cluster")
+
+        async def share_blacklist_change(action: str, user_id: int) -> None:
+            await self.broadcast("blacklist", {"action": action, "user_id": user_id})
+
+        self.ipc.on("blacklist", on_blacklist)
+        self.ipc.on("reload", on_reload)
+        db_manager.blacklist_listeners.append(share_blacklist_change)
+        await self.ipc.connect()
 
-# Set up Discord intents
-intents = discord.Intents.default()
-intents.message_content = True
+    async def setup_hook(self) -> None:
+        """
+        Initializes the database, starts the background work and loads the cogs once the bot has logged in.
+        """
+        started = time.perf_counter()
+        startup_timings["login"] = started - startup_timings.pop("run_started")
+        self.message_filter.set_user(self.user.id)
+        await init_db()
+        await db_manager.connect()
+        if await db_manager.backfill_archived_warn_ids():
+            print("Recorded the warn IDs of the archived warns")
+        startup_timings["database"] = time.perf_counter() - started
+        self.outbound.start()
+        if self.ipc is not None:
+            await self.connect_ipc()
+        metrics.add_gauges("outbound", self.outbound.metrics)
+        metrics.add_gauges("message_filter", lambda: {"passed": self.message_filter.passed, "rejected": self.message_filter.rejected})
+        metrics.add_gauges("blacklist_cache", lambda: {"hits": db_manager.blacklist.hits, "misses": db_manager.blacklist.misses, "size": len(db_manager.blacklist)})
+        # Every cluster serves its own metrics, on the port following the one of the previous cluster
+        metrics_port = config.get("metrics_port")
+        await self.metrics_exporter.start(metrics_port + cluster_id if metrics_port else None)
+        if config.get("metrics_log_interval"):
+            metrics_summary_task.change_interval(seconds=config["metrics_log_interval"])
+            metrics_summary_task.start()
+        config_reload_task.start()
+        started = time.perf_counter()
+        await load_cogs()
+        startup_timings["cogs"] = time.perf_counter() - started
+        startup_timings["setup_done"] = time.perf_counter()
+
+    async def close(self) -> None:
+        """
+        Stops the outbound scheduler, leaves the cluster and closes the database connection pool when the bot shuts down.
+        """
+        await super().close()
+        await self.outbound.stop()
+        await self.metrics_exporter.stop()
+        if self.ipc is not None:
+            await self.ipc.close()
+        await db_manager.close()
+
+# Resolve the prefix of each message, from the cached settings of its guild
+async def get_prefix(bot: DiscordBot, message: discord.Message) -> list:
+    prefix = None
+    if message.guild is not None:
+        settings = bot.guild_settings.peek(message.guild.id) or await bot.guild_settings.get(message.guild.id)
+        prefix = settings.prefix
+    return commands.when_mentioned_or(prefix or config["prefix"])(bot, message)
 
 # Create bot instance
-bot = Bot(command_prefix=commands.when_mentioned_or(config["prefix"]), intents=intents, help_command=None)
+bot = DiscordBot(command_prefix=get_prefix, help_command=None, shard_ids=shard_ids, shard_count=shard_count, **cache_profile.client_options(cache_settings))
 
-# Initialize the database
+# Initialize the database and upgrade its schema to the latest version
 async def init_db():
-    db_path = f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
-    schema_path = f"{os.path.realpath(os.path.dirname(__file__))}/database/schema.sql"
-    async with aiosqlite.connect(db_path) as db:
-        with open(schema_path) as file:
-            await db.executescript(file.read())
-        await db.commit()
+    async with aiosqlite.connect(db_manager.DATABASE_PATH) as db:
+        version = await migrations.migrate(db)
+        if not await migrations.is_incremental_vacuum_enabled(db):
+            # Switching rewrites the whole database under an exclusive lock, so it is left to an offline run
+            print("Incremental vacuum is not enabled yet, the warn retention job cannot shrink the database. Run 'python -m helpers.migrations --incremental-vacuum' while the bot is stopped")
+    print(f"Database schema at version {version}")
 
 bot.config = config
 
+# Limit the commands of each user bot-wide, before any other check runs
+if bot.rate_limiter is not None:
+    bot.add_check(checks.not_rate_limited(bot.rate_limiter).predicate, call_once=True)
+
+# Sync the application commands, only when they changed since the last sync
+async def sync_commands(guild: discord.abc.Snowflake = None) -> bool:
+    if guild is not None:
+        bot.tree.copy_global_to(guild=guild)
+    # Cogs load concurrently, so the commands are sorted to get the same fingerprint on every start
+    commands_payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=guild)), key=lambda payload: (payload["type"], payload["name"]))
+    fingerprint = hashlib.sha256(json.dumps(commands_payload, sort_keys=True).encode()).hexdigest()
+    key = f"command_tree:{bot.application_id}:{guild.id if guild is not None else 'global'}"
+    if await db_manager.get_state(key) == fingerprint:
+        print("Commands unchanged since the last sync, skipping")
+        return False
+    await bot.tree.sync(guild=guild)
+    await db_manager.set_state(key, fingerprint)
+    return True
+
 # Handle bot readiness event
 @bot.event
 async def on_ready() -> None:
+    if "setup_done" not in startup_timings:
+        return  # Fired again after a reconnection, the startup work has already been done
+    startup_timings["gateway"] = time.perf_counter() - startup_timings.pop("setup_done")
+    print("Startup: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items()))
+    print(f"Cluster {cluster_id} running shards {', '.join(map(str, sorted(bot.shards)))} of {bot.shard_count}")
+    await bot.broadcast("ready", {"cluster": cluster_id, "shards": sorted(bot.shards)})  # Lets the launcher start the next cluster
+    await load_lazy_cogs()
     status_task.start()
+    if config.get("dev_guild_id"):
+        print(f"Syncing commands to the development guild {config['dev_guild_id']}...")
+        await sync_commands(discord.Object(id=int(config["dev_guild_id"])))
     if config.get("sync_commands_globally", False):
         print(f"Logged in as {bot.user.name}")
         print(f"discord.py API version: {discord.__version__}")
@@ -53,7 +224,7 @@ async def on_ready() -> None:
         print(f" Description: Simple open source discord bot made with python ")
         print("-------------------")
         print("Syncing commands globally...")
-        await bot.tree.sync()
+        await sync_commands()
 
 # Define the status task
 @tasks.loop(minutes=1.0)
@@ -61,16 +232,42 @@ async def status_task() -> None:
     statuses = ["Status 1", "Made with 💗 by Dexik"]
     await bot.change_presence(activity=discord.Game(random.choice(statuses)))
 
+# Pick up edits of the configuration file without a restart
+@tasks.loop(seconds=5.0)
+async def config_reload_task() -> None:
+    try:
+        if config.reload_if_changed():
+            bot.message_filter.set_prefixes([config["prefix"]])  # The default prefix is read from the configuration on each message
+            print("Reloaded 'config.json'")
+    except (OSError, ValueError) as e:
+        print(f"Failed to reload 'config.json'\n{type(e).__name__}: {e}")
+
+# Log where the time goes: commands, queries and event loop lag
+@tasks.loop(minutes=5.0)
+async def metrics_summary_task() -> None:
+    summary = metrics.summary()
+    if summary:
+        print("Metrics summary:\n  " + "\n  ".join(summary))
+
 # Process commands
 @bot.event
 async def on_message(message: discord.Message) -> None:
     if message.author == bot.user or message.author.bot:
         return
+    if not bot.message_filter.should_process(message):
+        return  # Cannot be a command, skip building a Context
     await bot.process_commands(message)
 
+# Start timing the command, its checks included
+@bot.event
+async def on_command(context: Context) -> None:
+    context.started_at = time.perf_counter()
+
 # Handle command completion
 @bot.event
 async def on_command_completion(context: Context) -> None:
+    if hasattr(context, "started_at"):
+        metrics.observe_command(context.command.qualified_name, time.perf_counter() - context.started_at)
     full_command_name = context.command.qualified_name
     split = full_command_name.split(" ")
     executed_command = str(split[0])
@@ -82,7 +279,22 @@ async def on_command_completion(context: Context) -> None:
 # Handle command errors
 @bot.event
 async def on_command_error(context: Context, error) -> None:
-    if isinstance(error, commands.CommandOnCooldown):
+    if isinstance(error, commands.CommandNotFound) and lazy_extensions:
+        # The command may belong to a lazy cog that is not loaded yet
+        await load_lazy_cogs()
+        await bot.process_commands(context.message)
+        return
+    metrics.count_error(context.command.qualified_name if context.command else "unknown", getattr(error, "original", error))
+    if isinstance(error, exceptions.UserRateLimited):
+        if error.notify:
+            embed = discord.Embed(
+                title="Slow down!",
+                description=f"You are sending commands too fast, try again in {max(1, round(error.retry_after))} s.",
+                color=0xE02B2B
+            )
+            await context.send(embed=embed, ephemeral=True, silent=True)
+        return  # Further refusals of the window are not answered
+    elif isinstance(error, commands.CommandOnCooldown):
         minutes, seconds = divmod(error.retry_after, 60)
         hours, minutes = divmod(minutes, 60)
         hours = hours % 24
@@ -129,20 +341,30 @@ async def on_command_error(context: Context, error) -> None:
         await context.send(embed=embed)
     raise error
 
+# Cogs listed in "lazy_cogs" are only loaded once the bot is ready, or on the first command they may own
+lazy_extensions = set()
+
+async def load_extension(extension: str) -> None:
+    try:
+        await bot.load_extension(f"cogs.{extension}")
+        print(f"Loaded extension '{extension}'")
+    except Exception as e:
+        exception = f"{type(e).__name__}: {e}"
+        print(f"Failed to load extension {extension}\n{exception}")
+
 # Load cogs
 async def load_cogs() -> None:
     cog_dir = f"{os.path.realpath(os.path.dirname(__file__))}/cogs"
-    for file in os.listdir(cog_dir):
-        if file.endswith(".py"):
-            extension = file[:-3]
-            try:
-                await bot.load_extension(f"cogs.{extension}")
-                print(f"Loaded extension '{extension}'")
-            except Exception as e:
-                exception = f"{type(e).__name__}: {e}"
-                print(f"Failed to load extension {extension}\n{exception}")
-
-# Initialize database and load cogs
-asyncio.run(init_db())
-asyncio.run(load_cogs())
+    lazy = set(config.get("lazy_cogs", []))
+    extensions = [file[:-3] for file in sorted(os.listdir(cog_dir)) if file.endswith(".py")]
+    lazy_extensions.update(extension for extension in extensions if extension in lazy)
+    await asyncio.gather(*(load_extension(extension) for extension in extensions if extension not in lazy))
+
+async def load_lazy_cogs() -> None:
+    extensions = list(lazy_extensions)
+    lazy_extensions.clear()
+    await asyncio.gather(*(load_extension(extension) for extension in extensions))
+
+# Everything else happens in setup_hook, on the event loop of the bot
+startup_timings["run_started"] = time.perf_counter()
 bot.run(config["token"])
@@ -1,7 +1,16 @@
-import discord, random, asyncio
+import discord, asyncio
 from discord.ext import commands
 from discord import app_commands
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from helpers import db_manager
+from helpers.outbound import Priority
+from helpers.scheduler import DeadlineScheduler
+
+WINNER_CHANNELS_CONCURRENCY = 5  # Winner channels created at the same time
+REACTION_PAGE_SIZE = 100  # Users fetched per request when reconciling the entrants
+RETRY_DELAY = 60  # Seconds before ending a giveaway again after a failure
 
 class Giveaway(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -10,30 +19,199 @@ class Giveaway(commands.Cog):
         :param bot: The bot instance.
         """
         self.bot = bot
-        self.giveaway_message_id = None
-        self.giveaway_channel_id = None
-        self.giveaway_entrants = []
-        self.giveaway_end_time = None
+        self.scheduler = DeadlineScheduler(self.end_giveaway)  # Ends each giveaway at its deadline
+        self.reconciles = {}  # Giveaways running while the bot was offline, with the task recording their missed entrants once started
+        self.reconciling = {}  # Users whose reaction changed while the reactions of each giveaway are read, by message ID
+        self.reconcile_task = None
+        self.ending = set()  # Giveaways whose winners are being announced
+
+    async def cog_load(self):
+        """
+        Resumes the giveaways that were still running when the bot stopped.
+        Each giveaway is ended by the cluster running the shard of its guild.
+        """
+        pending = sorted((ends_at, message_id) for message_id, server_id, ends_at in await db_manager.get_pending_giveaways() if self.bot.owns_guild(server_id))
+        for ends_at, message_id in pending:
+            self.scheduler.schedule(message_id, ends_at)
+            self.reconciles[message_id] = None
+        self.scheduler.start()
+        self.reconcile_task = asyncio.create_task(self.reconcile_entrants([message_id for _, message_id in pending]))
+
+    async def cog_unload(self):
+        """
+        Stops the giveaway scheduler. Running giveaways stay in the database.
+        """
+        if self.reconcile_task is not None:
+            self.reconcile_task.cancel()
+        for task in self.reconciles.values():
+            if task is not None:
+                task.cancel()
+        await self.scheduler.stop()
+
+    async def reconcile_entrants(self, message_ids: list):
+        """
+        Records the reactions added or removed on running giveaways while the bot was offline, the earliest deadlines first.
+        :param message_ids: The IDs of the giveaway messages, ordered by deadline.
+        """
+        for message_id in message_ids:
+            try:
+                await self.reconcile(message_id)
+            except Exception as e:
+                print(f"Failed to reconcile the entrants of giveaway {message_id}\n{type(e).__name__}: {e}")
+
+    def reconcile(self, message_id: int) -> asyncio.Task:
+        """
+        Starts reconciling a giveaway, unless it is already being reconciled.
+        :param message_id: The ID of the giveaway message, which must be in self.reconciles.
+        :return: The task reconciling the giveaway.
+        """
+        task = self.reconciles[message_id]
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):  # Retried after a failure
+            task = self.reconciles[message_id] = asyncio.create_task(self.reconcile_giveaway(message_id))
+        return task
+
+    async def reconcile_giveaway(self, message_id: int):
+        """
+        Records the reactions added or removed on a running giveaway while the bot was offline.
+        The requests go through the outbound scheduler as bulk work, one page of reactions at a time.
+        :param message_id: The ID of the giveaway message.
+        """
+        await self.bot.wait_until_ready()
+        giveaway = await db_manager.get_giveaway(message_id)
+        if giveaway is None or giveaway[7] != db_manager.GIVEAWAY_RUNNING:
+            return  # The winners are already drawn, the entrants do not change anymore
+        channel = await self.resolve_channel(giveaway[2])
+        if channel is None:
+            return
+        # The reaction events received meanwhile are more recent than the snapshot, their users are left as they are
+        changed = self.reconciling[message_id] = set()
+        try:
+            message = await self.bot.outbound.submit(f"channel:{channel.id}:messages", lambda: channel.fetch_message(message_id), Priority.BULK)
+            reaction = discord.utils.get(message.reactions, emoji="🎉")
+            user_ids = []
+            after = None
+            while reaction is not None:
+                page = await self.bot.outbound.submit(f"channel:{channel.id}:reactions", lambda: self.fetch_reaction_users(reaction, after), Priority.BULK)
+                user_ids.extend(user.id for user in page if not user.bot)
+                if len(page) < REACTION_PAGE_SIZE:
+                    break
+                after = page[-1]
+            await db_manager.sync_giveaway_entrants(message_id, user_ids, skip=changed)
+        except discord.HTTPException:
+            return  # The giveaway message is gone or cannot be read anymore
+        finally:
+            del self.reconciling[message_id]
+
+    async def fetch_reaction_users(self, reaction: discord.Reaction, after) -> list:
+        """
+        Fetches one page of the users who added a reaction, in a single request.
+        :param reaction: The reaction.
+        :param after: The last user of the previous page, None for the first page.
+        :return: The users of the page.
+        """
+        return [user async for user in reaction.users(limit=REACTION_PAGE_SIZE, after=after)]
+
+    async def resolve_channel(self, channel_id: int):
+        """
+        Gets a channel from the cache, or fetches it when the cache profile does not keep it.
+        :param channel_id: The ID of the channel.
+        :return: The channel, or None if it has been deleted or cannot be accessed anymore.
+        """
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            try:
+                channel = await self.bot.outbound.submit(f"channel:{channel_id}", lambda: self.bot.fetch_channel(channel_id))
+            except (discord.NotFound, discord.Forbidden):
+                return None
+        return channel
+
+    async def resolve_member(self, guild: discord.Guild, user_id: int):
+        """
+        Gets a member from the cache, or fetches it when the cache profile does not keep members.
+        :param guild: The guild of the member.
+        :param user_id: The ID of the member.
+        :return: The member, or None if they have left the guild.
+        """
+        member = guild.get_member(user_id)
+        if member is None:
+            try:
+                member = await self.bot.outbound.submit(f"guild:{guild.id}:members", lambda: guild.fetch_member(user_id))
+            except discord.NotFound:
+                return None
+        return member
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        """
+        Records a member entering a running giveaway.
+        :param payload: The raw reaction event.
+        """
+        if payload.message_id not in self.scheduler or str(payload.emoji) != "🎉":
+            return
+        if payload.member is not None and payload.member.bot:
+            return
+        self.reconciling.get(payload.message_id, set()).add(payload.user_id)
+        await db_manager.add_giveaway_entrant(payload.message_id, payload.user_id)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        """
+        Records a member leaving a running giveaway.
+        :param payload: The raw reaction event.
+        """
+        if payload.message_id not in self.scheduler or str(payload.emoji) != "🎉":
+            return
+        self.reconciling.get(payload.message_id, set()).add(payload.user_id)
+        await db_manager.remove_giveaway_entrant(payload.message_id, payload.user_id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """
+        Ends a running giveaway early when its message is deleted, as its winners could not be announced anyway.
+        :param payload: The raw message delete event.
+        """
+        await self.cancel_giveaways([payload.message_id])
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """
+        Ends the running giveaways whose messages are deleted in bulk.
+        :param payload: The raw bulk message delete event.
+        """
+        await self.cancel_giveaways(payload.message_ids)
+
+    async def cancel_giveaways(self, message_ids):
+        """
+        Unschedules the running giveaways among the given messages and marks them as ended.
+        :param message_ids: The IDs of the deleted messages.
+        """
+        for message_id in message_ids:
+            if message_id in self.scheduler:
+                self.scheduler.cancel(message_id)
+                await db_manager.mark_giveaway_ended(message_id)
 
     @commands.hybrid_command(name='startgiveaway', description='Start a giveaway.')
     @commands.has_permissions(administrator=True)
     @app_commands.describe(
-        time='Duration of the giveaway in seconds', 
+        time='Duration of the giveaway in seconds, the default of the server if not given', 
         prize='The prize for the giveaway', 
-        winners='Number of winners', 
+        winners='Number of winners, the default of the server if not given', 
         description='Description of the giveaway'
     )
-    async def start_giveaway(self, ctx: commands.Context, time: int, winners: int, prize: str, *, description: str = "Participate in the giveaway to win a great prize!"):
+    async def start_giveaway(self, ctx: commands.Context, time: Optional[int], winners: Optional[int], prize: str, *, description: str = "Participate in the giveaway to win a great prize!"):
         """
-        Command to start a giveaway.
+        Command to start a giveaway. With the prefix, leading numbers are taken as the duration then the number of winners,
+        so both `giveaway 60 1 Nitro` and `giveaway Nitro` work.
         :param ctx: The context of the command.
-        :param time: Duration of the giveaway in seconds.
-        :param winners: Number of winners.
+        :param time: Duration of the giveaway in seconds, see /settings giveaway for the default.
+        :param winners: Number of winners, see /settings giveaway for the default.
         :param prize: The prize for the giveaway.
         :param description: Description of the giveaway.
         """
-        end_time = datetime.utcnow() + timedelta(seconds=time)
-        self.giveaway_end_time = end_time
+        settings = await self.bot.guild_settings.get(ctx.guild.id)
+        time = time or settings.giveaway_duration
+        winners = winners or settings.giveaway_winners
+        end_time = datetime.now(timezone.utc) + timedelta(seconds=time)
 
         embed = discord.Embed(
             title="🎉 **GIVEAWAY** 🎉",  # Title of the giveaway embed
@@ -41,86 +219,136 @@ class Giveaway(commands.Cog):
             color=discord.Color.purple()
         )
         embed.add_field(name="Prize", value=prize, inline=False)  # Prize field
-        embed.add_field(name="Remaining Time", value=self.get_remaining_time_str(), inline=False)  # Time left for the giveaway
+        embed.add_field(name="Remaining Time", value=self.get_remaining_time_str(end_time), inline=False)  # Time left for the giveaway
         embed.add_field(name="Host", value=f"{ctx.author.mention}", inline=False)  # Host of the giveaway
         embed.add_field(name="Number of Winners", value=f"{winners}", inline=False)  # Number of winners
         embed.set_footer(text="React with 🎉 to participate!")  # Footer text
         embed.set_image(url="https://media.discordapp.net/attachments/1262355583437242409/1263093254329466880/fagagsdfgsdf.png?ex=6698fac2&is=6697a942&hm=c4a8372739481452038e5976a43efb0a284147fc4493205b4186e52203afc95b&=&format=webp&quality=lossless&width=810&height=222")  # Image for the giveaway embed
 
         # Send the giveaway message
-        await ctx.interaction.response.send_message(embed=embed)
+        await self.bot.outbound.submit(None, lambda: ctx.interaction.response.send_message(embed=embed), Priority.INTERACTION)
         message = await ctx.interaction.original_response()
-        await message.add_reaction("🎉")  # Add a reaction to the message
 
-        # Save giveaway details
-        self.giveaway_message_id = message.id
-        self.giveaway_channel_id = ctx.channel.id
-        self.giveaway_entrants = []
+        # Save giveaway details and schedule the giveaway to end, entrants are recorded from now on
+        ends_at = int(end_time.timestamp())
+        await db_manager.add_giveaway(message.id, ctx.guild.id, ctx.channel.id, ctx.author.id, prize, winners, ends_at)
+        self.scheduler.schedule(message.id, ends_at)
 
-        # Schedule the giveaway to end
-        await self.end_giveaway(time, prize, winners, ctx.channel.id, message.id)
-        return
+        await self.bot.outbound.submit(f"channel:{message.channel.id}:reactions", lambda: message.add_reaction("🎉"))  # Add a reaction to the message
 
-    def get_remaining_time_str(self):
+    def get_remaining_time_str(self, end_time: datetime = None):
         """
         Get the remaining time of the giveaway as a human-readable string.
+        :param end_time: The time at which the giveaway ends.
         :return: The remaining time in a Discord timestamp format or a message if the giveaway has ended.
         """
-        if self.giveaway_end_time:
-            unix_timestamp = int(self.giveaway_end_time.timestamp())
+        if end_time:
+            unix_timestamp = int(end_time.timestamp())
             return f"<t:{unix_timestamp}:R>"  # Discord timestamp format
         return "Giveaway has ended!"  # Message if giveaway has ended
 
-    async def end_giveaway(self, time: int, prize: str, winners: int, channel_id: int, message_id: int):
+    async def end_giveaway(self, message_id: int):
         """
-        Ends the giveaway after the specified duration, selects winners, and creates channels for them.
-        :param time: Duration of the giveaway in seconds.
-        :param prize: The prize for the giveaway.
-        :param winners: Number of winners.
-        :param channel_id: ID of the channel where the giveaway was held.
+        Ends the giveaway once the scheduler reaches its deadline, selects winners, and creates channels for them.
+        The giveaway is only marked as ended once its winners are announced, so a failure is retried with the same winners.
         :param message_id: ID of the message containing the giveaway.
         """
-        await asyncio.sleep(time)  # Wait for the giveaway duration
-        channel = self.bot.get_channel(channel_id)
-        message = await channel.fetch_message(message_id)
+        if message_id in self.reconciles:
+            await asyncio.shield(self.reconcile(message_id))  # The entrants must be up to date before drawing the winners
+        if message_id in self.ending:
+            return  # Already being ended
+        self.ending.add(message_id)
+        try:
+            await self.announce_winners(message_id)
+        except Exception:
+            self.scheduler.schedule(message_id, datetime.now(timezone.utc).timestamp() + RETRY_DELAY)
+            raise
+        finally:
+            self.ending.discard(message_id)
 
-        # Get users who reacted to the giveaway
-        reaction = discord.utils.get(message.reactions, emoji="🎉")
-        users = [user async for user in reaction.users() if not user.bot]
-
-        if len(users) == 0:
-            await channel.send("No participants were registered.")
-            return
-
-        winners_list = random.sample(users, k=min(len(users), winners))  # Randomly select winners
+    async def announce_winners(self, message_id: int):
+        """
+        Draws the winners of a giveaway, or takes the ones drawn by a previous attempt, and announces them.
+        :param message_id: ID of the message containing the giveaway.
+        """
+        giveaway = await db_manager.get_giveaway(message_id)
+        if giveaway is None or giveaway[7] == db_manager.GIVEAWAY_ENDED:
+            return  # Unknown or already ended giveaway
+        _, _, channel_id, _, prize, winners, _, _ = giveaway
 
-        for winner in winners_list:
-            # Create a private channel for each winner
-            overwrites = {
-                channel.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                winner: discord.PermissionOverwrite(read_messages=True)
-            }
-            new_channel = await channel.guild.create_text_channel(
-                name=f"{prize.replace(' ', '-')}-{winner.display_name}",
-                overwrites=overwrites
-            )
+        channel = await self.resolve_channel(channel_id)
+        if channel is None:
+            await db_manager.mark_giveaway_ended(message_id)
+            return  # The channel has been deleted in the meantime
+        try:
+            message = await self.bot.outbound.submit(f"channel:{channel.id}:messages", lambda: channel.fetch_message(message_id))
+        except discord.NotFound:
+            await db_manager.mark_giveaway_ended(message_id)
+            return  # The giveaway message has been deleted in the meantime
 
-            # Send a message to the winner
-            await new_channel.send(f"{winner.mention} you have won the giveaway for {prize}!")
+        # Randomly select winners among the recorded entrants, replacing the ones who left the guild
+        drawn = await db_manager.draw_giveaway_winners(message_id, winners)
+        while True:
+            members = await asyncio.gather(*(self.resolve_member(channel.guild, user_id) for user_id, _ in drawn))
+            gone = [user_id for (user_id, _), member in zip(drawn, members) if member is None]
+            if not gone:
+                break
+            drawn = await db_manager.replace_giveaway_winners(message_id, gone)
 
-            # Add administrators to the new channel
-            for member in channel.guild.members:
-                if member.guild_permissions.administrator:
-                    await new_channel.set_permissions(member, read_messages=True)
+        if len(drawn) == 0:
+            await self.bot.outbound.submit(f"channel:{channel.id}:messages", lambda: channel.send("No participants were registered."))
+            await db_manager.mark_giveaway_ended(message_id)
+            return
 
-        winners_mentions = "\n".join([winner.mention for winner in winners_list])  # Mention winners
+        winners_mentions = "\n".join([winner.mention for winner in members])  # Mention winners
 
         # Update the giveaway message to show winners
-        await message.edit(embed=discord.Embed(
+        embed = discord.Embed(
             title="🎉 **GIVEAWAY ENDED** 🎉",
             description=f"WINNERS:\n{winners_mentions}\n\n**PRIZE:** {prize}",
             color=discord.Color.green()
-        ))
+        )
+        await self.bot.outbound.submit(f"channel:{channel.id}:messages", lambda: message.edit(embed=embed), coalesce_key=("edit", message.id))
+
+        # The winners told by a previous attempt already have their channel
+        await self.create_winner_channels(channel.guild, [member for (_, notified), member in zip(drawn, members) if not notified], prize, message_id)
+        await db_manager.mark_giveaway_ended(message_id)
+
+    async def create_winner_channels(self, guild: discord.Guild, winners_list: list, prize: str, message_id: int = None):
+        """
+        Creates a private channel for each winner, visible to the winner, the administrators and the owner of the guild.
+        :param guild: The guild where the giveaway was held.
+        :param winners_list: The winners of the giveaway.
+        :param prize: The prize of the giveaway.
+        :param message_id: ID of the message containing the giveaway, to record each winner once told.
+        """
+        # Administrators are granted access through their roles, computed once for every winner
+        admin_overwrites = {
+            role: discord.PermissionOverwrite(read_messages=True)
+            for role in guild.roles if role.permissions.administrator
+        }
+        admin_overwrites[guild.default_role] = discord.PermissionOverwrite(read_messages=False)
+        # The owner has no role to grant access, and may not be cached, Discord only needs the ID
+        owner = guild.owner or discord.Object(guild.owner_id)
+        semaphore = asyncio.Semaphore(WINNER_CHANNELS_CONCURRENCY)
+
+        async def create_winner_channel(winner):
+            async with semaphore:
+                # Create a private channel for the winner, with every overwrite set at creation
+                overwrites = {**admin_overwrites, winner: discord.PermissionOverwrite(read_messages=True)}
+                if winner.id != owner.id:
+                    overwrites[owner] = discord.PermissionOverwrite(read_messages=True)
+                new_channel = await self.bot.outbound.submit(f"guild:{guild.id}:channels", lambda: guild.create_text_channel(
+                    name=f"{prize.replace(' ', '-')}-{winner.display_name}",
+                    overwrites=overwrites
+                ), Priority.BULK)
+
+                # Send a message to the winner
+                await self.bot.outbound.submit(f"channel:{new_channel.id}:messages", lambda: new_channel.send(f"{winner.mention} you have won the giveaway for {prize}!"), Priority.BULK)
+                if message_id is not None:
+                    await db_manager.set_giveaway_winner_notified(message_id, winner.id)
+
+        await asyncio.gather(*(create_winner_channel(winner) for winner in winners_list))
 
 async def setup(bot: commands.Bot):
     """
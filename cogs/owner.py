@@ -0,0 +1,148 @@
+import os
+import tempfile
+from typing import AsyncIterator
+
+import aiohttp
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+from helpers import blacklist_io, checks, db_manager
+from helpers.outbound import Priority
+
+async def attachment_lines(attachment: discord.Attachment) -> AsyncIterator[str]:
+    """
+    Streams the lines of an attachment as they are downloaded.
+    :param attachment: The attachment.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                yield line.decode("utf-8", errors="replace")
+
+class Owner(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        """
+        Initializes the Owner cog with the bot instance.
+        :param bot: The bot instance.
+        """
+        self.bot = bot
+
+    @commands.hybrid_command(name='reload', description='Reload a cog on every cluster of the bot.')
+    @checks.is_owner()
+    @app_commands.describe(extension='The name of the cog, e.g. giveaway')
+    async def reload(self, ctx: commands.Context, extension: str):
+        """
+        Command to reload a cog, on this cluster and on the other ones.
+        :param ctx: The context of the command.
+        :param extension: The name of the cog.
+        """
+        await self.bot.reload_extension(f"cogs.{extension}")
+        await self.bot.broadcast("reload", extension)  # The other clusters reload it as well
+        embed = discord.Embed(description=f"Reloaded the `{extension}` cog.", color=0x9C84EF)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @commands.hybrid_group(name='blacklist', description='Manage the users who cannot use the bot.')
+    @checks.is_owner()
+    async def blacklist(self, ctx: commands.Context):
+        """
+        Group of the blacklist commands.
+        :param ctx: The context of the command.
+        """
+        if ctx.invoked_subcommand is None:
+            embed = discord.Embed(description=f"There are {len(db_manager.blacklist)} blacklisted users.", color=0x9C84EF)
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @blacklist.command(name='add', description='Prevent a user from using the bot.')
+    @checks.is_owner()
+    @app_commands.describe(user='The user to blacklist')
+    async def blacklist_add(self, ctx: commands.Context, user: discord.User):
+        """
+        Command to blacklist a user, the change is shared with every cluster.
+        :param ctx: The context of the command.
+        :param user: The user to blacklist.
+        """
+        total = await db_manager.add_user_to_blacklist(user.id)
+        embed = discord.Embed(description=f"**{user.name}** has been added to the blacklist, which now holds {total} users.", color=0x9C84EF)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @blacklist.command(name='remove', description='Allow a blacklisted user to use the bot again.')
+    @checks.is_owner()
+    @app_commands.describe(user='The user to remove from the blacklist')
+    async def blacklist_remove(self, ctx: commands.Context, user: discord.User):
+        """
+        Command to remove a user from the blacklist, the change is shared with every cluster.
+        :param ctx: The context of the command.
+        :param user: The user to remove from the blacklist.
+        """
+        total = await db_manager.remove_user_from_blacklist(user.id)
+        embed = discord.Embed(description=f"**{user.name}** has been removed from the blacklist, which now holds {total} users.", color=0x9C84EF)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @blacklist.command(name='import', description='Blacklist every user ID of a CSV or JSONL file.')
+    @checks.is_owner()
+    @app_commands.describe(file='A CSV file with the IDs in the first column, or a JSONL file')
+    async def blacklist_import(self, ctx: commands.Context, file: discord.Attachment):
+        """
+        Command to import a shared ban list, streamed chunk by chunk, the change is shared with every cluster.
+        :param ctx: The context of the command.
+        :param file: The file holding the user IDs.
+        """
+        route = f"channel:{ctx.channel.id}:messages"
+        message = await self.bot.outbound.submit(route, lambda: ctx.send(embed=discord.Embed(description=f"Importing `{file.filename}`...", color=0x9C84EF)))
+
+        async def progress(result: blacklist_io.ImportResult) -> None:
+            embed = discord.Embed(description=f"Importing `{file.filename}`: {result}", color=0x9C84EF)
+            await self.bot.outbound.submit(route, lambda: message.edit(embed=embed), Priority.BULK, coalesce_key=("blacklist_import", message.id))
+
+        try:
+            result = await blacklist_io.import_blacklist(attachment_lines(file), progress=progress)
+        except aiohttp.ClientError as error:
+            embed = discord.Embed(description=f"The file could not be downloaded: {error}", color=0xE02B2B)
+        else:
+            embed = discord.Embed(description=f"Imported `{file.filename}`: {result}. The blacklist now holds {len(db_manager.blacklist)} users.", color=0x9C84EF)
+        await self.bot.outbound.submit(route, lambda: message.edit(embed=embed), coalesce_key=("blacklist_import", message.id))
+
+    @blacklist.command(name='export', description='Export the blacklist as a CSV or JSONL file.')
+    @checks.is_owner()
+    @app_commands.describe(format='The format of the file')
+    @app_commands.choices(format=[app_commands.Choice(name=format_, value=format_) for format_ in blacklist_io.FORMATS])
+    async def blacklist_export(self, ctx: commands.Context, format: str = "csv"):
+        """
+        Command to export the blacklist, streamed into a temporary file before being uploaded.
+        :param ctx: The context of the command.
+        :param format: The format of the file, csv or jsonl.
+        """
+        if format not in blacklist_io.FORMATS:
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=discord.Embed(description=f"The format must be one of {', '.join(blacklist_io.FORMATS)}.", color=0xE02B2B)))
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"blacklist.{format}")
+            with open(path, "w", encoding="utf-8") as output:
+                async for line in blacklist_io.export_blacklist(format):
+                    output.write(line)
+            limit = ctx.guild.filesize_limit if ctx.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+            if os.path.getsize(path) > limit:
+                embed = discord.Embed(description="The blacklist is too large to be uploaded, export it with `python blacklist_tool.py export`.", color=0xE02B2B)
+                await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+                return
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(f"{len(db_manager.blacklist)} blacklisted users", file=discord.File(path)))
+
+    @blacklist.command(name='reload', description='Reload the blacklist from the database, e.g. after a command line import.')
+    @checks.is_owner()
+    async def blacklist_reload(self, ctx: commands.Context):
+        """
+        Command to reload the blacklist on every cluster.
+        :param ctx: The context of the command.
+        """
+        await db_manager.reload_blacklist()
+        embed = discord.Embed(description=f"Reloaded the blacklist, which holds {len(db_manager.blacklist)} users.", color=0x9C84EF)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+async def setup(bot: commands.Bot):
+    """
+    Sets up the Owner cog.
+    :param bot: The bot instance.
+    """
+    await bot.add_cog(Owner(bot))
@@ -0,0 +1,102 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+from helpers.guild_settings import GuildSettings
+
+PREFIX_MAX_LENGTH = 10
+
+class Settings(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        """
+        Initializes the Settings cog with the bot instance.
+        :param bot: The bot instance.
+        """
+        self.bot = bot
+
+    def embed(self, guild: discord.Guild, settings: GuildSettings) -> discord.Embed:
+        embed = discord.Embed(title=f"Settings of {guild.name}", color=0x9C84EF)
+        prefix = settings.prefix or self.bot.config["prefix"]
+        embed.add_field(name="Prefix", value=f"`{prefix}`" + ("" if settings.prefix else " (default)"), inline=False)
+        embed.add_field(name="Ticket category", value=settings.ticket_category, inline=False)
+        embed.add_field(name="Giveaways", value=f"{settings.giveaway_duration} seconds, {settings.giveaway_winners} winners", inline=False)
+        return embed
+
+    async def show(self, ctx: commands.Context, settings: GuildSettings):
+        embed = self.embed(ctx.guild, settings)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @commands.hybrid_group(name='settings', description='Display the settings of this server.', fallback='show')
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def settings(self, ctx: commands.Context):
+        """
+        Group of the settings commands, displays the settings of the server.
+        :param ctx: The context of the command.
+        """
+        if ctx.invoked_subcommand is None:
+            await self.show(ctx, await self.bot.guild_settings.get(ctx.guild.id))
+
+    @settings.command(name='prefix', description='Set the prefix of the commands in this server.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(prefix='The new prefix, the default prefix of the bot if not given')
+    async def settings_prefix(self, ctx: commands.Context, prefix: str = None):
+        """
+        Command to set the prefix of the server, the bot still answers to its mention.
+        :param ctx: The context of the command.
+        :param prefix: The new prefix, None to go back to the default one.
+        """
+        if prefix is not None and (len(prefix) > PREFIX_MAX_LENGTH or any(character.isspace() for character in prefix)):
+            embed = discord.Embed(description=f"The prefix must be at most {PREFIX_MAX_LENGTH} characters long, without spaces.", color=0xE02B2B)
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+            return
+        await self.show(ctx, await self.bot.guild_settings.update(ctx.guild.id, prefix=prefix))
+
+    @settings.command(name='ticketcategory', description='Set the category in which tickets are created.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(name='The name of the category, Tickets if not given')
+    async def settings_ticketcategory(self, ctx: commands.Context, *, name: str = None):
+        """
+        Command to set the name of the category of the tickets.
+        :param ctx: The context of the command.
+        :param name: The name of the category, None to go back to the default one.
+        """
+        await self.show(ctx, await self.bot.guild_settings.update(ctx.guild.id, ticket_category=name))
+
+    @settings.command(name='giveaway', description='Set the default duration and number of winners of giveaways.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(
+        duration='Default duration of the giveaways in seconds',
+        winners='Default number of winners'
+    )
+    async def settings_giveaway(self, ctx: commands.Context, duration: commands.Range[int, 1, 31_536_000] = None, winners: commands.Range[int, 1, 100] = None):
+        """
+        Command to set the defaults of the giveaways, both go back to their default if none is given.
+        :param ctx: The context of the command.
+        :param duration: The default duration in seconds.
+        :param winners: The default number of winners.
+        """
+        if duration is None and winners is None:
+            values = {"giveaway_duration": None, "giveaway_winners": None}
+        else:
+            values = {key: value for key, value in (("giveaway_duration", duration), ("giveaway_winners", winners)) if value is not None}
+        await self.show(ctx, await self.bot.guild_settings.update(ctx.guild.id, **values))
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        # Loaded up front, so that the first messages of the guild are resolved from the cache
+        await self.bot.guild_settings.get(guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.bot.guild_settings.evict(guild.id)
+
+async def setup(bot: commands.Bot):
+    """
+    Sets up the Settings cog.
+    :param bot: The bot instance.
+    """
+    await bot.add_cog(Settings(bot))
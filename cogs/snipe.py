@@ -1,7 +1,96 @@
+import sys
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, Optional
+
 import discord
 from discord.ext import commands
 from discord import app_commands
 
+HISTORY_SIZE = 10  # Deleted messages kept per channel
+MAX_CONTENT_LENGTH = 1024  # Characters of content kept per deleted message
+MEMORY_BUDGET = 32 * 1024 * 1024  # Bytes used by all the stored messages together
+
+
+class DeletedMessage:
+    """
+    Compact record of a deleted message, holding no reference to any discord.py object.
+    """
+    __slots__ = ("author_id", "author_name", "content", "timestamp")
+
+    def __init__(self, author_id: int, author_name: str, content: str, timestamp: float):
+        self.author_id = author_id
+        self.author_name = author_name
+        self.content = content
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_message(cls, message: discord.Message, max_length: int = MAX_CONTENT_LENGTH) -> "DeletedMessage":
+        return cls(message.author.id, message.author.display_name, message.content[:max_length], message.created_at.timestamp())
+
+    @property
+    def size(self) -> int:
+        """
+        Approximate number of bytes held by the record.
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.author_name) + sys.getsizeof(self.content) + 64
+
+
+class SnipeStore:
+    """
+    Keeps the most recent deleted messages of each channel within a global memory budget.
+
+    Every channel has a ring buffer of the last ``history_size`` deletions. When the budget is
+    exceeded, whole channels are evicted, least recently used first.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE, memory_budget: int = MEMORY_BUDGET):
+        self.history_size = history_size
+        self.memory_budget = memory_budget
+        # Bytes used by the ring buffer of a channel once full, its blocks grow with history_size
+        self.channel_overhead = sys.getsizeof(deque([None] * history_size, maxlen=history_size)) + 128
+        self.size = 0
+        self._channels: "OrderedDict[int, Deque[DeletedMessage]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def add(self, channel_id: int, record: DeletedMessage) -> None:
+        """
+        Stores a deleted message as the most recent one of its channel.
+
+        :param channel_id: The ID of the channel the message was deleted from.
+        :param record: The deleted message.
+        """
+        history = self._channels.get(channel_id)
+        if history is None:
+            history = self._channels[channel_id] = deque(maxlen=self.history_size)
+            self.size += self.channel_overhead
+        else:
+            self._channels.move_to_end(channel_id)
+        if len(history) == history.maxlen:
+            self.size -= history[0].size
+        history.append(record)
+        self.size += record.size
+        while self.size > self.memory_budget and len(self._channels) > 1:
+            _, evicted = self._channels.popitem(last=False)
+            self.size -= self.channel_overhead + sum(message.size for message in evicted)
+
+    def get(self, channel_id: int, index: int = 0) -> Optional[DeletedMessage]:
+        """
+        Gets a deleted message of a channel.
+
+        :param channel_id: The ID of the channel.
+        :param index: 0 for the most recent deletion, 1 for the one before, and so on.
+        :return: The deleted message, or None if there is no such message.
+        """
+        history = self._channels.get(channel_id)
+        if history is None or not 0 <= index < len(history):
+            return None
+        self._channels.move_to_end(channel_id)
+        return history[-1 - index]
+
+
 class Snipe(commands.Cog):
     def __init__(self, bot: commands.Bot):
         """
@@ -9,39 +98,42 @@ class Snipe(commands.Cog):
         :param bot: The bot instance.
         """
         self.bot = bot
-        self.deleted_messages = {}  # Dictionary to store the last deleted message per channel
+        self.deleted_messages = SnipeStore(
+            history_size=bot.config.get("snipe_history_size", HISTORY_SIZE),
+            memory_budget=bot.config.get("snipe_memory_budget", MEMORY_BUDGET)
+        )  # Recently deleted messages per channel
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         """
-        Listens for deleted messages and stores them in a dictionary.
+        Listens for deleted messages and stores them in the snipe store.
         :param message: The message that was deleted.
         """
-        self.deleted_messages[message.channel.id] = {
-            'author': message.author,
-            'content': message.content,
-            'timestamp': message.created_at
-        }
+        self.deleted_messages.add(message.channel.id, DeletedMessage.from_message(message))
 
-    @commands.hybrid_command(name='snipe', description='Displays the last deleted message in the channel.')
-    async def snipe(self, ctx: commands.Context):
+    @commands.hybrid_command(name='snipe', description='Displays a recently deleted message in the channel.')
+    @app_commands.describe(index='1 for the last deleted message, 2 for the one before, and so on')
+    async def snipe(self, ctx: commands.Context, index: int = 1):
         """
-        Command to display the last deleted message in the channel.
+        Command to display a recently deleted message in the channel.
         :param ctx: The context of the command.
+        :param index: Which deleted message to display, 1 being the most recent one.
         """
-        # Retrieve the last deleted message from the dictionary
-        channel_id = ctx.channel.id
-        if channel_id in self.deleted_messages:
-            deleted_message = self.deleted_messages[channel_id]
+        # Retrieve the deleted message from the store
+        deleted_message = self.deleted_messages.get(ctx.channel.id, index - 1)
+        if deleted_message is not None:
+            timestamp = datetime.fromtimestamp(deleted_message.timestamp, timezone.utc)
             embed = discord.Embed(
                 title="🗑️ Deleted Message",  # Title of the embed
-                description=deleted_message['content'],  # Content of the deleted message
+                description=deleted_message.content,  # Content of the deleted message
                 color=0xFF0000  # Red color for the embed
             )
-            embed.set_footer(text=f"Author: {deleted_message['author']} | Time: {deleted_message['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")  # Footer with author and timestamp
-            await ctx.send(embed=embed)  # Send the embed
+            embed.set_footer(text=f"Author: {deleted_message.author_name} | Time: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")  # Footer with author and timestamp
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))  # Send the embed
+        elif index == 1:
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send("No messages have been deleted in this channel."))  # Message if no deleted message found
         else:
-            await ctx.send("No messages have been deleted in this channel.")  # Message if no deleted message found
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(f"There is no deleted message #{index} in this channel."))
 
 async def setup(bot: commands.Bot):
     """
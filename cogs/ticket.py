@@ -1,7 +1,65 @@
+import os
+from typing import Dict, Optional, Tuple
+
 import discord
 from discord.ext import commands
 from discord.ui import Button, View
-from discord import Embed, Colour, Interaction
+from discord import Embed, Colour, Interaction, app_commands
+
+from helpers import db_manager
+from helpers.outbound import Priority
+from helpers.transcripts import MAX_CONCURRENT, TRANSCRIPTS_PATH, TranscriptArchiver
+
+UPLOAD_LIMIT = 8 * 1024 * 1024  # Transcripts larger than this are not uploaded back to Discord
+
+TicketKey = Tuple[int, int, str]  # (guild ID, user ID, ticket type)
+
+class TicketRegistry:
+    """
+    In-memory mirror of the tickets that are not closed, so that duplicate checks never scan channels.
+    """
+
+    def __init__(self):
+        self._channels: Dict[TicketKey, Optional[int]] = {}  # None while the channel is being created
+        self._keys: Dict[int, TicketKey] = {}
+        self.status: Dict[int, str] = {}
+
+    def load(self, tickets: list):
+        """
+        Fills the registry from the database.
+        :param tickets: (channel_id, server_id, user_id, type, status) tuples of the tickets that are not closed.
+        """
+        for channel_id, server_id, user_id, type_, status in tickets:
+            self.add((server_id, user_id, type_), channel_id, status)
+
+    def get(self, key: TicketKey) -> Optional[int]:
+        return self._channels.get(key)
+
+    def reserve(self, key: TicketKey) -> bool:
+        """
+        Reserves a key before its channel is created, so that concurrent clicks cannot create it twice.
+        :param key: The key of the ticket.
+        :return: True if the key has been reserved, False if the ticket already exists.
+        """
+        if key in self._channels:
+            return False
+        self._channels[key] = None
+        return True
+
+    def release(self, key: TicketKey):
+        if self._channels.get(key, 0) is None:
+            del self._channels[key]
+
+    def add(self, key: TicketKey, channel_id: int, status: str = "open"):
+        self._channels[key] = channel_id
+        self._keys[channel_id] = key
+        self.status[channel_id] = status
+
+    def remove(self, channel_id: int):
+        key = self._keys.pop(channel_id, None)
+        if key is not None:
+            self._channels.pop(key, None)
+        self.status.pop(channel_id, None)
 
 class Ticket(commands.Cog):
     def __init__(self, bot):
@@ -10,6 +68,19 @@ class Ticket(commands.Cog):
         :param bot: The bot instance.
         """
         self.bot = bot
+        self.registry = TicketRegistry()
+        self.archiver = TranscriptArchiver(
+            bot.config.get("transcripts_directory", TRANSCRIPTS_PATH),
+            bot.config.get("transcript_concurrency", MAX_CONCURRENT)
+        )
+
+    async def cog_load(self):
+        """
+        Loads the ticket registry and registers the persistent views so that their buttons keep working after a restart.
+        """
+        self.registry.load(await db_manager.get_active_tickets())
+        self.bot.add_view(TicketView(self.registry, self.archiver))
+        self.bot.add_view(CloseClaimView(self.registry, self.archiver))
 
     @commands.hybrid_command(name="testticket", description="Create a ticket")
     async def testticket(self, ctx):
@@ -26,17 +97,58 @@ class Ticket(commands.Cog):
         embed.set_image(url="https://media.discordapp.net/attachments/1262355583437242409/1264335052964102256/9AF43C82-13BC-4CE2-9F48-D536C77AF86C.png?ex=669d7f46&is=669c2dc6&hm=69642441909eaf5f78e444dd5244f834a7ee4390c5c46449b9715ec914d09ddd&=&format=webp&quality=lossless&width=810&height=224")
         
         # Create a view with interactive buttons
-        view = TicketView(ctx.author)
-        await ctx.send(embed=embed, view=view)
+        view = TicketView(self.registry, self.archiver)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed, view=view))
+
+    @commands.hybrid_command(name="transcripts", description="List the transcripts of the closed tickets.")
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    @app_commands.describe(member="Only list the tickets this member opened or wrote in")
+    async def transcripts(self, ctx, member: Optional[discord.Member] = None):
+        """
+        Command to list the latest transcripts of the server.
+        :param ctx: The context of the command.
+        :param member: The member whose tickets to list, every ticket if not given.
+        """
+        rows = await db_manager.search_transcripts(ctx.guild.id, member.id if member else None)
+        embed = Embed(title="Transcripts", color=0x9C84EF)
+        embed.description = "\n".join(
+            f"`{channel_id}` {type_ or 'unknown'} ticket of {f'<@{owner_id}>' if owner_id else 'an unknown member'}, closed by <@{closed_by}> on {created_at}: {count} messages"
+            for channel_id, owner_id, type_, closed_by, count, created_at in rows
+        ) or "No transcripts"
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @commands.hybrid_command(name="transcript", description="Upload the transcript of a closed ticket.")
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    @app_commands.describe(ticket_id="The ID of the ticket channel, as listed by /transcripts")
+    async def transcript(self, ctx, ticket_id: str):
+        """
+        Command to upload the transcript of a closed ticket.
+        :param ctx: The context of the command.
+        :param ticket_id: The ID of the ticket channel.
+        """
+        row = await db_manager.get_transcript(int(ticket_id), ctx.guild.id) if ticket_id.isdigit() else None
+        if row is None:
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send("There is no transcript for this ticket."))
+            return
+        path, count, size = row
+        filename = self.archiver.resolve(path)
+        if size > UPLOAD_LIMIT or not os.path.exists(filename):
+            await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(f"The transcript of {count} messages is too large to be uploaded, it is stored at `{path}`."))
+            return
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(f"Transcript of {count} messages", file=discord.File(filename)))
 
 class TicketView(View):
-    def __init__(self, user):
+    def __init__(self, registry: TicketRegistry, archiver: TranscriptArchiver):
         """
-        Initializes the TicketView with user information.
-        :param user: The user who invoked the ticket command.
+        Initializes the TicketView with the ticket registry.
+        :param registry: The registry of the tickets that are not closed.
+        :param archiver: The archiver writing the transcripts of the closed tickets.
         """
         super().__init__(timeout=None)
-        self.user = user
+        self.registry = registry
+        self.archiver = archiver
 
     @discord.ui.button(label="Button 1", style=discord.ButtonStyle.gray, custom_id="services", emoji="🛒")
     async def services_button(self, interaction: Interaction, button: Button):
@@ -65,6 +177,20 @@ class TicketView(View):
         """
         await self.create_ticket(interaction, "support")
 
+    async def channel_exists(self, guild, channel_id: int) -> bool:
+        """
+        Checks whether a channel still exists, fetching it when the cache profile does not keep it.
+        :param guild: The guild of the channel.
+        :param channel_id: The ID of the channel.
+        """
+        if guild.get_channel(channel_id) is not None:
+            return True
+        try:
+            await guild.fetch_channel(channel_id)
+        except discord.NotFound:
+            return False
+        return True
+
     async def create_ticket(self, interaction, type_):
         """
         Creates a new ticket channel based on the type of request.
@@ -72,17 +198,38 @@ class TicketView(View):
         :param type_: The type of ticket to create (services, report, support).
         """
         guild = interaction.guild
-        category = discord.utils.get(guild.categories, name="Tickets")  # Ensure this category exists
+        user = interaction.user
+        outbound = interaction.client.outbound
+        # Answer within the 3 seconds of the interaction, the channel may take longer to create
+        await outbound.submit(None, lambda: interaction.response.defer(ephemeral=True, thinking=True), Priority.INTERACTION)
+        settings = await interaction.client.guild_settings.get(guild.id)
+        category = discord.utils.get(guild.categories, name=settings.ticket_category)  # Ensure this category exists, see /settings ticketcategory
 
-        existing_channel = discord.utils.get(guild.text_channels, name=f"{type_}-{self.user.name}")
-        if existing_channel:
-            await interaction.response.send_message(f"You already have a ticket: {existing_channel.mention}", ephemeral=True)
+        key = (guild.id, user.id, type_)
+        existing_channel_id = self.registry.get(key)
+        if existing_channel_id is not None and not await self.channel_exists(guild, existing_channel_id):
+            # The ticket channel has been deleted by hand, forget about it
+            await db_manager.close_ticket(existing_channel_id)
+            self.registry.remove(existing_channel_id)
+        if not self.registry.reserve(key):
+            existing_channel_id = self.registry.get(key)
+            if existing_channel_id is not None:
+                await outbound.submit(None, lambda: interaction.followup.send(f"You already have a ticket: <#{existing_channel_id}>", ephemeral=True), Priority.INTERACTION)
+            else:
+                await outbound.submit(None, lambda: interaction.followup.send("Your ticket is being created.", ephemeral=True), Priority.INTERACTION)
         else:
             overwrites = {
                 guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                self.user: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+                user: discord.PermissionOverwrite(read_messages=True, send_messages=True)
             }
-            channel = await guild.create_text_channel(f"{type_}-{self.user.name}", category=category, overwrites=overwrites)
+            try:
+                channel = await outbound.submit(f"guild:{guild.id}:channels", lambda: guild.create_text_channel(f"{type_}-{user.name}", category=category, overwrites=overwrites))
+                await db_manager.add_ticket(channel.id, guild.id, user.id, type_)
+            except Exception:
+                self.registry.release(key)
+                await outbound.submit(None, lambda: interaction.followup.send("The ticket could not be created, please try again later.", ephemeral=True), Priority.INTERACTION)
+                raise
+            self.registry.add(key, channel.id)
             
             # Customize embed content based on ticket type
             if type_ == "services":
@@ -95,28 +242,52 @@ class TicketView(View):
                     "text"
                 ]), inline=False)
                 embed.set_thumbnail(url="https://gymporn.cz/files/hqdefault.jpg")  # Change URL if necessary
-                view = CloseClaimView()
-                await channel.send(embed=embed, view=view)
+                view = CloseClaimView(self.registry, self.archiver)
+                await outbound.submit(f"channel:{channel.id}:messages", lambda: channel.send(embed=embed, view=view))
             else:
-                await channel.send(embed=Embed(title="Ticket Created", description=f"Ticket: {channel.mention}", color=Colour.green()))
+                await outbound.submit(f"channel:{channel.id}:messages", lambda: channel.send(embed=Embed(title="Ticket Created", description=f"Ticket: {channel.mention}", color=Colour.green())))
             
-            await interaction.response.send_message(f"Ticket created: {channel.mention}", ephemeral=True)
+            await outbound.submit(None, lambda: interaction.followup.send(f"Ticket created: {channel.mention}", ephemeral=True), Priority.INTERACTION)
 
 class CloseClaimView(View):
-    def __init__(self):
+    def __init__(self, registry: TicketRegistry, archiver: TranscriptArchiver):
         """
         Initializes the CloseClaimView with interactive buttons for managing tickets.
+        :param registry: The registry of the tickets that are not closed.
+        :param archiver: The archiver writing the transcripts of the closed tickets.
         """
         super().__init__(timeout=None)
+        self.registry = registry
+        self.archiver = archiver
 
     @discord.ui.button(label="Close", style=discord.ButtonStyle.danger, custom_id="close", emoji="❌")
     async def close_button(self, interaction: Interaction, button: Button):
         """
-        Button to close (delete) the ticket channel.
+        Button to close the ticket, deleting its channel once its transcript has been saved.
         :param interaction: The interaction object.
         :param button: The button object.
         """
-        await interaction.channel.delete()
+        channel = interaction.channel
+        outbound = interaction.client.outbound
+        status = self.registry.status.get(channel.id)
+        if status == "closing":
+            await outbound.submit(None, lambda: interaction.response.send_message("This ticket is already being closed.", ephemeral=True), Priority.INTERACTION)
+            return
+        self.registry.status[channel.id] = "closing"
+        await outbound.submit(None, lambda: interaction.response.send_message("Saving the transcript, the ticket will be deleted once it is done."), Priority.INTERACTION)
+        try:
+            transcript = await self.archiver.archive(channel, outbound)
+        except (discord.HTTPException, OSError):
+            if status is None:
+                self.registry.status.pop(channel.id, None)
+            else:
+                self.registry.status[channel.id] = status
+            await outbound.submit(f"channel:{channel.id}:messages", lambda: channel.send("The transcript could not be saved, the ticket has not been closed."))
+            raise
+        await db_manager.add_transcript(channel.id, channel.guild.id, interaction.user.id, transcript)
+        await db_manager.close_ticket(channel.id)
+        self.registry.remove(channel.id)
+        await outbound.submit(f"channel:{channel.id}", lambda: channel.delete())
 
     @discord.ui.button(label="Claim", style=discord.ButtonStyle.success, custom_id="claim", emoji="⬇️")
     async def claim_button(self, interaction: Interaction, button: Button):
@@ -125,7 +296,19 @@ class CloseClaimView(View):
         :param interaction: The interaction object.
         :param button: The button object.
         """
-        await interaction.response.send_message("Ticket claimed!", ephemeral=True)
+        channel_id = interaction.channel.id
+        status = self.registry.status.get(channel_id)
+        if status is None:
+            # Opened before the tickets were tracked, its creator and type are unknown so it cannot be registered now
+            message = "This ticket was opened before tickets were tracked and cannot be claimed."
+        elif status == "closing":
+            message = "This ticket is being closed."
+        elif status == "open" and await db_manager.claim_ticket(channel_id, interaction.user.id):
+            self.registry.status[channel_id] = "claimed"
+            message = "Ticket claimed!"
+        else:
+            message = "This ticket has already been claimed."
+        await interaction.client.outbound.submit(None, lambda: interaction.response.send_message(message, ephemeral=True), Priority.INTERACTION)
 
 async def setup(bot):
     """
@@ -0,0 +1,205 @@
+import asyncio
+
+import aiosqlite
+import discord
+from discord.ext import commands, tasks
+from discord.ui import Button, View
+from discord import app_commands, Interaction
+
+from helpers import db_manager
+from helpers.outbound import Priority
+
+PAGE_SIZE = 10  # Warnings shown per page
+ARCHIVE_BATCH = 500  # Expired warns archived per write
+VACUUM_PAGES = 256  # Free pages given back to the file system per slice
+SLICE_PAUSE = 0.1  # Seconds between two writes of the retention job, leaving the write lock to the commands
+
+class WarningsPaginator(View):
+    def __init__(self, author_id: int, member: discord.abc.User, server_id: int, total: int):
+        """
+        Initializes the paginator, which fetches each page of warnings when it is displayed.
+        :param author_id: The ID of the user allowed to turn the pages.
+        :param member: The member whose warnings are displayed.
+        :param server_id: The ID of the server of the warnings.
+        :param total: The number of warnings of the member.
+        """
+        super().__init__(timeout=180)
+        self.author_id = author_id
+        self.member = member
+        self.server_id = server_id
+        self.total = total
+        self.starts = [0]  # ID after which each visited page starts, the last one being the current page
+        self.page = []
+        self.has_next = False
+
+    async def load(self, after_id: int):
+        """
+        Fetches the page starting after the given warn, and one more row to know whether there is a next page.
+        :param after_id: The ID of the last warn of the previous page.
+        """
+        rows = await db_manager.get_warnings_page(self.member.id, self.server_id, after_id, PAGE_SIZE + 1)
+        self.page = rows[:PAGE_SIZE]
+        self.has_next = len(rows) > PAGE_SIZE
+        self.previous_button.disabled = len(self.starts) == 1
+        self.next_button.disabled = not self.has_next
+
+    def embed(self) -> discord.Embed:
+        pages = max(1, -(-self.total // PAGE_SIZE))
+        embed = discord.Embed(title=f"Warnings of {self.member}", color=0x9C84EF)
+        if not self.page:
+            embed.description = "This user has no warnings."
+        else:
+            embed.description = "\n".join(f"**#{warn_id}** <t:{created_at}:d> by <@{moderator_id}>: {reason}" for _, _, moderator_id, reason, created_at, warn_id in self.page)
+        embed.set_footer(text=f"Page {len(self.starts)}/{pages} | {self.total} warnings")
+        return embed
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def show(self, interaction: Interaction):
+        await interaction.client.outbound.submit(None, lambda: interaction.response.edit_message(embed=self.embed(), view=self), Priority.INTERACTION)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray, emoji="◀️")
+    async def previous_button(self, interaction: Interaction, button: Button):
+        """
+        Button to display the previous page.
+        :param interaction: The interaction object.
+        :param button: The button object.
+        """
+        if len(self.starts) > 1:
+            self.starts.pop()
+        await self.load(self.starts[-1])
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray, emoji="▶️")
+    async def next_button(self, interaction: Interaction, button: Button):
+        """
+        Button to display the next page.
+        :param interaction: The interaction object.
+        :param button: The button object.
+        """
+        if self.has_next:
+            self.starts.append(self.page[-1][5])
+        await self.load(self.starts[-1])
+        await self.show(interaction)
+
+class Warnings(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        """
+        Initializes the Warnings cog with the bot instance.
+        :param bot: The bot instance.
+        """
+        self.bot = bot
+
+    async def cog_load(self):
+        """
+        Starts the retention job.
+        """
+        self.retention_task.start()
+
+    async def cog_unload(self):
+        """
+        Stops the retention job.
+        """
+        self.retention_task.cancel()
+
+    async def expire_warns(self) -> int:
+        """
+        Archives the expired warns of the servers of this cluster batch by batch, then gives the freed pages back in slices.
+        :return: The number of archived warns.
+        """
+        default = self.bot.config.get("warn_retention_days") or 0
+        archived = 0
+        for server_id, days in await db_manager.get_warned_servers():
+            days = default if days is None else days
+            if not days or not self.bot.owns_guild(server_id):
+                continue  # Kept forever, or handled by the cluster owning the guild
+            while True:
+                count = await db_manager.archive_expired_warns(server_id, days, ARCHIVE_BATCH)
+                archived += count
+                if count < ARCHIVE_BATCH:
+                    break
+                await asyncio.sleep(SLICE_PAUSE)
+        if self.bot.owns_guild(0):  # Only the cluster running shard 0 vacuums the shared database
+            free_pages = None
+            while True:
+                remaining = await db_manager.incremental_vacuum(VACUUM_PAGES)
+                if remaining == 0 or (free_pages is not None and remaining >= free_pages):
+                    break  # Done, or the database is not in incremental auto-vacuum mode
+                free_pages = remaining
+                await asyncio.sleep(SLICE_PAUSE)
+        return archived
+
+    @tasks.loop(hours=1.0)
+    async def retention_task(self):
+        """
+        Applies the warn retention of every server every hour.
+        """
+        try:
+            archived = await self.expire_warns()
+        except aiosqlite.Error as e:
+            print(f"Failed to apply the warn retention\n{type(e).__name__}: {e}")
+            return
+        if archived:
+            print(f"Archived {archived} expired warns")
+
+    @retention_task.before_loop
+    async def before_retention_task(self):
+        await self.bot.wait_until_ready()
+
+    @commands.hybrid_command(name='warnings', description='Display the warnings of a member, page by page.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    @app_commands.describe(member='The member whose warnings to display')
+    async def warnings(self, ctx: commands.Context, member: discord.Member):
+        """
+        Command to display the warnings of a member, with buttons to turn the pages.
+        :param ctx: The context of the command.
+        :param member: The member whose warnings to display.
+        """
+        total = await db_manager.count_warnings(member.id, ctx.guild.id)
+        view = WarningsPaginator(ctx.author.id, member, ctx.guild.id, total)
+        await view.load(0)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=view.embed(), view=view))
+
+    @commands.hybrid_command(name='warnstats', description='Display the most warned members and the most active moderators.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages=True)
+    async def warnstats(self, ctx: commands.Context):
+        """
+        Command to display the warning statistics of the server.
+        :param ctx: The context of the command.
+        """
+        top_users = await db_manager.get_top_warned_users(ctx.guild.id)
+        moderators = await db_manager.get_moderator_warn_counts(ctx.guild.id)
+        embed = discord.Embed(title="Warning statistics", color=0x9C84EF)
+        embed.add_field(name="Most warned members", value="\n".join(f"<@{user_id}>: {count}" for user_id, count in top_users) or "No warnings", inline=True)
+        embed.add_field(name="Warns per moderator", value="\n".join(f"<@{moderator_id}>: {count}" for moderator_id, count in moderators) or "No warnings", inline=True)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+    @commands.hybrid_command(name='warnretention', description='Display or set how long the warnings of this server are kept.')
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(days='Days after which warnings are archived, 0 to keep them forever')
+    async def warnretention(self, ctx: commands.Context, days: commands.Range[int, 0, 36500] = None):
+        """
+        Command to display or set the warn retention of the server.
+        :param ctx: The context of the command.
+        :param days: The number of days the warnings are kept, 0 to keep them forever.
+        """
+        if days is not None:
+            await db_manager.set_warn_retention(ctx.guild.id, days)
+        else:
+            days = await db_manager.get_warn_retention(ctx.guild.id)
+            if days is None:
+                days = self.bot.config.get("warn_retention_days") or 0
+        description = f"Warnings are archived after {days} days." if days else "Warnings are kept forever."
+        embed = discord.Embed(description=description, color=0x9C84EF)
+        await self.bot.outbound.submit(f"channel:{ctx.channel.id}:messages", lambda: ctx.send(embed=embed))
+
+async def setup(bot: commands.Bot):
+    """
+    Sets up the Warnings cog.
+    :param bot: The bot instance.
+    """
+    await bot.add_cog(Warnings(bot))
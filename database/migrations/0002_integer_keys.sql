@@ -0,0 +1,23 @@
+CREATE TABLE `blacklist_new` (
+  `user_id` INTEGER PRIMARY KEY,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO `blacklist_new`(`user_id`, `created_at`)
+  SELECT CAST(`user_id` AS INTEGER), `created_at` FROM `blacklist`;
+DROP TABLE `blacklist`;
+ALTER TABLE `blacklist_new` RENAME TO `blacklist`;
+
+CREATE TABLE `warns_new` (
+  `id` INTEGER NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `server_id` INTEGER NOT NULL,
+  `moderator_id` INTEGER NOT NULL,
+  `reason` varchar(255) NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO `warns_new`(`id`, `user_id`, `server_id`, `moderator_id`, `reason`, `created_at`)
+  SELECT `id`, CAST(`user_id` AS INTEGER), CAST(`server_id` AS INTEGER), CAST(`moderator_id` AS INTEGER), `reason`, `created_at` FROM `warns`;
+DROP TABLE `warns`;
+ALTER TABLE `warns_new` RENAME TO `warns`;
+
+CREATE INDEX `idx_warns_server_user_id` ON `warns`(`server_id`, `user_id`, `id`);
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS `giveaways` (
+  `message_id` INTEGER PRIMARY KEY,
+  `server_id` INTEGER NOT NULL,
+  `channel_id` INTEGER NOT NULL,
+  `host_id` INTEGER NOT NULL,
+  `prize` varchar(255) NOT NULL,
+  `winners` INTEGER NOT NULL,
+  `ends_at` INTEGER NOT NULL,
+  `ended` INTEGER NOT NULL DEFAULT 0,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS `idx_giveaways_pending` ON `giveaways`(`ended`, `ends_at`);
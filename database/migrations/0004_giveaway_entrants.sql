@@ -0,0 +1,10 @@
+ALTER TABLE `giveaways` ADD COLUMN `entrant_count` INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS `giveaway_entrants` (
+  `giveaway_id` INTEGER NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `slot` INTEGER NOT NULL,
+  PRIMARY KEY (`giveaway_id`, `user_id`)
+) WITHOUT ROWID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS `idx_giveaway_entrants_slot` ON `giveaway_entrants`(`giveaway_id`, `slot`);
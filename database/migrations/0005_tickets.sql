@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS `tickets` (
+  `channel_id` INTEGER PRIMARY KEY,
+  `server_id` INTEGER NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `type` varchar(20) NOT NULL,
+  `status` varchar(10) NOT NULL DEFAULT 'open',
+  `claimed_by` INTEGER,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `closed_at` timestamp
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS `idx_tickets_active` ON `tickets`(`server_id`, `user_id`, `type`) WHERE `status` != 'closed';
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS `bot_state` (
+  `key` varchar(100) PRIMARY KEY,
+  `value` TEXT NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS `idx_warns_server_moderator` ON `warns`(`server_id`, `moderator_id`);
@@ -0,0 +1,20 @@
+CREATE TABLE IF NOT EXISTS `transcripts` (
+  `channel_id` INTEGER PRIMARY KEY,
+  `server_id` INTEGER NOT NULL,
+  `closed_by` INTEGER NOT NULL,
+  `path` varchar(255) NOT NULL,
+  `message_count` INTEGER NOT NULL,
+  `size` INTEGER NOT NULL,
+  `first_message_at` timestamp,
+  `last_message_at` timestamp,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS `idx_transcripts_server` ON `transcripts`(`server_id`, `channel_id`);
+
+CREATE TABLE IF NOT EXISTS `transcript_participants` (
+  `user_id` INTEGER NOT NULL,
+  `channel_id` INTEGER NOT NULL,
+  `message_count` INTEGER NOT NULL,
+  PRIMARY KEY (`user_id`, `channel_id`)
+) WITHOUT ROWID;
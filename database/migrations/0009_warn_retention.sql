@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS `warn_retention` (
+  `server_id` INTEGER PRIMARY KEY,
+  `days` INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `warns_archive` (
+  `id` INTEGER PRIMARY KEY,
+  `server_id` INTEGER NOT NULL,
+  `warn_count` INTEGER NOT NULL,
+  `oldest_at` timestamp NOT NULL,
+  `newest_at` timestamp NOT NULL,
+  `data` BLOB NOT NULL,
+  `archived_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS `idx_warns_archive_server` ON `warns_archive`(`server_id`, `id`);
+
+CREATE INDEX IF NOT EXISTS `idx_warns_server_created` ON `warns`(`server_id`, `created_at`);
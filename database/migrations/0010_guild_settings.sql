@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS `guild_settings` (
+  `server_id` INTEGER PRIMARY KEY,
+  `prefix` varchar(10),
+  `ticket_category` varchar(100),
+  `giveaway_duration` INTEGER,
+  `giveaway_winners` INTEGER,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS `giveaway_winners` (
+  `giveaway_id` INTEGER NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `left_guild` INTEGER NOT NULL DEFAULT 0,
+  `notified` INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (`giveaway_id`, `user_id`)
+) WITHOUT ROWID;
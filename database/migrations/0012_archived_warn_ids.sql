@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS `archived_warn_ids` (
+  `server_id` INTEGER NOT NULL,
+  `user_id` INTEGER NOT NULL,
+  `last_id` INTEGER NOT NULL,
+  PRIMARY KEY (`server_id`, `user_id`)
+) WITHOUT ROWID;
@@ -20,3 +20,15 @@ class UserNotOwner(commands.CheckFailure):
     def __init__(self, message="User is not an owner of the bot!"):
         self.message = message
         super().__init__(self.message)
+
+
+class UserRateLimited(commands.CheckFailure):
+    """
+    Thrown when a user is attempting something, but sent too many commands recently.
+    """
+
+    def __init__(self, retry_after: float, notify: bool, message="User is rate limited!"):
+        self.retry_after = retry_after
+        self.notify = notify  # Only the first refusal of a window is answered
+        self.message = message
+        super().__init__(self.message)
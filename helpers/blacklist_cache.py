@@ -0,0 +1,47 @@
+from typing import Optional, Set
+
+
+class BlacklistCache:
+    """
+    In-memory mirror of the blacklist table so that the blacklist check never touches SQLite.
+
+    ``hits`` counts lookups answered from memory, ``misses`` counts lookups that had to fall back
+    to the database because the cache was not loaded yet.
+    """
+
+    def __init__(self):
+        self._ids: Set[int] = set()
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def swap(self, user_ids: Set[int]) -> None:
+        """
+        Replaces the whole content of the cache by a set built beforehand, without copying it.
+
+        :param user_ids: The IDs of every blacklisted user, the set must not be modified afterwards.
+        """
+        self._ids = user_ids
+        self.loaded = True
+
+    def lookup(self, user_id: int) -> Optional[bool]:
+        """
+        Checks if a user is blacklisted without doing any I/O.
+
+        :param user_id: The ID of the user that should be checked.
+        :return: True or False, or None if the cache is not loaded and the database must be asked.
+        """
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user_id in self._ids
+
+    def add(self, user_id: int) -> None:
+        self._ids.add(int(user_id))
+
+    def discard(self, user_id: int) -> None:
+        self._ids.discard(int(user_id))
@@ -0,0 +1,108 @@
+import json
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, List, Optional
+
+from helpers import db_manager
+
+CHUNK_SIZE = 10_000  # IDs inserted per transaction
+FORMATS = ("csv", "jsonl")
+MAX_USER_ID = 2 ** 63 - 1
+
+
+class ImportResult:
+    """
+    Progress of a blacklist import, updated after each chunk.
+    """
+
+    def __init__(self):
+        self.read = 0  # Valid IDs read so far
+        self.added = 0
+        self.invalid = 0  # Lines that do not hold a user ID, e.g. a CSV header
+
+    @property
+    def skipped(self) -> int:
+        # IDs that were already blacklisted, or repeated in the file
+        return self.read - self.added
+
+    def __str__(self) -> str:
+        return f"{self.read} IDs read, {self.added} added, {self.skipped} duplicates skipped, {self.invalid} invalid lines"
+
+
+def parse_line(line: str) -> Optional[int]:
+    """
+    :param line: A line of a CSV file, the ID being in the first column, or of a JSONL file, each
+        line being an ID or an object with a "user_id" or "id" key.
+    :return: The user ID of the line, None if it does not hold one.
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        value = str(data.get("user_id", data.get("id", ""))) if isinstance(data, dict) else ""
+    else:
+        value = line.split(",", 1)[0].strip().strip('"')
+    if not value.isdigit():
+        return None
+    user_id = int(value)
+    return user_id if 0 < user_id <= MAX_USER_ID else None
+
+
+async def import_blacklist(lines: AsyncIterable[str], chunk_size: int = CHUNK_SIZE, progress: Optional[Callable[[ImportResult], Awaitable[None]]] = None) -> ImportResult:
+    """
+    Adds the user IDs of a stream of lines to the blacklist, one transaction per chunk, holding a
+    single chunk in memory at a time. The blacklist cache of every cluster is swapped once at the
+    end, so the checks never see a partial import.
+
+    :param lines: The lines of a CSV or JSONL file.
+    :param chunk_size: The number of IDs inserted per transaction.
+    :param progress: Called after each chunk with the progress of the import.
+    :return: The result of the import.
+    """
+    result = ImportResult()
+    chunk: List[int] = []
+
+    async def flush() -> None:
+        result.added += await db_manager.add_users_to_blacklist(chunk)
+        result.read += len(chunk)
+        chunk.clear()
+        if progress is not None:
+            await progress(result)
+
+    try:
+        async for line in lines:
+            user_id = parse_line(line)
+            if user_id is None:
+                result.invalid += line.strip() != ""
+                continue
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                await flush()
+        if chunk:
+            await flush()
+    finally:
+        if result.added:
+            await db_manager.reload_blacklist()
+    return result
+
+
+def format_row(user_id: int, created_at: str, format_: str) -> str:
+    if format_ == "jsonl":
+        return json.dumps({"user_id": user_id, "created_at": created_at}) + "\n"
+    return f"{user_id},{created_at}\n"
+
+
+async def export_blacklist(format_: str = "csv", page_size: int = CHUNK_SIZE) -> AsyncIterator[str]:
+    """
+    Streams the blacklist as lines of a CSV or JSONL file, one page of the table at a time.
+
+    :param format_: "csv", which starts with a header line, or "jsonl".
+    :param page_size: The number of users read per query.
+    :return: An async iterator over the lines, ordered by user ID.
+    """
+    if format_ not in FORMATS:
+        raise ValueError(f"Unknown format '{format_}', expected one of {', '.join(FORMATS)}")
+    if format_ == "csv":
+        yield "user_id,created_at\n"
+    async for user_id, created_at in db_manager.iter_blacklist(page_size):
+        yield format_row(user_id, created_at, format_)
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Iterable, Mapping
+
+import discord
+
+# Intents the cogs rely on: guilds and channels, messages and their content for the prefix
+# commands and snipe, and reactions for the giveaway entrants.
+USED_INTENTS = ["guilds", "guild_messages", "dm_messages", "guild_reactions", "message_content"]
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # What discord.py does by default, every default intent and 1000 cached messages
+    "default": {
+        "intents": ["default", "message_content"],
+        "max_messages": 1000,
+        "member_cache_flags": ["voice"],
+        "chunk_guilds_at_startup": False
+    },
+    # Only the intents the cogs use, no member cache, a small message cache for snipe
+    "lean": {
+        "intents": USED_INTENTS,
+        "max_messages": 200,
+        "member_cache_flags": [],
+        "chunk_guilds_at_startup": False
+    },
+    # Same as lean without any message cache, which disables snipe
+    "minimal": {
+        "intents": USED_INTENTS,
+        "max_messages": None,
+        "member_cache_flags": [],
+        "chunk_guilds_at_startup": False
+    }
+}
+
+
+def build_intents(names: Iterable[str]) -> discord.Intents:
+    """
+    :param names: The names of the enabled intents, "default" standing for discord.py's default intents.
+    :return: The intents.
+    """
+    intents = discord.Intents.none()
+    for name in names:
+        if name == "default":
+            intents.value |= discord.Intents.default().value
+        elif name in discord.Intents.VALID_FLAGS:
+            setattr(intents, name, True)
+        else:
+            raise ValueError(f"Unknown intent '{name}'")
+    return intents
+
+
+def build_member_cache_flags(names: Iterable[str]) -> discord.MemberCacheFlags:
+    """
+    :param names: The names of the enabled member cache flags, "voice" and/or "joined".
+    :return: The member cache flags.
+    """
+    flags = discord.MemberCacheFlags.none()
+    for name in names:
+        if name not in discord.MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Unknown member cache flag '{name}'")
+        setattr(flags, name, True)
+    return flags
+
+
+def resolve(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Gets the cache settings of the profile named by "cache_profile", updated with the "cache" overrides.
+
+    :param config: The configuration of the bot.
+    :return: The settings, as found in PROFILES.
+    """
+    name = config.get("cache_profile", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown cache profile '{name}', expected one of {', '.join(PROFILES)}")
+    settings = dict(PROFILES[name])
+    settings.update(config.get("cache", {}))
+    return settings
+
+
+def client_options(settings: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    :param settings: Cache settings, as returned by resolve.
+    :return: The keyword arguments of the client setting up its intents and caches.
+    """
+    return {
+        "intents": build_intents(settings["intents"]),
+        "max_messages": settings["max_messages"],
+        "member_cache_flags": build_member_cache_flags(settings["member_cache_flags"]),
+        "chunk_guilds_at_startup": settings["chunk_guilds_at_startup"]
+    }
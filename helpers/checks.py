@@ -6,14 +6,13 @@ Description:
 Version: 5.4.1
 """
 
-import json
-import os
 from typing import Callable, TypeVar
 
 from discord.ext import commands
 
 from exceptions import *
 from helpers import db_manager
+from helpers.rate_limit import RateLimiter
 
 T = TypeVar("T")
 
@@ -23,9 +22,7 @@ def is_owner() -> Callable[[T], T]:
     This is a custom check to see if the user executing the command is an owner of the bot.
     """
     async def predicate(context: commands.Context) -> bool:
-        with open(f"{os.path.realpath(os.path.dirname(__file__))}/../config.json") as file:
-            data = json.load(file)
-        if context.author.id not in data["owners"]:
+        if context.author.id not in context.bot.config.owners:
             raise UserNotOwner
         return True
 
@@ -42,3 +39,20 @@ def not_blacklisted() -> Callable[[T], T]:
         return True
 
     return commands.check(predicate)
+
+
+def not_rate_limited(limiter: RateLimiter) -> Callable[[T], T]:
+    """
+    This is a custom check to see if the user executing the command sent too many commands recently.
+    It does no I/O, so it should run before the other checks. The owners are never limited.
+    """
+    async def predicate(context: commands.Context) -> bool:
+        user_id = context.author.id
+        if user_id in context.bot.config.owners:
+            return True
+        retry_after = limiter.hit(user_id)
+        if retry_after:
+            raise UserRateLimited(retry_after, limiter.notify(user_id))
+        return True
+
+    return commands.check(predicate)
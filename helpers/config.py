@@ -0,0 +1,68 @@
+import json
+import os
+from typing import Any, FrozenSet, Iterator, Mapping, Optional
+
+
+class Config(Mapping):
+    """
+    The content of ``config.json``, shared by the bot and the checks.
+
+    The file is only read by :meth:`load`, which the bot calls again from a background task when
+    the modification time of the file changes, so reading the config never does any I/O.
+    """
+
+    def __init__(self, path: str):
+        """
+        Loads the configuration file.
+
+        :param path: The path of the configuration file.
+        """
+        self.path = path
+        self._data: dict = {}
+        self._mtime: Optional[int] = None
+        self._failed_mtime: Optional[int] = -1  # Version of the file that failed to load, None if it was missing
+        self.owners: FrozenSet[int] = frozenset()
+        self.load()
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def load(self) -> None:
+        """
+        Reads the configuration file and precomputes the derived values.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path) as file:
+            data = json.load(file)
+        self.owners = frozenset(int(owner) for owner in data.get("owners", []))
+        self._data = data
+        self._mtime = mtime
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the configuration file if it has been modified since it was last read.
+
+        A version of the file that fails to load raises once, then is ignored until the file is
+        modified again, so the same error is not reported over and over.
+
+        :return: True if the configuration has been reloaded, False if not.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime or mtime == self._failed_mtime:
+            return False
+        try:
+            self.load()
+        except (OSError, ValueError):
+            self._failed_mtime = mtime
+            raise
+        self._failed_mtime = -1
+        return True
@@ -6,13 +6,132 @@ Description:
 Version: 5.4.1
 """
 
+import asyncio
+import json
 import os
+import random
+import zlib
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Container, Dict, Iterable, List, Optional, Tuple
 
 import aiosqlite
 
+from helpers.blacklist_cache import BlacklistCache
+from helpers.db_pool import ConnectionPool
+from helpers.metrics import timed
+from helpers.transcripts import Transcript
+from helpers.write_queue import Operation, WriteQueue
+
 DATABASE_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/database.db"
 
+pool: Optional[ConnectionPool] = None
+write_queue: Optional[WriteQueue] = None
+blacklist = BlacklistCache()
+# Coroutine functions called with ("add" or "remove", user_id) after each change of the blacklist,
+# or with ("reload", None) after a bulk change, e.g. to share it with the other clusters of the bot
+blacklist_listeners: List[Callable[[str, Optional[int]], Awaitable[None]]] = []
+
+
+async def connect(path: Optional[str] = None, readers: int = 4, group_commit: bool = True) -> ConnectionPool:
+    """
+    This function will open the shared connection pool used by every query of this module.
+
+    :param path: The path of the database file, DATABASE_PATH if not given.
+    :param readers: The number of read-only connections of the pool.
+    :param group_commit: Whether concurrent writes should be committed together by the write queue.
+    :return: The opened pool.
+    """
+    global pool, write_queue
+    if pool is None or not pool.is_open:
+        pool = await ConnectionPool(path or DATABASE_PATH, readers).open()
+        await load_blacklist()
+        if group_commit:
+            write_queue = WriteQueue(pool)
+            write_queue.start()
+    return pool
+
+
+async def close() -> None:
+    """
+    This function will flush the pending writes and close the shared connection pool.
+    """
+    global pool, write_queue
+    if write_queue is not None:
+        await write_queue.stop()
+        write_queue = None
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+@asynccontextmanager
+async def _transient() -> AsyncIterator[aiosqlite.Connection]:
+    # Used when the pool is not open, e.g. from a standalone script.
+    async with aiosqlite.connect(DATABASE_PATH) as db:
+        yield db
+        await db.commit()
+
+
+def _reader():
+    return pool.reader() if pool is not None else _transient()
+
+
+def _writer():
+    return pool.writer() if pool is not None else _transient()
+
 
+async def _write(operation: Operation) -> Any:
+    # Single writes go through the write queue so that concurrent ones share a commit.
+    if write_queue is not None and write_queue.is_running:
+        return await write_queue.submit(operation)
+    async with _writer() as db:
+        return await operation(db)
+
+
+async def _count(db: aiosqlite.Connection, query: str, parameters: tuple = ()) -> int:
+    async with db.execute(query, parameters) as cursor:
+        result = await cursor.fetchone()
+        return result[0] if result is not None else 0
+
+
+@timed
+async def load_blacklist() -> None:
+    """
+    This function will load every blacklisted user into the in-memory blacklist cache, replacing
+    its content in a single swap once every row has been read.
+    """
+    user_ids = set()
+    async with _reader() as db:
+        async with db.execute("SELECT user_id FROM blacklist") as cursor:
+            while rows := await cursor.fetchmany(10_000):
+                user_ids.update(row[0] for row in rows)
+    blacklist.swap(user_ids)
+
+
+@timed
+async def reload_blacklist() -> None:
+    """
+    This function will reload the blacklist cache after a bulk change and notify the blacklist listeners.
+    """
+    await load_blacklist()
+    for listener in blacklist_listeners:
+        await listener("reload", None)
+
+
+@timed
+async def count_blacklist() -> int:
+    """
+    This function will count the blacklisted users, from the cache once it is loaded.
+
+    :return: The number of blacklisted users.
+    """
+    if blacklist.loaded:
+        return len(blacklist)
+    async with _reader() as db:
+        return await _count(db, "SELECT COUNT(*) FROM blacklist")
+
+
+@timed
 async def is_blacklisted(user_id: int) -> bool:
     """
     This function will check if a user is blacklisted.
@@ -20,59 +139,159 @@ async def is_blacklisted(user_id: int) -> bool:
     :param user_id: The ID of the user that should be checked.
     :return: True if the user is blacklisted, False if not.
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    cached = blacklist.lookup(user_id)
+    if cached is not None:
+        return cached
+    async with _reader() as db:
         async with db.execute("SELECT * FROM blacklist WHERE user_id=?", (user_id,)) as cursor:
             result = await cursor.fetchone()
             return result is not None
 
 
+@timed
 async def add_user_to_blacklist(user_id: int) -> int:
     """
     This function will add a user based on its ID in the blacklist.
 
     :param user_id: The ID of the user that should be added into the blacklist.
+    :return: The number of blacklisted users.
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("INSERT INTO blacklist(user_id) VALUES (?)", (user_id,))
-        await db.commit()
-        rows = await db.execute("SELECT COUNT(*) FROM blacklist")
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("INSERT OR IGNORE INTO blacklist(user_id) VALUES (?)", (user_id,))
+
+    await _write(operation)
+    blacklist.add(user_id)
+    for listener in blacklist_listeners:
+        await listener("add", user_id)
+    return await count_blacklist()
+
+
+@timed
+async def add_users_to_blacklist(user_ids: List[int]) -> int:
+    """
+    This function will add a chunk of users to the blacklist in a single transaction, skipping the
+    users who already are. The cache is left as is, see reload_blacklist.
+
+    :param user_ids: The IDs of the users that should be added into the blacklist.
+    :return: The number of users who have been added.
+    """
+    async def operation(db: aiosqlite.Connection) -> int:
+        cursor = await db.executemany("INSERT OR IGNORE INTO blacklist(user_id) VALUES (?)", [(user_id,) for user_id in user_ids])
+        return cursor.rowcount
+
+    return await _write(operation)
 
 
+@timed
+async def get_blacklist_page(after_id: int = 0, limit: int = 10_000) -> list:
+    """
+    This function will get the blacklisted users following a user ID.
+
+    :param after_id: The ID after which the page starts, 0 for the first page.
+    :param limit: The maximum number of users.
+    :return: A list of (user_id, created_at) tuples, ordered by user ID.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT user_id, created_at FROM blacklist WHERE user_id > ? ORDER BY user_id LIMIT ?", (after_id, limit,)) as cursor:
+            return await cursor.fetchall()
+
+
+async def iter_blacklist(page_size: int = 10_000) -> AsyncIterator[tuple]:
+    """
+    This function will stream the whole blacklist, holding a single page in memory at a time.
+
+    :param page_size: The number of users fetched per query.
+    :return: An async iterator over the (user_id, created_at) tuples, ordered by user ID.
+    """
+    after_id = 0
+    while True:
+        page = await get_blacklist_page(after_id, page_size)
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+
+@timed
 async def remove_user_from_blacklist(user_id: int) -> int:
     """
     This function will remove a user based on its ID from the blacklist.
 
     :param user_id: The ID of the user that should be removed from the blacklist.
+    :return: The number of blacklisted users.
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async def operation(db: aiosqlite.Connection) -> None:
         await db.execute("DELETE FROM blacklist WHERE user_id=?", (user_id,))
-        await db.commit()
-        rows = await db.execute("SELECT COUNT(*) FROM blacklist")
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+
+    await _write(operation)
+    blacklist.discard(user_id)
+    for listener in blacklist_listeners:
+        await listener("remove", user_id)
+    return await count_blacklist()
+
+
+# Columns of a warning as returned by the warning queries, filtered by server_id then user_id
+WARNINGS_SQL = "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE server_id=? AND user_id=?"
+
+# Allocates the next warn ID of the (server, user) pair and inserts the warn in one statement.
+# The IDs of the archived warns are never given again, even once the newest warns are archived.
+ADD_WARN_SQL = (
+    "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) "
+    "SELECT MAX(COALESCE(MAX(id), 0), COALESCE((SELECT last_id FROM archived_warn_ids WHERE server_id=?2 AND user_id=?1), 0)) + 1, ?1, ?2, ?3, ?4 "
+    "FROM warns WHERE server_id=?2 AND user_id=?1 "
+    "RETURNING id"
+)
+
+# Records the highest archived warn ID of each (server, user) pair.
+ARCHIVED_WARN_ID_SQL = (
+    "INSERT INTO archived_warn_ids(server_id, user_id, last_id) VALUES (?, ?, ?) "
+    "ON CONFLICT(server_id, user_id) DO UPDATE SET last_id=MAX(last_id, excluded.last_id)"
+)
 
 
+@timed
 async def add_warn(user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
     """
     This function will add a warn to the database.
 
     :param user_id: The ID of the user that should be warned.
+    :param server_id: The ID of the server where the user should be warned.
+    :param moderator_id: The ID of the moderator that warned the user.
     :param reason: The reason why the user should be warned.
+    :return: The ID of the new warn.
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        rows = await db.execute("SELECT id FROM warns WHERE user_id=? AND server_id=? ORDER BY id DESC LIMIT 1", (user_id, server_id,))
-        async with rows as cursor:
+    async def operation(db: aiosqlite.Connection) -> int:
+        async with db.execute(ADD_WARN_SQL, (user_id, server_id, moderator_id, reason,)) as cursor:
             result = await cursor.fetchone()
-            warn_id = result[0] + 1 if result is not None else 1
-            await db.execute("INSERT INTO warns(id, user_id, server_id, moderator_id, reason) VALUES (?, ?, ?, ?, ?)", (warn_id, user_id, server_id, moderator_id, reason,))
-            await db.commit()
-            return warn_id
+            return result[0]
+
+    return await _write(operation)
 
 
+@timed
+async def add_warns(user_ids: Iterable[int], server_id: int, moderator_id: int, reason: str) -> Dict[int, int]:
+    """
+    This function will warn many users at once, in a single transaction.
+
+    :param user_ids: The IDs of the users that should be warned.
+    :param server_id: The ID of the server where the users should be warned.
+    :param moderator_id: The ID of the moderator that warned the users.
+    :param reason: The reason why the users should be warned.
+    :return: A dictionary mapping the ID of each user to the ID of their new warn.
+    """
+    async def operation(db: aiosqlite.Connection) -> Dict[int, int]:
+        warn_ids = {}
+        for user_id in user_ids:
+            async with db.execute(ADD_WARN_SQL, (user_id, server_id, moderator_id, reason,)) as cursor:
+                result = await cursor.fetchone()
+                warn_ids[user_id] = result[0]
+        return warn_ids
+
+    return await _write(operation)
+
+
+@timed
 async def remove_warn(warn_id: int, user_id: int, server_id: int) -> int:
     """
     This function will remove a warn from the database.
@@ -81,15 +300,31 @@ async def remove_warn(warn_id: int, user_id: int, server_id: int) -> int:
     :param user_id: The ID of the user that was warned.
     :param server_id: The ID of the server where the user has been warned
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async def operation(db: aiosqlite.Connection) -> int:
         await db.execute("DELETE FROM warns WHERE id=? AND user_id=? AND server_id=?", (warn_id, user_id, server_id,))
-        await db.commit()
-        rows = await db.execute("SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?", (user_id, server_id,))
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+        return await _count(db, "SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?", (user_id, server_id,))
+
+    return await _write(operation)
+
+
+@timed
+async def clear_warns(user_ids: Iterable[int], server_id: int) -> int:
+    """
+    This function will remove every warn of many users at once, in a single transaction.
+
+    :param user_ids: The IDs of the users whose warns should be removed.
+    :param server_id: The ID of the server where the users have been warned.
+    :return: The number of removed warns.
+    """
+    async def operation(db: aiosqlite.Connection) -> int:
+        before = db.total_changes
+        await db.executemany("DELETE FROM warns WHERE server_id=? AND user_id=?", ((server_id, user_id,) for user_id in user_ids))
+        return db.total_changes - before
 
+    return await _write(operation)
 
+
+@timed
 async def get_warnings(user_id: int, server_id: int) -> list:
     """
     This function will get all the warnings of a user.
@@ -98,11 +333,650 @@ async def get_warnings(user_id: int, server_id: int) -> list:
     :param server_id: The ID of the server that should be checked.
     :return: A list of all the warnings of the user.
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        rows = await db.execute("SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE user_id=? AND server_id=?", (user_id, server_id,))
-        async with rows as cursor:
-            result = await cursor.fetchall()
-            result_list = []
-            for row in result:
-                result_list.append(row)
-            return result_list
+    async with _reader() as db:
+        async with db.execute(f"{WARNINGS_SQL} ORDER BY id", (server_id, user_id,)) as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def get_warnings_page(user_id: int, server_id: int, after_id: int = 0, limit: int = 10) -> list:
+    """
+    This function will get the warnings of a user following a given warn, walking the index instead of skipping rows.
+
+    :param user_id: The ID of the user that should be checked.
+    :param server_id: The ID of the server that should be checked.
+    :param after_id: The ID of the last warn of the previous page, 0 for the first page.
+    :param limit: The maximum number of warnings to return.
+    :return: A list of the warnings of the user, ordered by ID.
+    """
+    async with _reader() as db:
+        async with db.execute(f"{WARNINGS_SQL} AND id > ? ORDER BY id LIMIT ?", (server_id, user_id, after_id, limit,)) as cursor:
+            return await cursor.fetchall()
+
+
+async def iter_warnings(user_id: int, server_id: int, page_size: int = 100) -> AsyncIterator[tuple]:
+    """
+    This function will stream all the warnings of a user, holding a single page in memory at a time.
+
+    :param user_id: The ID of the user that should be checked.
+    :param server_id: The ID of the server that should be checked.
+    :param page_size: The number of warnings fetched per query.
+    :return: An async iterator over the warnings of the user, ordered by ID.
+    """
+    after_id = 0
+    while True:
+        page = await get_warnings_page(user_id, server_id, after_id, page_size)
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        after_id = page[-1][5]
+
+
+@timed
+async def count_warnings(user_id: int, server_id: int) -> int:
+    """
+    This function will count the warnings of a user.
+
+    :param user_id: The ID of the user that should be checked.
+    :param server_id: The ID of the server that should be checked.
+    :return: The number of warnings of the user.
+    """
+    async with _reader() as db:
+        return await _count(db, "SELECT COUNT(*) FROM warns WHERE server_id=? AND user_id=?", (server_id, user_id,))
+
+
+@timed
+async def get_top_warned_users(server_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+    """
+    This function will get the most warned users of a server, grouped along the (server_id, user_id) index.
+
+    :param server_id: The ID of the server that should be checked.
+    :param limit: The maximum number of users to return.
+    :return: A list of (user_id, warn_count) tuples, most warned first.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT user_id, COUNT(*) AS warn_count FROM warns WHERE server_id=? GROUP BY user_id ORDER BY warn_count DESC, user_id LIMIT ?", (server_id, limit,)) as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def get_moderator_warn_counts(server_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+    """
+    This function will count the warns given by each moderator of a server, grouped along the (server_id, moderator_id) index.
+
+    :param server_id: The ID of the server that should be checked.
+    :param limit: The maximum number of moderators to return.
+    :return: A list of (moderator_id, warn_count) tuples, most active first.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT moderator_id, COUNT(*) AS warn_count FROM warns WHERE server_id=? GROUP BY moderator_id ORDER BY warn_count DESC, moderator_id LIMIT ?", (server_id, limit,)) as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def get_warn_retention(server_id: int) -> Optional[int]:
+    """
+    This function will get the number of days the warns of a server are kept.
+
+    :param server_id: The ID of the server.
+    :return: The number of days, 0 to keep them forever, or None if the server uses the default retention.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT days FROM warn_retention WHERE server_id=?", (server_id,)) as cursor:
+            result = await cursor.fetchone()
+            return result[0] if result is not None else None
+
+
+@timed
+async def set_warn_retention(server_id: int, days: int) -> None:
+    """
+    This function will set the number of days the warns of a server are kept.
+
+    :param server_id: The ID of the server.
+    :param days: The number of days, 0 to keep the warns forever.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("INSERT INTO warn_retention(server_id, days) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET days=excluded.days", (server_id, days,))
+
+    await _write(operation)
+
+
+@timed
+async def get_warned_servers() -> List[Tuple[int, Optional[int]]]:
+    """
+    This function will get every server having warns, along with its retention. The servers are
+    found by jumping from one to the next along the (server_id, created_at) index, so the cost
+    grows with the number of servers rather than the number of warns.
+
+    :return: A list of (server_id, days) tuples, days being None for the servers using the default retention.
+    """
+    servers = []
+    async with _reader() as db:
+        server_id = -1
+        while True:
+            async with db.execute("SELECT MIN(server_id) FROM warns WHERE server_id > ?", (server_id,)) as cursor:
+                server_id = (await cursor.fetchone())[0]
+            if server_id is None:
+                break
+            servers.append(server_id)
+        async with db.execute("SELECT server_id, days FROM warn_retention") as cursor:
+            retention = dict(await cursor.fetchall())
+    return [(server_id, retention.get(server_id)) for server_id in servers]
+
+
+@timed
+async def archive_expired_warns(server_id: int, days: int, batch_size: int = 500) -> int:
+    """
+    This function will move the oldest expired warns of a server to the archive, compressed together
+    in a single row. It handles one batch per call, so that the write lock is only held briefly.
+
+    :param server_id: The ID of the server.
+    :param days: The number of days the warns of the server are kept.
+    :param batch_size: The maximum number of warns moved.
+    :return: The number of warns that have been archived, lower than batch_size once none are left.
+    """
+    async def operation(db: aiosqlite.Connection) -> int:
+        async with db.execute(
+            "SELECT rowid, id, user_id, moderator_id, reason, created_at FROM warns WHERE server_id=? AND created_at < datetime('now', ?) ORDER BY created_at LIMIT ?",
+            (server_id, f"-{int(days)} days", batch_size,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            return 0
+        lines = "".join(json.dumps({"id": id_, "user_id": user_id, "moderator_id": moderator_id, "reason": reason, "created_at": created_at}) + "\n" for _, id_, user_id, moderator_id, reason, created_at in rows)
+        await db.execute(
+            "INSERT INTO warns_archive(server_id, warn_count, oldest_at, newest_at, data) VALUES (?, ?, ?, ?, ?)",
+            (server_id, len(rows), rows[0][5], rows[-1][5], await asyncio.to_thread(zlib.compress, lines.encode()),)
+        )
+        await db.executemany("DELETE FROM warns WHERE rowid=?", [(row[0],) for row in rows])
+        await db.executemany(ARCHIVED_WARN_ID_SQL, [(server_id, user_id, id_) for _, id_, user_id, _, _, _ in rows])
+        return len(rows)
+
+    return await _write(operation)
+
+
+@timed
+async def backfill_archived_warn_ids() -> int:
+    """
+    This function will record the highest warn ID of each user found in the archive, for the warns
+    archived before these IDs were recorded. It does nothing once they are recorded.
+
+    :return: The number of (server, user) pairs recorded.
+    """
+    async def operation(db: aiosqlite.Connection) -> int:
+        if await _count(db, "SELECT EXISTS(SELECT 1 FROM archived_warn_ids)") or not await _count(db, "SELECT EXISTS(SELECT 1 FROM warns_archive)"):
+            return 0
+        last_ids = {}
+        async with db.execute("SELECT server_id, data FROM warns_archive") as cursor:
+            async for server_id, data in cursor:
+                for line in (await asyncio.to_thread(zlib.decompress, data)).decode().splitlines():
+                    warn = json.loads(line)
+                    key = (server_id, warn["user_id"])
+                    last_ids[key] = max(last_ids.get(key, 0), warn["id"])
+        await db.executemany(ARCHIVED_WARN_ID_SQL, [(server_id, user_id, last_id) for (server_id, user_id), last_id in last_ids.items()])
+        return len(last_ids)
+
+    return await _write(operation)
+
+
+async def iter_archived_warns(server_id: int) -> AsyncIterator[dict]:
+    """
+    This function will stream the archived warns of a server, decompressing one batch at a time.
+
+    :param server_id: The ID of the server.
+    :return: An async iterator over the archived warns, as dictionaries.
+    """
+    after_id = 0
+    while True:
+        async with _reader() as db:
+            async with db.execute("SELECT id, data FROM warns_archive WHERE server_id=? AND id > ? ORDER BY id LIMIT 1", (server_id, after_id,)) as cursor:
+                result = await cursor.fetchone()
+        if result is None:
+            return
+        after_id, data = result
+        for line in zlib.decompress(data).decode().splitlines():
+            yield json.loads(line)
+
+
+@timed
+async def incremental_vacuum(pages: int) -> int:
+    """
+    This function will give back to the file system up to the given number of free pages of the
+    database, which must be in incremental auto-vacuum mode.
+
+    :param pages: The maximum number of pages to free.
+    :return: The number of free pages left.
+    """
+    async with _writer() as db:
+        # The sqlite3 module only steps the pragma once, freeing a single page, executescript runs it to the end
+        await db.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return await _count(db, "PRAGMA freelist_count")
+
+
+# States of the ended column of the giveaways
+GIVEAWAY_RUNNING = 0
+GIVEAWAY_ENDED = 1
+GIVEAWAY_DRAWN = 2  # The winners are stored but not announced yet
+
+
+@timed
+async def add_giveaway(message_id: int, server_id: int, channel_id: int, host_id: int, prize: str, winners: int, ends_at: int) -> None:
+    """
+    This function will add a running giveaway to the database.
+
+    :param message_id: The ID of the giveaway message.
+    :param server_id: The ID of the server where the giveaway is held.
+    :param channel_id: The ID of the channel where the giveaway is held.
+    :param host_id: The ID of the member hosting the giveaway.
+    :param prize: The prize of the giveaway.
+    :param winners: The number of winners.
+    :param ends_at: The UNIX timestamp at which the giveaway ends.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("INSERT INTO giveaways(message_id, server_id, channel_id, host_id, prize, winners, ends_at) VALUES (?, ?, ?, ?, ?, ?, ?)", (message_id, server_id, channel_id, host_id, prize, winners, ends_at,))
+
+    await _write(operation)
+
+
+@timed
+async def get_giveaway(message_id: int) -> Optional[tuple]:
+    """
+    This function will get a giveaway.
+
+    :param message_id: The ID of the giveaway message.
+    :return: The giveaway as (message_id, server_id, channel_id, host_id, prize, winners, ends_at, ended), or None if it does not exist.
+             ended is GIVEAWAY_RUNNING, GIVEAWAY_DRAWN or GIVEAWAY_ENDED.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT message_id, server_id, channel_id, host_id, prize, winners, ends_at, ended FROM giveaways WHERE message_id=?", (message_id,)) as cursor:
+            return await cursor.fetchone()
+
+
+@timed
+async def get_pending_giveaways() -> list:
+    """
+    This function will get the deadline of every giveaway that has not ended yet, including the ones whose winners are drawn but not announced.
+
+    :return: A list of (message_id, server_id, ends_at) tuples.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT message_id, server_id, ends_at FROM giveaways WHERE ended IN (?, ?)", (GIVEAWAY_RUNNING, GIVEAWAY_DRAWN,)) as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def mark_giveaway_ended(message_id: int) -> bool:
+    """
+    This function will mark a giveaway as ended, once its winners have been announced.
+
+    :param message_id: The ID of the giveaway message.
+    :return: True if the giveaway had not ended yet, False if it had already ended.
+    """
+    async def operation(db: aiosqlite.Connection) -> bool:
+        cursor = await db.execute("UPDATE giveaways SET ended=? WHERE message_id=? AND ended!=?", (GIVEAWAY_ENDED, message_id, GIVEAWAY_ENDED,))
+        return cursor.rowcount > 0
+
+    return await _write(operation)
+
+
+async def _add_giveaway_entrant(db: aiosqlite.Connection, message_id: int, user_id: int) -> bool:
+    # Entrants get consecutive slots so that winners can be drawn by slot number.
+    cursor = await db.execute("INSERT OR IGNORE INTO giveaway_entrants(giveaway_id, user_id, slot) SELECT message_id, ?, entrant_count FROM giveaways WHERE message_id=? AND ended=0", (user_id, message_id,))
+    if cursor.rowcount <= 0:
+        return False
+    await db.execute("UPDATE giveaways SET entrant_count=entrant_count+1 WHERE message_id=?", (message_id,))
+    return True
+
+
+async def _remove_giveaway_entrant(db: aiosqlite.Connection, message_id: int, user_id: int) -> bool:
+    # The entrant in the last slot is moved into the freed slot to keep the slots consecutive.
+    async with db.execute("SELECT e.slot, g.entrant_count FROM giveaway_entrants e JOIN giveaways g ON g.message_id=e.giveaway_id WHERE e.giveaway_id=? AND e.user_id=? AND g.ended=0", (message_id, user_id,)) as cursor:
+        result = await cursor.fetchone()
+    if result is None:
+        return False
+    slot, count = result
+    await db.execute("DELETE FROM giveaway_entrants WHERE giveaway_id=? AND user_id=?", (message_id, user_id,))
+    if slot != count - 1:
+        await db.execute("UPDATE giveaway_entrants SET slot=? WHERE giveaway_id=? AND slot=?", (slot, message_id, count - 1,))
+    await db.execute("UPDATE giveaways SET entrant_count=entrant_count-1 WHERE message_id=?", (message_id,))
+    return True
+
+
+@timed
+async def add_giveaway_entrant(message_id: int, user_id: int) -> bool:
+    """
+    This function will add an entrant to a running giveaway.
+
+    :param message_id: The ID of the giveaway message.
+    :param user_id: The ID of the user entering the giveaway.
+    :return: True if the user has been added, False if they had already entered or the giveaway is not running.
+    """
+    async def operation(db: aiosqlite.Connection) -> bool:
+        return await _add_giveaway_entrant(db, message_id, user_id)
+
+    return await _write(operation)
+
+
+@timed
+async def remove_giveaway_entrant(message_id: int, user_id: int) -> bool:
+    """
+    This function will remove an entrant from a running giveaway.
+
+    :param message_id: The ID of the giveaway message.
+    :param user_id: The ID of the user leaving the giveaway.
+    :return: True if the user has been removed, False if they had not entered or the giveaway is not running.
+    """
+    async def operation(db: aiosqlite.Connection) -> bool:
+        return await _remove_giveaway_entrant(db, message_id, user_id)
+
+    return await _write(operation)
+
+
+@timed
+async def sync_giveaway_entrants(message_id: int, user_ids: Iterable[int], skip: Container[int] = ()) -> Tuple[int, int]:
+    """
+    This function will make the entrants of a running giveaway match the given users, in a single transaction.
+
+    :param message_id: The ID of the giveaway message.
+    :param user_ids: The IDs of every user that entered the giveaway.
+    :param skip: The IDs of the users left as they are, checked when the transaction runs, e.g. the ones whose reaction changed since user_ids was read.
+    :return: The number of added and removed entrants.
+    """
+    user_ids = set(user_ids)
+
+    async def operation(db: aiosqlite.Connection) -> Tuple[int, int]:
+        async with db.execute("SELECT user_id FROM giveaway_entrants WHERE giveaway_id=?", (message_id,)) as cursor:
+            current = {row[0] for row in await cursor.fetchall()}
+        added = removed = 0
+        for user_id in user_ids - current:
+            if user_id not in skip:
+                added += await _add_giveaway_entrant(db, message_id, user_id)
+        for user_id in current - user_ids:
+            if user_id not in skip:
+                removed += await _remove_giveaway_entrant(db, message_id, user_id)
+        return added, removed
+
+    return await _write(operation)
+
+
+async def _draw_giveaway_entrants(db: aiosqlite.Connection, message_id: int, count: int, excluded: Iterable[int] = ()) -> List[int]:
+    # The excluded users hold at most len(excluded) slots, so drawing that many more slots is enough.
+    excluded = set(excluded)
+    async with db.execute("SELECT entrant_count FROM giveaways WHERE message_id=?", (message_id,)) as cursor:
+        result = await cursor.fetchone()
+    if result is None or result[0] == 0 or count <= 0:
+        return []
+    slots = random.sample(range(result[0]), k=min(result[0], count + len(excluded)))
+    placeholders = ", ".join("?" * len(slots))
+    async with db.execute(f"SELECT slot, user_id FROM giveaway_entrants WHERE giveaway_id=? AND slot IN ({placeholders})", (message_id, *slots,)) as cursor:
+        users = dict(await cursor.fetchall())
+    return [users[slot] for slot in slots if slot in users and users[slot] not in excluded][:count]
+
+
+@timed
+async def draw_giveaway_entrants(message_id: int, count: int) -> List[int]:
+    """
+    This function will draw random entrants of a giveaway, looking up only the drawn slots.
+
+    :param message_id: The ID of the giveaway message.
+    :param count: The number of entrants to draw.
+    :return: The IDs of the drawn users.
+    """
+    async with _reader() as db:
+        return await _draw_giveaway_entrants(db, message_id, count)
+
+
+async def _get_giveaway_winners(db: aiosqlite.Connection, message_id: int) -> List[Tuple[int, bool]]:
+    async with db.execute("SELECT user_id, notified FROM giveaway_winners WHERE giveaway_id=? AND left_guild=0", (message_id,)) as cursor:
+        return [(user_id, bool(notified)) for user_id, notified in await cursor.fetchall()]
+
+
+@timed
+async def draw_giveaway_winners(message_id: int, count: int) -> List[Tuple[int, bool]]:
+    """
+    This function will draw the winners of a giveaway and store them, so that announcing them can be retried.
+    The entrants of the giveaway do not change anymore once its winners are drawn.
+
+    :param message_id: The ID of the giveaway message.
+    :param count: The number of winners.
+    :return: The winners as (user_id, notified) tuples, the ones drawn before if the giveaway was already drawn.
+    """
+    async def operation(db: aiosqlite.Connection) -> List[Tuple[int, bool]]:
+        cursor = await db.execute("UPDATE giveaways SET ended=? WHERE message_id=? AND ended=?", (GIVEAWAY_DRAWN, message_id, GIVEAWAY_RUNNING,))
+        if cursor.rowcount > 0:
+            drawn = await _draw_giveaway_entrants(db, message_id, count)
+            await db.executemany("INSERT INTO giveaway_winners(giveaway_id, user_id) VALUES (?, ?)", ((message_id, user_id) for user_id in drawn))
+        return await _get_giveaway_winners(db, message_id)
+
+    return await _write(operation)
+
+
+@timed
+async def replace_giveaway_winners(message_id: int, user_ids: Iterable[int]) -> List[Tuple[int, bool]]:
+    """
+    This function will replace winners of a giveaway who left the guild with other entrants, never drawing the same user twice.
+
+    :param message_id: The ID of the giveaway message.
+    :param user_ids: The IDs of the winners who left the guild.
+    :return: The winners as (user_id, notified) tuples, fewer than before if there are not enough entrants left.
+    """
+    user_ids = list(user_ids)
+
+    async def operation(db: aiosqlite.Connection) -> List[Tuple[int, bool]]:
+        await db.executemany("UPDATE giveaway_winners SET left_guild=1 WHERE giveaway_id=? AND user_id=?", ((message_id, user_id) for user_id in user_ids))
+        async with db.execute("SELECT user_id FROM giveaway_winners WHERE giveaway_id=?", (message_id,)) as cursor:
+            drawn_before = [row[0] for row in await cursor.fetchall()]
+        drawn = await _draw_giveaway_entrants(db, message_id, len(user_ids), drawn_before)
+        await db.executemany("INSERT INTO giveaway_winners(giveaway_id, user_id) VALUES (?, ?)", ((message_id, user_id) for user_id in drawn))
+        return await _get_giveaway_winners(db, message_id)
+
+    return await _write(operation)
+
+
+@timed
+async def set_giveaway_winner_notified(message_id: int, user_id: int) -> None:
+    """
+    This function will record that a winner of a giveaway has been told, so that a retry does not tell them again.
+
+    :param message_id: The ID of the giveaway message.
+    :param user_id: The ID of the winner.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("UPDATE giveaway_winners SET notified=1 WHERE giveaway_id=? AND user_id=?", (message_id, user_id,))
+
+    await _write(operation)
+
+
+@timed
+async def add_ticket(channel_id: int, server_id: int, user_id: int, type_: str) -> None:
+    """
+    This function will add an open ticket to the database.
+
+    :param channel_id: The ID of the ticket channel.
+    :param server_id: The ID of the server where the ticket has been created.
+    :param user_id: The ID of the user that created the ticket.
+    :param type_: The type of the ticket.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("INSERT INTO tickets(channel_id, server_id, user_id, type) VALUES (?, ?, ?, ?)", (channel_id, server_id, user_id, type_,))
+
+    await _write(operation)
+
+
+@timed
+async def get_active_tickets() -> list:
+    """
+    This function will get every ticket that has not been closed.
+
+    :return: A list of (channel_id, server_id, user_id, type, status) tuples.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT channel_id, server_id, user_id, type, status FROM tickets WHERE status != 'closed'") as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def claim_ticket(channel_id: int, moderator_id: int) -> bool:
+    """
+    This function will mark an open ticket as claimed.
+
+    :param channel_id: The ID of the ticket channel.
+    :param moderator_id: The ID of the member claiming the ticket.
+    :return: True if the ticket has been claimed, False if it was not open.
+    """
+    async def operation(db: aiosqlite.Connection) -> bool:
+        cursor = await db.execute("UPDATE tickets SET status='claimed', claimed_by=? WHERE channel_id=? AND status='open'", (moderator_id, channel_id,))
+        return cursor.rowcount > 0
+
+    return await _write(operation)
+
+
+@timed
+async def close_ticket(channel_id: int) -> bool:
+    """
+    This function will mark a ticket as closed.
+
+    :param channel_id: The ID of the ticket channel.
+    :return: True if the ticket has been closed, False if it was already closed.
+    """
+    async def operation(db: aiosqlite.Connection) -> bool:
+        cursor = await db.execute("UPDATE tickets SET status='closed', closed_at=CURRENT_TIMESTAMP WHERE channel_id=? AND status != 'closed'", (channel_id,))
+        return cursor.rowcount > 0
+
+    return await _write(operation)
+
+
+@timed
+async def add_transcript(channel_id: int, server_id: int, closed_by: int, transcript: Transcript) -> None:
+    """
+    This function will index the transcript of a closed ticket, along with the users who wrote in it.
+
+    :param channel_id: The ID of the ticket channel.
+    :param server_id: The ID of the server of the ticket.
+    :param closed_by: The ID of the member who closed the ticket.
+    :param transcript: The transcript, as written by the transcript archiver.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute(
+            "INSERT OR REPLACE INTO transcripts(channel_id, server_id, closed_by, path, message_count, size, first_message_at, last_message_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (channel_id, server_id, closed_by, transcript.path, transcript.message_count, transcript.size, transcript.first_message_at, transcript.last_message_at,)
+        )
+        await db.execute("DELETE FROM transcript_participants WHERE channel_id=?", (channel_id,))
+        await db.executemany(
+            "INSERT INTO transcript_participants(user_id, channel_id, message_count) VALUES (?, ?, ?)",
+            ((user_id, channel_id, count) for user_id, count in transcript.participants.items())
+        )
+        # The owner of the ticket finds it even if they never wrote in it
+        await db.execute("INSERT OR IGNORE INTO transcript_participants(user_id, channel_id, message_count) SELECT user_id, channel_id, 0 FROM tickets WHERE channel_id=?", (channel_id,))
+
+    await _write(operation)
+
+
+@timed
+async def search_transcripts(server_id: int, user_id: Optional[int] = None, limit: int = 10) -> list:
+    """
+    This function will get the latest transcripts of a server, optionally only those a user opened or wrote in.
+
+    :param server_id: The ID of the server.
+    :param user_id: The ID of the user, None for every transcript of the server.
+    :param limit: The maximum number of transcripts.
+    :return: A list of (channel_id, owner_id, type, closed_by, message_count, created_at) tuples, the latest first.
+             owner_id and type are None for the tickets opened before they were recorded.
+    """
+    # Channel IDs are snowflakes, so ordering by them orders the tickets by creation
+    select = (
+        "SELECT t.channel_id, tickets.user_id, tickets.type, t.closed_by, t.message_count, t.created_at FROM transcripts t "
+        "LEFT JOIN tickets ON tickets.channel_id=t.channel_id "
+    )
+    async with _reader() as db:
+        if user_id is None:
+            query = select + "WHERE t.server_id=? ORDER BY t.channel_id DESC LIMIT ?"
+            parameters = (server_id, limit,)
+        else:
+            query = select + "JOIN transcript_participants p ON p.channel_id=t.channel_id WHERE p.user_id=? AND t.server_id=? ORDER BY t.channel_id DESC LIMIT ?"
+            parameters = (user_id, server_id, limit,)
+        async with db.execute(query, parameters) as cursor:
+            return await cursor.fetchall()
+
+
+@timed
+async def get_transcript(channel_id: int, server_id: int) -> Optional[tuple]:
+    """
+    This function will get the transcript of a closed ticket.
+
+    :param channel_id: The ID of the ticket channel.
+    :param server_id: The ID of the server of the ticket.
+    :return: A (path, message_count, size) tuple, or None if the ticket has no transcript in this server.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT path, message_count, size FROM transcripts WHERE channel_id=? AND server_id=?", (channel_id, server_id,)) as cursor:
+            return await cursor.fetchone()
+
+
+# Settings of a server, NULL standing for the default value
+GUILD_SETTINGS_COLUMNS = ("prefix", "ticket_category", "giveaway_duration", "giveaway_winners")
+
+
+@timed
+async def get_guild_settings(server_id: int) -> Optional[tuple]:
+    """
+    This function will get the settings of a server.
+
+    :param server_id: The ID of the server.
+    :return: The values of GUILD_SETTINGS_COLUMNS, None for the defaults, or None if the server has no settings.
+    """
+    async with _reader() as db:
+        async with db.execute(f"SELECT {', '.join(GUILD_SETTINGS_COLUMNS)} FROM guild_settings WHERE server_id=?", (server_id,)) as cursor:
+            return await cursor.fetchone()
+
+
+@timed
+async def set_guild_settings(server_id: int, values: Dict[str, Any]) -> None:
+    """
+    This function will change some settings of a server.
+
+    :param server_id: The ID of the server.
+    :param values: The new values by column of GUILD_SETTINGS_COLUMNS, None to go back to the default.
+    """
+    unknown = set(values) - set(GUILD_SETTINGS_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown guild settings: {', '.join(sorted(unknown))}")
+    columns = list(values)
+    query = (
+        f"INSERT INTO guild_settings(server_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+        f"ON CONFLICT(server_id) DO UPDATE SET {', '.join(f'{column}=excluded.{column}' for column in columns)}, updated_at=CURRENT_TIMESTAMP"
+    )
+
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute(query, (server_id, *values.values(),))
+
+    await _write(operation)
+
+
+@timed
+async def get_state(key: str) -> Optional[str]:
+    """
+    This function will get a value persisted by the bot between restarts.
+
+    :param key: The key of the value.
+    :return: The value, or None if it has never been set.
+    """
+    async with _reader() as db:
+        async with db.execute("SELECT value FROM bot_state WHERE key=?", (key,)) as cursor:
+            result = await cursor.fetchone()
+            return result[0] if result is not None else None
+
+
+@timed
+async def set_state(key: str, value: str) -> None:
+    """
+    This function will persist a value of the bot between restarts.
+
+    :param key: The key of the value.
+    :param value: The value.
+    """
+    async def operation(db: aiosqlite.Connection) -> None:
+        await db.execute("INSERT INTO bot_state(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=CURRENT_TIMESTAMP", (key, value,))
+
+    await _write(operation)
@@ -0,0 +1,108 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import aiosqlite
+
+# Applied to every connection of the pool, readers and writer alike.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Number of prepared statements kept per connection by the sqlite3 module.
+CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """
+    A long-lived set of SQLite connections: a pool of read-only connections and a single writer.
+
+    WAL mode lets the readers run while the writer holds its transaction, and the writer lock
+    serializes every mutation so the bot never hits "database is locked".
+    """
+
+    def __init__(self, path: str, readers: int = 4):
+        """
+        Initializes the pool without opening any connection yet.
+
+        :param path: The path of the SQLite database file.
+        :param readers: The number of read-only connections to keep open.
+        """
+        self.path = path
+        self.size = max(1, readers)
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path, cached_statements=CACHED_STATEMENTS)
+        for pragma in PRAGMAS:
+            await db.execute(pragma)
+        if read_only:
+            await db.execute("PRAGMA query_only=ON")
+        return db
+
+    async def open(self) -> "ConnectionPool":
+        """
+        Opens the writer first (it switches the file to WAL mode), then the readers.
+        """
+        if self.is_open:
+            return self
+        self._writer = await self._connect(read_only=False)
+        self._write_lock = asyncio.Lock()
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            db = await self._connect(read_only=True)
+            self._readers.append(db)
+            self._idle.put_nowait(db)
+        return self
+
+    async def close(self) -> None:
+        """
+        Closes every connection. The writer waits for any running transaction to finish.
+        """
+        if not self.is_open:
+            return
+        async with self._write_lock:
+            for db in self._readers:
+                await db.close()
+            self._readers.clear()
+            await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Borrows a read-only connection for the duration of the block.
+        """
+        db = await self._idle.get()
+        try:
+            yield db
+        finally:
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Holds the writer connection exclusively. The block is committed when it exits normally
+        and rolled back if it raises.
+        """
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
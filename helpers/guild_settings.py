@@ -0,0 +1,83 @@
+from typing import Any, Dict, NamedTuple, Optional
+
+from helpers import db_manager
+
+
+class GuildSettings(NamedTuple):
+    # Same fields as db_manager.GUILD_SETTINGS_COLUMNS, with their defaults
+    prefix: Optional[str] = None  # None uses the prefix of config.json
+    ticket_category: str = "Tickets"
+    giveaway_duration: int = 86_400  # Seconds
+    giveaway_winners: int = 1
+
+
+DEFAULTS = GuildSettings()
+
+
+class GuildSettingsCache:
+    """
+    In-memory mirror of the settings of the guilds, so that resolving the prefix of a message never
+    touches SQLite.
+
+    The settings of a guild are loaded when the bot joins it, or the first time they are needed,
+    and stay cached until they change or the bot leaves the guild. Guilds without settings are
+    cached with the defaults, so they are only looked up once.
+    """
+
+    def __init__(self):
+        self._settings: Dict[int, GuildSettings] = {}
+        self._versions: Dict[int, int] = {}  # Bumped on each change, so that a load started before it is not cached
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+    def peek(self, guild_id: int) -> Optional[GuildSettings]:
+        """
+        :param guild_id: The ID of the guild.
+        :return: The cached settings of the guild, None if they are not loaded yet.
+        """
+        return self._settings.get(guild_id)
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        """
+        :param guild_id: The ID of the guild.
+        :return: The settings of the guild, loaded from the database if they are not cached yet.
+        """
+        settings = self._settings.get(guild_id)
+        if settings is not None:
+            self.hits += 1
+            return settings
+        self.misses += 1
+        version = self._versions.get(guild_id, 0)
+        row = await db_manager.get_guild_settings(guild_id)
+        settings = DEFAULTS if row is None else GuildSettings(*(default if value is None else value for value, default in zip(row, DEFAULTS)))
+        if self._versions.get(guild_id, 0) == version:
+            self._settings[guild_id] = settings
+        return settings
+
+    async def update(self, guild_id: int, **values: Any) -> GuildSettings:
+        """
+        Changes some settings of a guild and refreshes its cached settings.
+
+        :param guild_id: The ID of the guild.
+        :param values: The new values by field of GuildSettings, None to go back to the default.
+        :return: The new settings of the guild.
+        """
+        await db_manager.set_guild_settings(guild_id, values)
+        self.invalidate(guild_id)
+        return await self.get(guild_id)
+
+    def invalidate(self, guild_id: int) -> None:
+        self._settings.pop(guild_id, None)
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+    def evict(self, guild_id: int) -> None:
+        """
+        Forgets a guild, e.g. once the bot left it.
+
+        :param guild_id: The ID of the guild.
+        """
+        self._settings.pop(guild_id, None)
+        self._versions.pop(guild_id, None)
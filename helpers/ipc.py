@@ -0,0 +1,125 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class IPCHub:
+    """
+    Relay run by the launcher: every message sent by a cluster is forwarded to all the other clusters.
+
+    Messages are JSON objects, one per line, of the form {"op": ..., "data": ..., "origin": cluster_id}.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, listener: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Initializes the hub.
+
+        :param host: The address to listen on.
+        :param port: The port to listen on, 0 to pick a free one.
+        :param listener: A function also receiving every message, e.g. to learn when a cluster is ready.
+        """
+        self.host = host
+        self.port = port
+        self.listener = listener
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> int:
+        """
+        :return: The port the hub listens on.
+        """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                if self.listener is not None:
+                    self.listener(json.loads(line))
+                for client in list(self._clients):
+                    if client is not writer:
+                        client.write(line)
+                await asyncio.gather(*(client.drain() for client in list(self._clients) if client is not writer), return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # The cluster exited or the hub is stopping, the connection is simply dropped
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+class IPCClient:
+    """
+    Connection of a cluster to the launcher's hub, used to share the state that must be cluster-wide.
+    """
+
+    def __init__(self, cluster_id: int, port: int, host: str = "127.0.0.1"):
+        """
+        Initializes the client.
+
+        :param cluster_id: The ID of the cluster, sent along with every message.
+        :param port: The port of the launcher's hub.
+        :param host: The address of the launcher's hub.
+        """
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.handlers: Dict[str, Handler] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def on(self, op: str, handler: Handler) -> None:
+        """
+        Registers the coroutine function handling the messages of an operation sent by the other clusters.
+
+        :param op: The name of the operation.
+        :param handler: The coroutine function receiving the data of each message.
+        """
+        self.handlers[op] = handler
+
+    async def connect(self) -> None:
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._task = asyncio.create_task(self._listen(reader))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def broadcast(self, op: str, data: Any = None) -> None:
+        """
+        Sends a message to every other cluster.
+
+        :param op: The name of the operation.
+        :param data: The JSON serializable data of the operation.
+        """
+        if self._writer is None:
+            return
+        self._writer.write(json.dumps({"op": op, "data": data, "origin": self.cluster_id}).encode() + b"\n")
+        await self._writer.drain()
+
+    async def _listen(self, reader: asyncio.StreamReader) -> None:
+        while line := await reader.readline():
+            message = json.loads(line)
+            handler = self.handlers.get(message["op"])
+            if handler is None:
+                continue
+            try:
+                await handler(message["data"])
+            except Exception as e:
+                print(f"IPC handler for '{message['op']}' failed\n{type(e).__name__}: {e}")
+        print(f"Cluster {self.cluster_id} lost its connection to the launcher")
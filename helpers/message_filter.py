@@ -0,0 +1,88 @@
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import discord
+
+Trigger = Callable[[discord.Message], bool]
+
+
+class MessageFilter:
+    """
+    Cheap test run on every message before the command machinery, which builds a Context and
+    resolves the prefix even for the messages that are not commands.
+
+    A message passes if its content starts with one of the registered prefixes, which include the
+    command prefix and the mentions of the bot, or if one of the registered triggers accepts it.
+    All the prefixes are tested at once by a single ``str.startswith`` call.
+    """
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        """
+        Initializes the filter.
+
+        :param prefixes: The prefixes a command can start with.
+        """
+        self._prefixes: Set[str] = set(prefixes)
+        self._mentions: Set[str] = set()
+        self._all: Tuple[str, ...] = ()
+        self._triggers: List[Trigger] = []
+        self.passed = 0
+        self.rejected = 0
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._all = tuple(prefix for prefix in self._prefixes | self._mentions if prefix)
+
+    @property
+    def prefixes(self) -> Tuple[str, ...]:
+        return self._all
+
+    def set_prefixes(self, prefixes: Iterable[str]) -> None:
+        """
+        Replaces the command prefixes, e.g. after the configuration changed.
+
+        :param prefixes: The prefixes a command can start with.
+        """
+        self._prefixes = set(prefixes)
+        self._rebuild()
+
+    def add_prefix(self, prefix: str) -> None:
+        """
+        Lets through the messages starting with a prefix, e.g. a custom prefix of a server.
+
+        :param prefix: The prefix to let through.
+        """
+        self._prefixes.add(prefix)
+        self._rebuild()
+
+    def set_user(self, user_id: Optional[int]) -> None:
+        """
+        Lets through the messages starting with a mention of the bot, once its ID is known.
+
+        :param user_id: The ID of the bot user.
+        """
+        self._mentions = {f"<@{user_id}>", f"<@!{user_id}>"} if user_id is not None else set()
+        self._rebuild()
+
+    def add_trigger(self, trigger: Trigger) -> None:
+        """
+        Registers a test letting through the messages that other features handle as commands,
+        e.g. keywords. It must be cheap since it runs on every message that has no prefix.
+
+        :param trigger: A function returning True for the messages to let through.
+        """
+        self._triggers.append(trigger)
+
+    def remove_trigger(self, trigger: Trigger) -> None:
+        if trigger in self._triggers:
+            self._triggers.remove(trigger)
+
+    def should_process(self, message: discord.Message) -> bool:
+        """
+        :param message: The received message.
+        :return: True if the message may be a command and should go through process_commands.
+        """
+        if message.content.startswith(self._all) or (self._triggers and any(trigger(message) for trigger in self._triggers)):
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
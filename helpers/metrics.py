@@ -0,0 +1,197 @@
+import asyncio
+import bisect
+import functools
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Upper bounds, in seconds, of the histogram buckets, from cache hits to slow Discord requests
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_INTERVAL = 0.5  # Seconds between two measures of the event loop lag
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed buckets, in the Prometheus format.
+    """
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: The upper bound of the bucket holding the given quantile, the maximum if it is past the last bucket.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+class Metrics:
+    """
+    Bot-wide registry of the command, database and event loop metrics.
+    """
+
+    def __init__(self):
+        self.commands: Dict[str, Histogram] = {}
+        self.queries: Dict[str, Histogram] = {}
+        self.errors: Counter = Counter()  # (command, exception type) -> count
+        self.loop_lag = Histogram()
+        self.gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def observe_command(self, command: str, seconds: float) -> None:
+        histogram = self.commands.get(command)
+        if histogram is None:
+            histogram = self.commands[command] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_query(self, query: str, seconds: float) -> None:
+        histogram = self.queries.get(query)
+        if histogram is None:
+            histogram = self.queries[query] = Histogram()
+        histogram.observe(seconds)
+
+    def count_error(self, command: str, error: BaseException) -> None:
+        self.errors[(command, type(error).__name__)] += 1
+
+    def add_gauges(self, name: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """
+        Registers a function returning values exported as gauges, e.g. the counters of the outbound scheduler.
+
+        :param name: The prefix of the gauges.
+        :param collect: A function returning the value of each gauge by name.
+        """
+        self.gauges[name] = collect
+
+    def render(self) -> str:
+        """
+        :return: Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histograms(name: str, label: str, values: Dict[str, Histogram], help_: str) -> None:
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(values.items()):
+                labels = f'{label}="{escape(key)}",' if label else ""
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+                selector = f"{{{labels[:-1]}}}" if labels else ""
+                lines.append(f"{name}_sum{selector} {histogram.sum}")
+                lines.append(f"{name}_count{selector} {histogram.count}")
+
+        histograms("bot_command_duration_seconds", "command", self.commands, "Time from the invocation to the completion of a command.")
+        histograms("bot_db_query_duration_seconds", "query", self.queries, "Time taken by a db_manager function, including the wait for a connection.")
+        histograms("bot_event_loop_lag_seconds", "", {"": self.loop_lag}, "Delay of the event loop in running a ready callback.")
+        lines.append("# HELP bot_command_errors_total Errors raised by the commands, by exception type.")
+        lines.append("# TYPE bot_command_errors_total counter")
+        for (command, error), count in sorted(self.errors.items()):
+            lines.append(f'bot_command_errors_total{{command="{escape(command)}",error="{error}"}} {count}')
+        for name, collect in self.gauges.items():
+            for key, value in collect().items():
+                lines.append(f"# TYPE bot_{name}_{key} gauge")
+                lines.append(f"bot_{name}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """
+        :return: One human-readable line per command and query, slowest first, and one for the event loop lag.
+        """
+        def line(kind: str, name: str, histogram: Histogram) -> Tuple[float, str]:
+            mean = histogram.sum / histogram.count
+            return histogram.sum, f"{kind} {name}: {histogram.count} calls, mean {mean * 1000:.1f}ms, p95 <= {histogram.quantile(0.95) * 1000:.1f}ms, max {histogram.max * 1000:.1f}ms"
+
+        lines = [line("Command", name, histogram) for name, histogram in self.commands.items()]
+        lines += [line("Query", name, histogram) for name, histogram in self.queries.items()]
+        summary = [text for _, text in sorted(lines, reverse=True)]
+        if self.errors:
+            summary.append("Errors: " + ", ".join(f"{command} {error} x{count}" for (command, error), count in self.errors.most_common()))
+        if self.loop_lag.count:
+            summary.append(f"Event loop lag: p95 <= {self.loop_lag.quantile(0.95) * 1000:.1f}ms, max {self.loop_lag.max * 1000:.1f}ms")
+        return summary
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+def timed(function: Callable) -> Callable:
+    """
+    Decorator recording the duration of every call of a coroutine function as a database query.
+    """
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            metrics.observe_query(function.__name__, time.perf_counter() - started)
+
+    return wrapper
+
+
+class MetricsExporter:
+    """
+    Measures the event loop lag and optionally serves the metrics over HTTP for Prometheus.
+    """
+
+    def __init__(self, registry: Metrics = metrics):
+        self.registry = registry
+        self._lag_task: Optional[asyncio.Task] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, port: Optional[int] = None, host: str = "127.0.0.1") -> None:
+        """
+        :param port: The port of the HTTP endpoint serving /metrics, None to only measure the lag.
+        :param host: The address of the HTTP endpoint, local only by default.
+        """
+        self._lag_task = asyncio.create_task(self._measure_lag())
+        if port is not None:
+            app = web.Application()
+            app.router.add_get("/metrics", self._handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, host, port).start()
+            print(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def _measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.registry.loop_lag.observe(max(0.0, loop.time() - started - LAG_INTERVAL))
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import os
+import re
+import time
+from typing import List, Tuple
+
+import aiosqlite
+
+MIGRATIONS_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/migrations"
+DATABASE_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/database.db"  # Same as db_manager.DATABASE_PATH
+
+
+def list_migrations(directory: str = MIGRATIONS_PATH) -> List[Tuple[int, str]]:
+    """
+    This function will list the migration scripts, ordered by version.
+
+    Migration scripts are named ``NNNN_description.sql`` where ``NNNN`` is the schema version
+    the database is at once the script has been applied.
+
+    :param directory: The directory containing the migration scripts.
+    :return: A list of (version, path) tuples.
+    """
+    migrations = []
+    for file in os.listdir(directory):
+        match = re.match(r"^(\d+)_.*\.sql$", file)
+        if match:
+            migrations.append((int(match.group(1)), os.path.join(directory, file)))
+    return sorted(migrations)
+
+
+async def get_version(db: aiosqlite.Connection) -> int:
+    """
+    This function will get the schema version of a database.
+
+    :param db: The database connection.
+    :return: The schema version, 0 for a database that has never been migrated.
+    """
+    async with db.execute("PRAGMA user_version") as cursor:
+        result = await cursor.fetchone()
+        return result[0]
+
+
+async def migrate(db: aiosqlite.Connection, directory: str = MIGRATIONS_PATH) -> int:
+    """
+    This function will upgrade a database in place by applying every pending migration.
+
+    Each migration runs in its own transaction together with the update of the schema version,
+    so a failing migration leaves the database at the previous version.
+
+    :param db: The database connection.
+    :param directory: The directory containing the migration scripts.
+    :return: The schema version of the database after the upgrade.
+    """
+    current = await get_version(db)
+    for version, path in list_migrations(directory):
+        if version <= current:
+            continue
+        with open(path) as file:
+            script = file.read()
+        try:
+            await db.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except Exception:
+            await db.rollback()
+            raise
+        current = version
+    return current
+
+
+async def is_incremental_vacuum_enabled(db: aiosqlite.Connection) -> bool:
+    """
+    This function will check whether a database is in incremental auto-vacuum mode.
+
+    :param db: The database connection.
+    :return: True if the free pages of the database can be given back a few at a time.
+    """
+    async with db.execute("PRAGMA auto_vacuum") as cursor:
+        return (await cursor.fetchone())[0] == 2
+
+
+async def enable_incremental_vacuum(db: aiosqlite.Connection) -> bool:
+    """
+    This function will switch a database to incremental auto-vacuum, so that the free pages left by
+    deleted rows can be given back to the file system a few at a time.
+
+    The mode of a database holding tables only changes with a full VACUUM, which rewrites the
+    whole file while holding an exclusive lock. It is done once, while the bot is stopped, by
+    running this module: python -m helpers.migrations --incremental-vacuum
+
+    :param db: The database connection, outside of any transaction.
+    :return: True if the database has been rewritten, False if it already was in this mode.
+    """
+    if await is_incremental_vacuum_enabled(db):
+        return False
+    await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await db.execute("VACUUM")
+    return True
+
+
+async def main(path: str, incremental_vacuum: bool) -> None:
+    async with aiosqlite.connect(path) as db:
+        print(f"Database schema at version {await migrate(db)}")
+        if incremental_vacuum:
+            started = time.perf_counter()
+            if await enable_incremental_vacuum(db):
+                print(f"Database rewritten in {time.perf_counter() - started:.1f} s to enable incremental vacuum")
+            else:
+                print("Incremental vacuum was already enabled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrades the database offline, while the bot is stopped.")
+    parser.add_argument("--database", default=DATABASE_PATH, help="the database of the bot by default")
+    parser.add_argument("--incremental-vacuum", action="store_true", help="rewrite the database once so that the warn retention job can shrink it")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.database, arguments.incremental_vacuum))
@@ -0,0 +1,228 @@
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set
+
+Request = Callable[[], Awaitable[Any]]
+
+
+class Priority(IntEnum):
+    """
+    Lanes of the outbound scheduler, served in this order.
+    """
+    INTERACTION = 0  # Interaction responses, which expire after 3 seconds
+    NORMAL = 1  # Replies and updates someone is waiting for
+    BULK = 2  # Provisioning work such as creating channels for giveaway winners
+
+
+class TokenBucket:
+    """
+    Rate limit refilled continuously, here the global cap of the requests sent to Discord.
+    """
+
+    def __init__(self, capacity: float, period: float):
+        """
+        :param capacity: The number of requests allowed per period.
+        :param period: The length of the period in seconds.
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        :return: The number of seconds until a request can be sent, 0 if it can be sent now.
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ("route", "request", "priority", "futures", "coalesce_key", "queued_at")
+
+    def __init__(self, route: Optional[str], request: Request, priority: Priority, coalesce_key: Optional[Hashable]):
+        self.route = route
+        self.priority = priority
+        self.request = request
+        self.futures: List[asyncio.Future] = []
+        self.coalesce_key = coalesce_key
+        self.queued_at = time.monotonic()
+
+
+class OutboundScheduler:
+    """
+    Bot-wide queue for the requests sent to Discord.
+
+    Requests are sent in priority order under a global cap, so that bursts of bulk work never
+    delay interaction responses. Queued requests sharing a coalesce key, such as successive edits of
+    the same message, are sent only once.
+
+    The rate limits of each route are left to discord.py, which learns them from Discord's headers
+    and retries 429s. A route only has one request in flight at a time: the next one is picked by
+    priority once it completes, instead of queuing inside discord.py in submission order, and the
+    requests waiting for a throttled route never hold the slots of the other routes.
+    """
+
+    def __init__(self, global_limit: int = 50, concurrency: int = 10, max_pending: int = 1000):
+        """
+        :param global_limit: The number of requests per second across every route.
+        :param concurrency: The number of routes with a request in flight at the same time.
+        :param max_pending: The number of queued requests after which bulk submissions wait.
+        """
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._global = TokenBucket(global_limit, 1.0)
+        self._busy_routes: Set[str] = set()
+        self._lanes: Dict[Priority, Deque[_Job]] = {priority: deque() for priority in Priority}
+        self._coalescing: Dict[Hashable, _Job] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        self.stats = {"submitted": 0, "sent": 0, "coalesced": 0, "failed": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    @property
+    def pending(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        :return: The counters of the scheduler along with the current backlog of each lane.
+        """
+        metrics = dict(self.stats)
+        metrics["in_flight"] = len(self._in_flight)
+        for priority, lane in self._lanes.items():
+            metrics[f"pending_{priority.name.lower()}"] = len(lane)
+            metrics[f"oldest_{priority.name.lower()}"] = time.monotonic() - lane[0].queued_at if lane else 0.0
+        return metrics
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops dispatching. Requests still queued fail with CancelledError.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for lane in self._lanes.values():
+            while lane:
+                for future in lane.popleft().futures:
+                    future.cancel()
+        self._coalescing.clear()
+
+    async def submit(self, route: Optional[str], request: Request, priority: Priority = Priority.NORMAL, coalesce_key: Optional[Hashable] = None) -> Any:
+        """
+        Queues a request and waits for its result.
+
+        :param route: The rate limit route of the request, e.g. "channel:<id>:messages", None for interaction responses.
+        :param request: A function returning the coroutine that sends the request.
+        :param priority: The lane of the request.
+        :param coalesce_key: Requests queued with the same key are merged, only the last one is sent.
+        :return: The result of the request.
+        """
+        if self._task is None:
+            return await request()  # The scheduler is not running, e.g. in a standalone script
+        if priority == Priority.BULK:
+            while self.pending >= self.max_pending:
+                self._space.clear()
+                await self._space.wait()
+        future = asyncio.get_running_loop().create_future()
+        self.stats["submitted"] += 1
+        job = self._coalescing.get(coalesce_key) if coalesce_key is not None else None
+        if job is not None:
+            job.request = request
+            self.stats["coalesced"] += 1
+        else:
+            job = _Job(route, request, priority, coalesce_key)
+            self._lanes[priority].append(job)
+            if coalesce_key is not None:
+                self._coalescing[coalesce_key] = job
+        job.futures.append(future)
+        self._wakeup.set()
+        return await future
+
+    def _next_job(self, now: float) -> Optional[float]:
+        # Starts the first job whose route is free, else returns how long to wait for the global cap.
+        # None means waiting for a request to complete or for a new one.
+        global_delay = self._global.delay(now)
+        wait = None
+        for lane in self._lanes.values():
+            for index, job in enumerate(lane):
+                # Interaction responses have no route and are not subject to rate limits
+                if job.route is not None:
+                    if job.route in self._busy_routes or len(self._busy_routes) >= self.concurrency:
+                        continue
+                    if global_delay > 0:
+                        wait = global_delay
+                        continue
+                del lane[index]
+                self._start(job, now)
+                return 0.0
+        return wait
+
+    def _start(self, job: _Job, now: float) -> None:
+        if job.coalesce_key is not None:
+            self._coalescing.pop(job.coalesce_key, None)
+        if job.route is not None:
+            self._busy_routes.add(job.route)
+            self._global.take(now)
+        waited = time.monotonic() - job.queued_at
+        self.stats["wait_total"] += waited
+        self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+        if self.pending < self.max_pending:
+            self._space.set()
+        task = asyncio.create_task(self._send(job))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, job: _Job) -> None:
+        try:
+            result = await job.request()
+        except Exception as e:
+            self._resolve(job, exception=e)
+        else:
+            self._resolve(job, result=result)
+        finally:
+            if job.route is not None:
+                self._busy_routes.discard(job.route)
+                self._wakeup.set()
+
+    def _resolve(self, job: _Job, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        self.stats["sent" if exception is None else "failed"] += 1
+        for future in job.futures:
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            wait = self._next_job(time.monotonic())
+            if wait == 0.0:
+                await asyncio.sleep(0)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,81 @@
+import time
+from typing import Dict, Optional, Set
+
+MAX_USERS = 100_000  # Users tracked per generation, older state is dropped early past this number
+
+
+class RateLimiter:
+    """
+    Bot-wide limit of the commands of each user, as a token bucket of ``burst`` commands refilled
+    at ``rate`` commands per ``per`` seconds.
+
+    The bucket of a user is stored as a single float, the time at which it will be full again
+    (the generic cell rate algorithm), so a check is a dictionary lookup and a few additions.
+    The states live in two generations swapped every time a bucket takes to refill entirely: a
+    user missing from both has a full bucket, so the older generation is dropped as a whole and
+    the states expire without any sweep. A generation holding ``max_users`` states is swapped
+    early, which only forgets the users idle for the longest, so memory stays bounded even when a
+    flood comes from distinct users.
+    """
+
+    def __init__(self, rate: int, per: float, burst: Optional[int] = None, max_users: int = MAX_USERS):
+        """
+        :param rate: The number of commands allowed per period.
+        :param per: The length of the period in seconds.
+        :param burst: The number of commands allowed at once, rate by default.
+        :param max_users: The number of users tracked per generation.
+        """
+        self.interval = per / rate
+        self.tolerance = self.interval * ((burst or rate) - 1)
+        self.window = self.interval + self.tolerance  # Time taken by an empty bucket to refill
+        self.max_users = max_users
+        self._current: Dict[int, float] = {}
+        self._previous: Dict[int, float] = {}
+        self._noticed: Set[int] = set()  # Users told they are limited during the current generation
+        self._rotated_at = time.monotonic()
+        self.limited = 0
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def _rotate(self, now: float) -> None:
+        if now - self._rotated_at >= 2 * self.window:
+            self._previous = {}  # Both generations are idle for long enough, every bucket is full
+        else:
+            self._previous = self._current
+        self._current = {}
+        self._noticed = set()
+        self._rotated_at = now
+
+    def hit(self, user_id: int, now: Optional[float] = None) -> float:
+        """
+        Takes a command from the bucket of a user.
+
+        :param user_id: The ID of the user.
+        :param now: The current monotonic time, for tests and benchmarks.
+        :return: 0 if the command is allowed, else the seconds to wait before the next one.
+        """
+        if now is None:
+            now = time.monotonic()
+        if now - self._rotated_at >= self.window or len(self._current) >= self.max_users:
+            self._rotate(now)
+        full_at = self._current.get(user_id)
+        if full_at is None:
+            full_at = self._previous.pop(user_id, now)
+        full_at = max(full_at, now)
+        if full_at - now > self.tolerance:
+            self._current[user_id] = full_at
+            self.limited += 1
+            return full_at - self.tolerance - now
+        self._current[user_id] = full_at + self.interval
+        return 0.0
+
+    def notify(self, user_id: int) -> bool:
+        """
+        :param user_id: The ID of a limited user.
+        :return: True the first time the user is limited in the current generation, False afterwards.
+        """
+        if user_id in self._noticed:
+            return False
+        self._noticed.add(user_id)
+        return True
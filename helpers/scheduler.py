@@ -0,0 +1,105 @@
+import asyncio
+import heapq
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class DeadlineScheduler:
+    """
+    Runs a callback for each key once its deadline has passed, using a single background task.
+
+    Deadlines are kept in a min-heap, so the task only wakes up for the earliest one, whatever the
+    number of scheduled keys. Deadlines are UNIX timestamps, so they can be persisted and
+    scheduled again after a restart.
+    """
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[Any]]):
+        """
+        Initializes the scheduler.
+
+        :param callback: The coroutine function called with the key of each expired deadline.
+        """
+        self.callback = callback
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._counter = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """
+        Schedules a key, replacing its previous deadline if it was already scheduled.
+
+        :param key: The key passed to the callback.
+        :param deadline: The UNIX timestamp after which the callback should run.
+        """
+        self._deadlines[key] = deadline
+        self._counter += 1
+        heapq.heappush(self._heap, (deadline, self._counter, key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        """
+        Cancels a scheduled key. Its heap entry is skipped when it reaches the top.
+
+        :param key: The key that should not run anymore.
+        """
+        self._deadlines.pop(key, None)
+
+    def start(self) -> None:
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the scheduler and waits for the callbacks that are already running.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _pop_expired(self, now: float) -> List[Hashable]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        return expired
+
+    async def _run(self) -> None:
+        while True:
+            for key in self._pop_expired(time.time()):
+                task = asyncio.create_task(self._call(key))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _call(self, key: Hashable) -> None:
+        try:
+            await self.callback(key)
+        except Exception as e:
+            print(f"Scheduled callback for {key} failed\n{type(e).__name__}: {e}")
@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+import discord
+
+from helpers.outbound import OutboundScheduler, Priority
+
+TRANSCRIPTS_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../transcripts"
+PAGE_SIZE = 100  # The most messages Discord returns per history request
+MAX_CONCURRENT = 2  # Transcripts written at the same time, the others wait for their turn
+
+
+class Transcript(NamedTuple):
+    path: str  # Relative to the directory of the archiver
+    message_count: int
+    size: int  # Compressed, in bytes
+    first_message_at: Optional[str]
+    last_message_at: Optional[str]
+    participants: Dict[int, int]  # User ID -> number of messages
+
+
+def serialize(message: discord.Message) -> str:
+    """
+    :param message: A message of the channel.
+    :return: The JSON line of the message in the transcript.
+    """
+    return json.dumps({
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": message.author.name,
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "embeds": [embed.to_dict() for embed in message.embeds]
+    }, ensure_ascii=False) + "\n"
+
+
+class TranscriptArchiver:
+    """
+    Streams the history of channels into gzip-compressed JSONL files, one message per line, oldest first.
+
+    The history is fetched one page at a time and each page is compressed and written while the
+    next one is fetched, so at most two pages are held in memory whatever the size of the channel.
+    A semaphore shared by every close limits the transcripts written at the same time.
+    """
+
+    def __init__(self, directory: str = TRANSCRIPTS_PATH, max_concurrent: int = MAX_CONCURRENT, page_size: int = PAGE_SIZE):
+        """
+        :param directory: The directory the transcripts are written to, one sub-directory per server.
+        :param max_concurrent: The number of transcripts written at the same time.
+        :param page_size: The number of messages fetched per history request.
+        """
+        self.directory = directory
+        self.page_size = page_size
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def resolve(self, path: str) -> str:
+        """
+        :param path: The path of a transcript, as stored in the database.
+        :return: The path of the transcript file.
+        """
+        return os.path.join(self.directory, path)
+
+    async def _fetch_page(self, channel: discord.abc.Messageable, after: int) -> List[discord.Message]:
+        return [message async for message in channel.history(limit=self.page_size, after=discord.Object(id=after), oldest_first=True)]
+
+    async def archive(self, channel: discord.abc.GuildChannel, outbound: OutboundScheduler) -> Transcript:
+        """
+        Writes the transcript of a channel. The file only appears once complete, a failed
+        transcript leaves nothing behind.
+
+        :param channel: The channel to archive.
+        :param outbound: The scheduler the history requests are sent through.
+        :return: The summary of the transcript, to be stored in the database.
+        """
+        path = os.path.join(str(channel.guild.id), f"{channel.id}.jsonl.gz")
+        destination = self.resolve(path)
+        partial = f"{destination}.part"
+        async with self._semaphore:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            file = gzip.open(partial, "wt", encoding="utf-8")
+            count = 0
+            first_at = last_at = None
+            participants: Dict[int, int] = {}
+            writing: Optional[asyncio.Future] = None
+            try:
+                after = 0
+                while True:
+                    page = await outbound.submit(f"channel:{channel.id}:messages", lambda after=after: self._fetch_page(channel, after), Priority.BULK)
+                    if writing is not None:
+                        await writing
+                        writing = None
+                    if not page:
+                        break
+                    lines = [serialize(message) for message in page]
+                    writing = asyncio.ensure_future(asyncio.to_thread(file.writelines, lines))
+                    for message in page:
+                        participants[message.author.id] = participants.get(message.author.id, 0) + 1
+                    count += len(page)
+                    first_at = first_at or page[0].created_at.isoformat()
+                    last_at = page[-1].created_at.isoformat()
+                    after = page[-1].id
+                    if len(page) < self.page_size:
+                        break
+                if writing is not None:
+                    await writing
+                    writing = None
+                await asyncio.to_thread(file.close)
+                os.replace(partial, destination)
+            except BaseException:
+                if writing is not None:
+                    await asyncio.wait([writing])
+                file.close()
+                os.remove(partial)
+                raise
+        return Transcript(path, count, os.path.getsize(destination), first_at, last_at, participants)
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import aiosqlite
+
+from helpers.db_pool import ConnectionPool
+
+Operation = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class WriteQueue:
+    """
+    Write-behind queue that groups the writes submitted while the previous transaction was being
+    committed into one transaction. A write arriving on an idle queue is committed right away.
+
+    Each caller is resumed with its own result once the shared transaction has been committed. If
+    an operation fails, the batch is rolled back and replayed one operation per transaction, so
+    that only the failing operation reports an error.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = 128):
+        """
+        Initializes the queue.
+
+        :param pool: The connection pool whose writer runs the operations.
+        :param max_batch: The maximum number of operations committed together.
+        """
+        self.pool = pool
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.operations = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        if not self.is_running:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flushes every pending operation, then stops the worker.
+        """
+        if not self.is_running:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def submit(self, operation: Operation) -> Any:
+        """
+        Queues an operation and waits until the transaction it belongs to has been committed.
+
+        :param operation: A coroutine function receiving the writer connection.
+        :return: The value returned by the operation.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Operation, asyncio.Future]]:
+        # Takes whatever built up during the previous commit, without waiting for more
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _commit(self, batch: List[Tuple[Operation, asyncio.Future]]) -> List[Any]:
+        async with self.pool.writer() as db:
+            return [await operation(db) for operation, _ in batch]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                results = [(future, result, None) for (_, future), result in zip(batch, await self._commit(batch))]
+            except Exception:
+                # The whole batch has been rolled back, replay each operation in its own
+                # transaction so that only the failing ones report an error.
+                results = []
+                for item in batch:
+                    try:
+                        results.append((item[1], (await self._commit([item]))[0], None))
+                    except Exception as e:
+                        results.append((item[1], None, e))
+            for future, result, exception in results:
+                if future.done():
+                    continue
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
+            self.batches += 1
+            self.operations += len(batch)
+            for _ in batch:
+                self._queue.task_done()
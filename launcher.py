@@ -0,0 +1,135 @@
+"""
+Runs the bot as several clusters, each one being a process running a contiguous range of shards.
+
+The launcher asks Discord for the recommended number of shards, spreads them across one process
+per core and relays the cluster-wide operations (blacklist updates, owner commands) between the
+processes. Clusters are started one after another, each one once the previous one is ready, to
+respect the identify rate limit.
+
+Usage: python launcher.py [--clusters N] [--shards N] [--api-base URL]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from helpers.config import Config
+from helpers.ipc import IPCHub
+
+DISCORD_API = "https://discord.com/api/v10"
+READY_TIMEOUT = 120.0  # Seconds to wait for a cluster to be ready before starting the next one
+RESTART_DELAY = 5.0  # Seconds to wait before restarting a cluster that exited
+
+root_path = os.path.realpath(os.path.dirname(__file__))
+
+
+def plan_clusters(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """
+    Splits the shards in contiguous ranges of nearly equal sizes.
+
+    :param shard_count: The total number of shards.
+    :param cluster_count: The number of clusters, lowered to the number of shards if greater.
+    :return: The shard IDs of each cluster.
+    """
+    cluster_count = max(1, min(cluster_count, shard_count))
+    size, extra = divmod(shard_count, cluster_count)
+    clusters, start = [], 0
+    for index in range(cluster_count):
+        end = start + size + (1 if index < extra else 0)
+        clusters.append(list(range(start, end)))
+        start = end
+    return clusters
+
+
+async def fetch_gateway(api_base: str, token: str) -> Dict[str, Any]:
+    """
+    :return: The gateway URL and the recommended number of shards of the bot.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{api_base}/gateway/bot", headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+class Cluster:
+    def __init__(self, cluster_id: int, shard_ids: List[int]):
+        self.id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ready = asyncio.Event()
+
+    async def run(self, env: Dict[str, str], stopping: asyncio.Event) -> None:
+        """
+        Runs the process of the cluster, restarting it whenever it exits until the launcher stops.
+        """
+        env = {**env, "BOT_CLUSTER_ID": str(self.id), "BOT_SHARD_IDS": ",".join(map(str, self.shard_ids))}
+        while not stopping.is_set():
+            self.ready.clear()
+            self.process = await asyncio.create_subprocess_exec(sys.executable, os.path.join(root_path, "bot.py"), cwd=root_path, env=env)
+            code = await self.process.wait()
+            self.ready.set()  # Never block the start of the next clusters
+            if stopping.is_set():
+                break
+            print(f"Cluster {self.id} exited with code {code}, restarting in {RESTART_DELAY:.0f}s")
+            await asyncio.sleep(RESTART_DELAY)
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+
+async def launch(cluster_count: int, shard_count: Optional[int], api_base: str) -> None:
+    config = Config(os.path.join(root_path, "config.json"))
+    gateway = await fetch_gateway(api_base, config["token"])
+    shard_count = shard_count or gateway["shards"]
+    clusters = [Cluster(index, shard_ids) for index, shard_ids in enumerate(plan_clusters(shard_count, cluster_count))]
+
+    def on_message(message: Dict[str, Any]) -> None:
+        if message["op"] == "ready" and 0 <= message["origin"] < len(clusters):
+            clusters[message["origin"]].ready.set()
+
+    hub = IPCHub(listener=on_message)
+    port = await hub.start()
+    env = {**os.environ, "BOT_SHARD_COUNT": str(shard_count), "BOT_IPC_PORT": str(port), "BOT_GATEWAY_URL": gateway["url"]}
+    if api_base != DISCORD_API:
+        env["BOT_API_BASE"] = api_base
+    print(f"Launching {shard_count} shards in {len(clusters)} clusters")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopping.set)
+        except NotImplementedError:
+            pass  # Not supported on Windows, where Ctrl+C still stops the launcher
+
+    tasks = []
+    try:
+        for cluster in clusters:
+            print(f"Starting cluster {cluster.id} with shards {cluster.shard_ids[0]}-{cluster.shard_ids[-1]}")
+            tasks.append(asyncio.create_task(cluster.run(env, stopping)))
+            try:
+                await asyncio.wait_for(cluster.ready.wait(), READY_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"Cluster {cluster.id} is not ready after {READY_TIMEOUT:.0f}s, starting the next one")
+        await stopping.wait()
+    finally:
+        stopping.set()
+        for cluster in clusters:
+            cluster.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await hub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the bot as one process per range of shards.")
+    parser.add_argument("--clusters", type=int, default=os.cpu_count() or 1, help="number of processes, one per core by default")
+    parser.add_argument("--shards", type=int, default=None, help="total number of shards, Discord's recommendation by default")
+    parser.add_argument("--api-base", default=DISCORD_API, help="base URL of the API, e.g. a stand-in gateway for local testing")
+    arguments = parser.parse_args()
+    asyncio.run(launch(arguments.clusters, arguments.shards, arguments.api_base))